@@ -0,0 +1,147 @@
+"""
+Compiled multi-pattern matching for the message parser
+Alias tables and quantity patterns are compiled once at load time, so scanning
+a line is a single regex pass no matter how many entries are configured
+"""
+
+import re
+from typing import Callable, Dict, Iterable, Optional
+
+
+def trie_pattern(words: Iterable[str]) -> str:
+    """
+    Regex source matching any of words, shaped as a character trie.
+    At a given position it matches the longest word that starts there.
+    """
+    trie: Dict = {}
+    for word in words:
+        if not word:
+            continue
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def render(node: Dict) -> str:
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            # Word ends here but may continue: greedy optional tries the longer word first
+            return f'(?:{body})?'
+        return body
+
+    return render(trie)
+
+
+class CompanyAliasMatcher:
+    """
+    Alias -> canonical company lookup with the semantics of the old linear scan:
+    exact alias, else an alias inside the text, else the text inside an alias.
+
+    Policy when several aliases match:
+    - alias inside the text: the longest alias wins, ties go to the leftmost
+    - text inside an alias: the first such alias in config order wins
+    """
+
+    def __init__(self, aliases: Dict[str, str]):
+        self.aliases = dict(aliases)
+        pattern = trie_pattern(self.aliases)
+        # Zero-width lookahead so overlapping aliases are all seen
+        self._scanner = re.compile(f'(?=({pattern}))') if pattern else None
+
+        # Every substring of every alias, so "text inside an alias" is one dict lookup
+        self._contained_in: Dict[str, str] = {}
+        for alias, canonical in self.aliases.items():
+            for start in range(len(alias) + 1):
+                for end in range(start, len(alias) + 1):
+                    self._contained_in.setdefault(alias[start:end], canonical)
+
+    def longest_alias_in(self, text_lower: str) -> Optional[str]:
+        """Longest alias occurring in text_lower (leftmost on ties)"""
+        if self._scanner is None:
+            return None
+        best = None
+        for match in self._scanner.finditer(text_lower):
+            alias = match.group(1)
+            if best is None or len(alias) > len(best):
+                best = alias
+        return best
+
+    def match(self, text: str) -> Optional[str]:
+        if not text:
+            return None
+
+        text_lower = text.lower().strip()
+
+        # Direct match
+        if text_lower in self.aliases:
+            return self.aliases[text_lower]
+
+        # Alias inside the text
+        alias = self.longest_alias_in(text_lower)
+        if alias:
+            return self.aliases[alias]
+
+        # Text inside an alias
+        return self._contained_in.get(text_lower)
+
+
+class QuantityDetector:
+    """
+    The configured quantity patterns compiled into one case-insensitive alternation.
+    One scan per line, and the match says which pattern (family) fired.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = []
+        branches = []
+        for pattern in patterns:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                print(f"⚠️ Skipping invalid quantity pattern {pattern!r}: {e}")
+                continue
+            branches.append(f'(?P<q{len(self.patterns)}>{pattern})')
+            self.patterns.append(pattern)
+        self._regex = re.compile('|'.join(branches), re.IGNORECASE) if branches else None
+
+    def family(self, text: str) -> Optional[str]:
+        """The pattern behind the leftmost quantity in text, or None"""
+        if not text or self._regex is None:
+            return None
+        match = self._regex.search(text.upper())
+        if not match:
+            return None
+        return self.patterns[int(match.lastgroup[1:])]
+
+    def __call__(self, text: str) -> bool:
+        return self.family(text) is not None
+
+
+class KeywordMatcher:
+    """
+    "Does any keyword occur in the text" as one compiled trie search, so the cost per
+    line depends on the line, not on how many keywords (or catalogue products) there are.
+    fold normalises case on both sides (str.lower or str.upper, like the old scans).
+    """
+
+    def __init__(self, keywords: Iterable[str], fold: Callable[[str], str] = str.lower):
+        self.fold = fold
+        self.keywords = list(dict.fromkeys(fold(k) for k in keywords if k))
+        pattern = trie_pattern(self.keywords)
+        self._regex = re.compile(pattern) if pattern else None
+
+    def find(self, text: str) -> Optional[str]:
+        """The first keyword found in text, or None"""
+        if not text or self._regex is None:
+            return None
+        match = self._regex.search(self.fold(text))
+        return match.group(0) if match else None
+
+    def __call__(self, text: str) -> bool:
+        return self.find(text) is not None
+
+    def __len__(self) -> int:
+        return len(self.keywords)
@@ -0,0 +1,148 @@
+"""
+Bulk re-parse of archived WhatsApp order days
+Splits saved day files (or message lists) into order-day shards at each
+demarcation message, parses the shards with MessageParser in a process pool
+and merges the results back in input order
+
+Usage: python -m app.core.bulk_reparse tests/*_messages.json [--workers N]
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from app.core.message_classifier import classify_message
+
+# One parser per worker process, built by the pool initializer
+_worker_parser = None
+
+
+def load_day_file(path: str) -> List[Dict[str, Any]]:
+    """
+    Messages from a saved day: a *_messages.json capture (id/text/timestamp rows)
+    or a saved *_messages.html page, which is re-parsed offline
+    """
+    if path.endswith('.html'):
+        from app.core.whatsapp_crawler import WhatsAppCrawler
+        with open(path, 'r', encoding='utf-8') as f:
+            return WhatsAppCrawler().parse_html(f.read())
+
+    with open(path, 'r', encoding='utf-8') as f:
+        rows = json.load(f)
+    if isinstance(rows, dict):
+        rows = rows.get('messages', [])
+    return [normalize_message(row) for row in rows]
+
+
+def normalize_message(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Give captured rows the 'content' key the parser reads"""
+    if 'content' in row:
+        return row
+    return dict(row, content=row.get('text') or '')
+
+
+def shard_by_demarcation(messages: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    Split at every order-day demarcation message ('Tuesday orders starts here' etc.).
+    Each demarcation starts a new shard; messages before the first one form their own shard.
+    """
+    shards: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    for message in messages:
+        if classify_message(message.get('content') or '') == 'demarcation' and current:
+            shards.append(current)
+            current = []
+        current.append(message)
+    if current:
+        shards.append(current)
+    return shards
+
+
+def _init_worker():
+    global _worker_parser
+    from app.core.message_parser import MessageParser
+    _worker_parser = MessageParser()
+
+
+def _parse_shard(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if _worker_parser is None:
+        _init_worker()
+    return _worker_parser.parse_messages_to_orders(messages)
+
+
+def bulk_reparse(sources: Iterable[Union[str, List[Dict[str, Any]]]], workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Re-parse many days at once.
+
+    sources: day file paths and/or message lists (labelled by position).
+    workers: process count (default: CPU count); 1 parses in this process.
+
+    Returns {'shards': [{source, shard, first_message_id, message_count, orders}], 'stats': {...}},
+    with shards in input order regardless of which worker finished first.
+    """
+    started = time.perf_counter()
+
+    shard_meta = []
+    shard_messages = []
+    for index, source in enumerate(sources):
+        if isinstance(source, str):
+            label, messages = source, load_day_file(source)
+        else:
+            label, messages = f"messages[{index}]", [normalize_message(m) for m in source]
+        for shard_index, shard in enumerate(shard_by_demarcation(messages)):
+            shard_meta.append({
+                'source': label,
+                'shard': shard_index,
+                'first_message_id': shard[0].get('id', ''),
+                'message_count': len(shard)
+            })
+            shard_messages.append(shard)
+
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(shard_messages) or 1))
+    loaded = time.perf_counter()
+
+    if workers == 1:
+        results = [_parse_shard(shard) for shard in shard_messages]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            # map() yields in submission order, which keeps the merge deterministic
+            results = list(pool.map(_parse_shard, shard_messages))
+
+    finished = time.perf_counter()
+    for meta, orders in zip(shard_meta, results):
+        meta['orders'] = orders
+
+    message_count = sum(meta['message_count'] for meta in shard_meta)
+    parse_seconds = finished - loaded
+    stats = {
+        'sources': len({meta['source'] for meta in shard_meta}),
+        'shards': len(shard_meta),
+        'messages': message_count,
+        'orders': sum(len(meta['orders']) for meta in shard_meta),
+        'workers': workers,
+        'load_seconds': round(loaded - started, 3),
+        'parse_seconds': round(parse_seconds, 3),
+        'messages_per_second': round(message_count / parse_seconds, 1) if parse_seconds > 0 else None
+    }
+    print(f"📚 [REPARSE] {stats['messages']} messages in {stats['shards']} shards -> {stats['orders']} orders "
+          f"({stats['workers']} workers, {stats['parse_seconds']}s, {stats['messages_per_second']} msg/s)")
+    return {'shards': shard_meta, 'stats': stats}
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Re-parse archived WhatsApp order days")
+    cli.add_argument('paths', nargs='+', help="*_messages.json or *_messages.html day files")
+    cli.add_argument('--workers', type=int, default=None)
+    cli.add_argument('--output', help="Write the full result as JSON here")
+    args = cli.parse_args()
+
+    result = bulk_reparse(args.paths, workers=args.workers)
+    for shard in result['shards']:
+        print(f"  {shard['source']} #{shard['shard']}: {shard['message_count']} messages, {len(shard['orders'])} orders")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
@@ -0,0 +1,71 @@
+"""
+Persistent index of messages already acknowledged by Django
+A compact on-disk hash set: each WhatsApp data-id is stored as an 8-byte
+blake2b digest in an append-only file, so a restart knows what Django already
+has without keeping (or re-reading) any message content
+"""
+
+import hashlib
+import os
+import threading
+from typing import Iterable, Optional
+
+DIGEST_SIZE = 8
+
+
+def message_digest(message_id: str) -> bytes:
+    return hashlib.blake2b(message_id.encode('utf-8'), digest_size=DIGEST_SIZE).digest()
+
+
+class DeliveredMessageIndex:
+    """Set of delivered data-ids, persisted as fixed-size digests"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._digests = set()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        # Cut a torn final record from an interrupted write off the file too,
+        # or the next append would shift every digest after it
+        usable = len(data) - len(data) % DIGEST_SIZE
+        if usable != len(data):
+            print(f"⚠️ [DELIVERED] Dropping {len(data) - usable} bytes of a torn record from {self.path}")
+            with open(self.path, 'r+b') as f:
+                f.truncate(usable)
+        self._digests = {data[i:i + DIGEST_SIZE] for i in range(0, usable, DIGEST_SIZE)}
+        print(f"📚 [DELIVERED] Loaded {len(self._digests)} delivered message ids from {self.path}")
+
+    def __contains__(self, message_id: Optional[str]) -> bool:
+        return bool(message_id) and message_digest(message_id) in self._digests
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+    def add_many(self, message_ids: Iterable[str]) -> int:
+        """Record delivered ids (appended to disk). Returns how many were new."""
+        with self._lock:
+            new = []
+            for message_id in message_ids:
+                if not message_id:
+                    continue
+                digest = message_digest(message_id)
+                if digest not in self._digests:
+                    self._digests.add(digest)
+                    new.append(digest)
+            if new:
+                with open(self.path, 'ab') as f:
+                    f.write(b''.join(new))
+                    f.flush()
+                    os.fsync(f.fileno())
+            return len(new)
+
+    def contiguous_run(self, message_ids: Iterable[str]) -> bool:
+        """True if every id in the run is delivered (and the run is not empty)"""
+        message_ids = list(message_ids)
+        return bool(message_ids) and all(message_id in self for message_id in message_ids)
@@ -0,0 +1,158 @@
+"""
+Chunked uploads of scraped messages to the Django backend
+One keep-alive session, optionally gzip-compressed JSON bodies, bounded
+retries with back-off, and per-chunk acknowledgement so a failed chunk is the
+only thing that has to be sent again
+"""
+
+import gzip
+import json
+import os
+import time
+from typing import Dict, List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.html_store import html_json_default
+from app.core.scan_jobs import report_progress
+
+RECEIVE_HTML_PATH = '/api/whatsapp/receive-html/'
+
+# Statuses worth retrying: the server (or a proxy in front of it) is struggling, not rejecting the data
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# What a backend that can't decode gzip request bodies answers (json.loads on the raw bytes)
+GZIP_REJECTED_STATUSES = (400, 415, 500)
+
+# Gzip request bodies need a backend that decodes Content-Encoding (stock Django doesn't)
+DEFAULT_UPLOAD_GZIP = os.environ.get('DJANGO_UPLOAD_GZIP', '').lower() in ('1', 'true', 'yes')
+
+
+class DjangoUploader:
+    """Sends message batches to /api/whatsapp/receive-html/ in acknowledged chunks"""
+
+    def __init__(self, django_url: str, chunk_size: int = 25, max_retries: int = 3,
+                 backoff: float = 1.0, connect_timeout: float = 5, read_timeout: float = 30,
+                 compress: bool = DEFAULT_UPLOAD_GZIP, pool_size: int = 4):
+        self.django_url = django_url.rstrip('/')
+        self.chunk_size = max(1, chunk_size)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = (connect_timeout, read_timeout)
+        self.compress = compress
+        self.gzip_confirmed = False  # Set once the backend has accepted a gzip body
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @property
+    def url(self) -> str:
+        return f"{self.django_url}{RECEIVE_HTML_PATH}"
+
+    def _encode(self, payload: Dict):
+        """JSON body and headers, gzipped when enabled"""
+        body = json.dumps(payload, default=html_json_default).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.compress:
+            compressed = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+            return compressed, headers, len(body)
+        return body, headers, len(body)
+
+    def _post_chunk(self, chunk: List[Dict]):
+        """
+        POST one chunk, retrying timeouts, connection errors and 5xx with exponential back-off.
+        Returns (response, rejected): the parsed JSON response, or None once retries are
+        exhausted or the chunk is rejected - rejected is True for a non-retryable error status.
+        """
+        attempt = 0
+        while True:
+            body, headers, raw_size = self._encode({'messages': chunk})
+            retryable = False
+            try:
+                response = self.session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+
+                if response.status_code == 200:
+                    if self.compress:
+                        self.gzip_confirmed = True
+                    try:
+                        return response.json(), False
+                    except ValueError:
+                        return {}, False
+
+                if (self.compress and not self.gzip_confirmed
+                        and response.status_code in GZIP_REJECTED_STATUSES):
+                    # Backend doesn't decode gzip bodies - resend plain JSON and keep it that way
+                    print(f"⚠️ [UPLOAD] Gzip body got {response.status_code}, switching to uncompressed uploads")
+                    self.compress = False
+                    continue
+
+                retryable = response.status_code in RETRY_STATUSES
+                print(f"❌ [UPLOAD] Django error {response.status_code}: {response.text[:200]}")
+
+            except (requests.Timeout, requests.ConnectionError) as e:
+                retryable = True
+                print(f"⚠️ [UPLOAD] {type(e).__name__} sending {len(chunk)} messages ({raw_size} bytes): {e}")
+
+            if not retryable or attempt >= self.max_retries:
+                return None, not retryable
+
+            delay = self.backoff * (2 ** attempt)
+            attempt += 1
+            print(f"🔁 [UPLOAD] Retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def upload(self, messages: List[Dict]) -> Dict:
+        """
+        Send messages chunk by chunk. A failed chunk doesn't stop the rest.
+
+        Returns {'delivered_ids', 'failed_ids', 'processed_count', 'expansion_stats',
+        'chunks', 'failed_chunks', 'split_chunks'}.
+        """
+        result = {
+            'delivered_ids': [],
+            'failed_ids': [],
+            'processed_count': 0,
+            'expansion_stats': {},
+            'chunks': 0,
+            'failed_chunks': 0,
+            'split_chunks': 0
+        }
+
+        for start in range(0, len(messages), self.chunk_size):
+            report_progress('uploading', start, len(messages))
+            result['chunks'] += 1
+            self._send(messages[start:start + self.chunk_size], result)
+
+        return result
+
+    def _send(self, chunk: List[Dict], result: Dict):
+        """Post a chunk and record the outcome; a rejected chunk is bisected to find the bad messages"""
+        chunk_ids = [m.get('id') for m in chunk]
+        response, rejected = self._post_chunk(chunk)
+        if response is None:
+            if rejected and len(chunk) > 1:
+                # One bad message rejects the whole chunk - don't fail the others with it
+                print(f"🔪 [UPLOAD] Chunk of {len(chunk)} rejected, splitting it to isolate the bad messages")
+                result['split_chunks'] += 1
+                middle = len(chunk) // 2
+                self._send(chunk[:middle], result)
+                self._send(chunk[middle:], result)
+                return
+            result['failed_ids'].extend(chunk_ids)
+            result['failed_chunks'] += 1
+            return
+
+        result['delivered_ids'].extend(chunk_ids)
+        result['processed_count'] += response.get('processed_count', 0) or 0
+        for key, value in (response.get('expansion_stats') or {}).items():
+            if isinstance(value, (int, float)):
+                result['expansion_stats'][key] = result['expansion_stats'].get(key, 0) + value
+            else:
+                result['expansion_stats'][key] = value
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,347 @@
+"""
+In-page JavaScript snippets used by the WhatsApp crawlers
+Each snippet does in one execute_script call what would otherwise take
+many WebDriver round trips per message row
+"""
+
+# Shared helpers prepended to the row scripts below.
+# selectRows(ids) -> [{index, id, row}] for every #main row, or only rows whose data-id is in ids.
+# rowText mirrors SimplifiedWhatsAppCrawler.get_text_content so every path sees the same content.
+_ROW_HELPERS_JS = r"""
+var timeRe = /^\d{1,2}:\d{2}$/;
+
+function selectRows(ids) {
+    var only = null;
+    if (ids) {
+        only = {};
+        for (var o = 0; o < ids.length; o++) {
+            only[ids[o]] = true;
+        }
+    }
+    var rows = document.querySelectorAll('#main [role="row"]');
+    var selected = [];
+    for (var i = 0; i < rows.length; i++) {
+        var idNode = rows[i].querySelector('[data-id]');
+        var rowId = idNode ? idNode.getAttribute('data-id') : null;
+        if (only && !(rowId && only[rowId])) {
+            continue;
+        }
+        selected.push({index: i, id: rowId, row: rows[i]});
+    }
+    return selected;
+}
+
+function textOf(node) {
+    return (node.textContent || '').trim();
+}
+
+function joinLines(nodes) {
+    var lines = [];
+    for (var i = 0; i < nodes.length; i++) {
+        var t = textOf(nodes[i]);
+        if (t && !timeRe.test(t)) {
+            lines.push(t);
+        }
+    }
+    return lines.join('\n');
+}
+
+function rowText(row) {
+    var primary = row.querySelector('._ahy1.copyable-text, ._ahy2.copyable-text');
+    if (primary) {
+        var spans = primary.querySelectorAll('._ao3e.selectable-text');
+        if (spans.length) {
+            var joined = joinLines(spans);
+            if (joined) {
+                return joined;
+            }
+        } else {
+            var own = textOf(primary);
+            if (own && !timeRe.test(own)) {
+                return own;
+            }
+        }
+    }
+    var copyable = row.querySelector('.copyable-text');
+    if (copyable) {
+        var text = textOf(copyable);
+        if (text && !timeRe.test(text)) {
+            return text;
+        }
+    }
+    return joinLines(row.querySelectorAll('._ao3e.selectable-text'));
+}
+
+function isTruncated(text) {
+    return text.indexOf('…') !== -1 || text.indexOf('...') !== -1;
+}
+"""
+
+# Collect everything the crawlers need from every chat row in one call.
+# Arguments: [row_ids] - only extract these data-ids (null/omitted = every row).
+# Returns a JSON string:
+# [{index, id, pre_plain_texts, time_texts, text, truncated, fingerprint_text, html}, ...]
+EXTRACT_ROWS_SCRIPT = _ROW_HELPERS_JS + r"""
+var selected = selectRows(arguments.length ? arguments[0] : null);
+var out = [];
+for (var i = 0; i < selected.length; i++) {
+    var row = selected[i].row;
+
+    var preTexts = [];
+    var copyables = row.querySelectorAll('.copyable-text');
+    for (var j = 0; j < copyables.length; j++) {
+        var pre = copyables[j].getAttribute('data-pre-plain-text') || '';
+        if (pre.charAt(0) === '[' && pre.indexOf(']') > 0) {
+            preTexts.push(pre);
+        }
+    }
+
+    var timeTexts = [];
+    var timeSpans = row.querySelectorAll('span.x1c4vz4f.x2lah0s');
+    for (var k = 0; k < timeSpans.length; k++) {
+        var tt = textOf(timeSpans[k]);
+        if (timeRe.test(tt)) {
+            timeTexts.push(tt);
+        }
+    }
+
+    var text = rowText(row);
+    out.push({
+        index: selected[i].index,
+        id: selected[i].id,
+        pre_plain_texts: preTexts,
+        time_texts: timeTexts,
+        text: text,
+        truncated: isTruncated(text),
+        fingerprint_text: (row.textContent || '').slice(0, 200),
+        html: row.outerHTML
+    });
+}
+return JSON.stringify(out);
+"""
+
+# Click "Read more" on every truncated row in one call (same button heuristics as
+# SimplifiedWhatsAppCrawler.expand_message). Nothing is awaited here - see
+# EXPANSION_PENDING_SCRIPT.
+# Arguments: [row_ids] - only these data-ids (null/omitted = every row).
+# Returns a JSON string: {clicked: [id], no_button: [id], previews: {id: text[:100]}}
+BULK_EXPAND_SCRIPT = _ROW_HELPERS_JS + r"""
+var buttonSelectors = ['div[role="button"]', '.read-more-button', 'button[aria-label*="more"]', '[data-testid*="expand"]'];
+
+function expandButton(row) {
+    for (var s = 0; s < buttonSelectors.length; s++) {
+        var buttons = row.querySelectorAll(buttonSelectors[s]);
+        for (var b = 0; b < buttons.length; b++) {
+            var label = (buttons[b].textContent || '').trim().toLowerCase();
+            var aria = (buttons[b].getAttribute('aria-label') || '').toLowerCase();
+            if (label.indexOf('more') !== -1 || label.indexOf('expand') !== -1 ||
+                    aria.indexOf('more') !== -1 || aria.indexOf('expand') !== -1 || label === '') {
+                return buttons[b];
+            }
+        }
+    }
+    return null;
+}
+
+var selected = selectRows(arguments.length ? arguments[0] : null);
+var result = {clicked: [], no_button: [], previews: {}};
+for (var i = 0; i < selected.length; i++) {
+    var id = selected[i].id;
+    var text = rowText(selected[i].row);
+    if (!id || !isTruncated(text)) {
+        continue;
+    }
+    var button = expandButton(selected[i].row);
+    if (!button) {
+        result.no_button.push(id);
+        continue;
+    }
+    button.click();
+    result.clicked.push(id);
+    result.previews[id] = text.slice(0, 100);
+}
+return JSON.stringify(result);
+"""
+
+# Data-ids (from arguments[0]) whose text still shows a truncation marker.
+# A row that is no longer rendered counts as done - there is nothing left to wait for.
+EXPANSION_PENDING_SCRIPT = _ROW_HELPERS_JS + r"""
+var selected = selectRows(arguments[0] || []);
+var pending = [];
+for (var i = 0; i < selected.length; i++) {
+    if (isTruncated(rowText(selected[i].row))) {
+        pending.push(selected[i].id);
+    }
+}
+return pending;
+"""
+
+# Cheap pass over every row: just the data-id and the start of its text,
+# enough to fingerprint rows (see app/core/processed_index.py) before extracting.
+# Returns a JSON string: [{index, id, fingerprint_text}, ...]
+ROW_FINGERPRINTS_SCRIPT = r"""
+var rows = document.querySelectorAll('#main [role="row"]');
+var out = [];
+for (var i = 0; i < rows.length; i++) {
+    var idNode = rows[i].querySelector('[data-id]');
+    out.push({
+        index: i,
+        id: idNode ? idNode.getAttribute('data-id') : null,
+        fingerprint_text: (rows[i].textContent || '').slice(0, 200)
+    });
+}
+return JSON.stringify(out);
+"""
+
+# Just the data-ids of the rendered rows, in order.
+# Returns a list of strings (rows without a data-id are left out)
+ROW_IDS_SCRIPT = r"""
+var rows = document.querySelectorAll('#main [role="row"]');
+var ids = [];
+for (var i = 0; i < rows.length; i++) {
+    var idNode = rows[i].querySelector('[data-id]');
+    if (idNode) {
+        ids.push(idNode.getAttribute('data-id'));
+    }
+}
+return ids;
+"""
+
+# What the scroll loader watches between scroll steps (see app/core/scroll_loader.py):
+# row count, the oldest row's data-id, and the data-ids and pre-plain-text headers of the oldest rows.
+# Arguments: [oldest_rows] - how many of the oldest rows to report (default 5).
+# Returns a JSON string: {count, first_id, oldest_ids, pre_plain_texts}
+ROW_WINDOW_SCRIPT = r"""
+var oldestRows = arguments[0] || 5;
+var rows = document.querySelectorAll('#main [role="row"]');
+var firstId = null;
+var oldestIds = [];
+var preTexts = [];
+for (var i = 0; i < rows.length && (firstId === null || i < oldestRows); i++) {
+    var idNode = rows[i].querySelector('[data-id]');
+    var rowId = idNode ? idNode.getAttribute('data-id') : null;
+    if (firstId === null) {
+        firstId = rowId;
+    }
+    if (i >= oldestRows) {
+        continue;
+    }
+    if (rowId) {
+        oldestIds.push(rowId);
+    }
+    var copyables = rows[i].querySelectorAll('.copyable-text');
+    for (var c = 0; c < copyables.length; c++) {
+        var pre = copyables[c].getAttribute('data-pre-plain-text') || '';
+        if (pre.charAt(0) === '[' && pre.indexOf(']') > 0) {
+            preTexts.push(pre);
+        }
+    }
+}
+return JSON.stringify({count: rows.length, first_id: firstId, oldest_ids: oldestIds, pre_plain_texts: preTexts});
+"""
+
+# Snapshot of the open chat for offline parsing (see app/core/page_source.py).
+# Falls back to null when no chat is open so the caller can use driver.page_source.
+MAIN_HTML_SCRIPT = r"""
+var main = document.querySelector('#main');
+return main ? main.outerHTML : null;
+"""
+
+# Buffer newly inserted chat rows in window.__fambriObserver.queue.
+# Rows already on screen at install time are marked seen so only new ones are queued.
+# Arguments: [max_queue]. Returns true when an observer is (already) watching #main.
+INSTALL_MESSAGE_OBSERVER_SCRIPT = r"""
+var maxQueue = arguments[0] || 500;
+var state = window.__fambriObserver;
+if (state && state.target && document.contains(state.target)) {
+    return true;
+}
+if (state && state.observer) {
+    state.observer.disconnect();
+}
+var main = document.querySelector('#main');
+if (!main) {
+    return false;
+}
+
+state = {target: main, queue: [], seen: {}, observer: null};
+
+function rowIdOf(row) {
+    var idNode = row.querySelector('[data-id]');
+    return idNode ? idNode.getAttribute('data-id') : null;
+}
+
+function enqueue(row) {
+    var id = rowIdOf(row);
+    if (!id || state.seen[id]) {
+        return;
+    }
+    state.seen[id] = true;
+    state.queue.push({id: id, html: row.outerHTML, observed_at: Date.now()});
+    if (state.queue.length > maxQueue) {
+        state.queue.shift();
+    }
+}
+
+var existing = main.querySelectorAll('[role="row"]');
+for (var i = 0; i < existing.length; i++) {
+    var existingId = rowIdOf(existing[i]);
+    if (existingId) {
+        state.seen[existingId] = true;
+    }
+}
+
+state.observer = new MutationObserver(function (mutations) {
+    for (var m = 0; m < mutations.length; m++) {
+        var added = mutations[m].addedNodes;
+        for (var n = 0; n < added.length; n++) {
+            var node = added[n];
+            if (node.nodeType !== 1) {
+                continue;
+            }
+            var row = node.closest('[role="row"]');
+            if (row) {
+                enqueue(row);
+                continue;
+            }
+            var rows = node.querySelectorAll('[role="row"]');
+            for (var r = 0; r < rows.length; r++) {
+                enqueue(rows[r]);
+            }
+        }
+    }
+});
+state.observer.observe(main, {childList: true, subtree: true});
+window.__fambriObserver = state;
+return true;
+"""
+
+# Long-poll the observer queue (execute_async_script).
+# Arguments: [timeout_ms, callback]. Calls back with a JSON array of {id, html, observed_at},
+# or null when the observer is gone (page reload / chat switch) and must be reinstalled.
+DRAIN_MESSAGE_QUEUE_ASYNC_SCRIPT = r"""
+var timeoutMs = arguments[0];
+var done = arguments[arguments.length - 1];
+var state = window.__fambriObserver;
+if (!state || !document.contains(state.target)) {
+    done(null);
+    return;
+}
+var started = Date.now();
+(function poll() {
+    if (state.queue.length || Date.now() - started >= timeoutMs) {
+        done(JSON.stringify(state.queue.splice(0, state.queue.length)));
+    } else {
+        setTimeout(poll, 100);
+    }
+})();
+"""
+
+# Same as above without waiting (short poll)
+DRAIN_MESSAGE_QUEUE_SCRIPT = r"""
+var state = window.__fambriObserver;
+if (!state || !document.contains(state.target)) {
+    return null;
+}
+return JSON.stringify(state.queue.splice(0, state.queue.length));
+"""
@@ -0,0 +1,252 @@
+"""
+Serialized WebDriver access
+Selenium drivers are not thread-safe, yet the periodic crawler thread, scan
+jobs and Flask handlers all share one Chrome session. SerializedDriver queues
+every driver command to a single executor thread in priority order, so an
+interactive request waits for at most the command in flight instead of
+colliding with a polling round. Queue wait and execution time are recorded
+per command.
+"""
+
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from selenium.webdriver.remote.shadowroot import ShadowRoot
+from selenium.webdriver.remote.webelement import WebElement
+
+# Lower runs first
+INTERACTIVE = 0   # Flask request handlers (the default)
+SCAN = 5          # User-triggered scan jobs
+BACKGROUND = 10   # Periodic polling
+
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', SCAN: 'scan', BACKGROUND: 'background'}
+DEFAULT_PRIORITY = INTERACTIVE
+
+# Commands slower than this are logged and kept in stats()['slow_commands']
+SLOW_COMMAND_SECONDS = 5.0
+SLOW_COMMAND_HISTORY = 20
+
+_context = threading.local()
+
+
+def current_priority() -> int:
+    priority = getattr(_context, 'priority', None)
+    return DEFAULT_PRIORITY if priority is None else priority
+
+
+@contextmanager
+def driver_priority(priority: int):
+    """Run the driver commands issued by this thread at priority"""
+    previous = getattr(_context, 'priority', None)
+    _context.priority = priority
+    try:
+        yield
+    finally:
+        _context.priority = previous
+
+
+class CommandStats:
+    __slots__ = ('count', 'errors', 'wait_total', 'wait_max', 'exec_total', 'exec_max')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.exec_total = 0.0
+        self.exec_max = 0.0
+
+    def add(self, wait: float, elapsed: float, failed: bool):
+        self.count += 1
+        self.errors += failed
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.exec_total += elapsed
+        self.exec_max = max(self.exec_max, elapsed)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_wait_ms': round(self.wait_total / self.count * 1000, 2) if self.count else None,
+            'max_wait_ms': round(self.wait_max * 1000, 2),
+            'avg_exec_ms': round(self.exec_total / self.count * 1000, 2) if self.count else None,
+            'max_exec_ms': round(self.exec_max * 1000, 2)
+        }
+
+
+class DriverExecutor:
+    """One thread that runs driver commands from a priority queue (FIFO within a priority)"""
+
+    def __init__(self, name: str = 'webdriver'):
+        self.name = name
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._commands: Dict[str, CommandStats] = {}
+        self._priorities: Dict[int, CommandStats] = {}
+        self._slow = deque(maxlen=SLOW_COMMAND_HISTORY)
+        self._in_flight = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f'{name}-executor', daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable, args=(), kwargs=None, label: Optional[str] = None,
+               priority: Optional[int] = None) -> Future:
+        """Queue fn(*args, **kwargs); the Future carries its result or exception"""
+        if self._closed:
+            raise RuntimeError(f"{self.name} executor is shut down")
+        priority = current_priority() if priority is None else priority
+        future = Future()
+        task = (fn, args, kwargs or {}, label or getattr(fn, '__name__', 'command'), future, time.perf_counter())
+        self._queue.put((priority, next(self._sequence), task))
+        return future
+
+    def call(self, fn: Callable, args=(), kwargs=None, label: Optional[str] = None,
+             priority: Optional[int] = None) -> Any:
+        """Run fn on the executor thread and return its result (exceptions are re-raised here)"""
+        if threading.current_thread() is self._thread:
+            # Already on the executor (a command issuing a command): queueing would deadlock
+            return fn(*args, **(kwargs or {}))
+        return self.submit(fn, args, kwargs, label, priority).result()
+
+    def _run(self):
+        while True:
+            priority, _, task = self._queue.get()
+            if task is None:
+                break
+            fn, args, kwargs, label, future, queued_at = task
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            started = time.perf_counter()
+            self._in_flight = (label, PRIORITY_NAMES.get(priority, priority), time.time())
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                self._record(label, priority, started - queued_at, time.perf_counter() - started, True)
+                future.set_exception(e)
+            else:
+                self._record(label, priority, started - queued_at, time.perf_counter() - started, False)
+                future.set_result(result)
+            finally:
+                self._in_flight = None
+
+    def _record(self, label: str, priority: int, wait: float, elapsed: float, failed: bool):
+        with self._lock:
+            self._commands.setdefault(label, CommandStats()).add(wait, elapsed, failed)
+            self._priorities.setdefault(priority, CommandStats()).add(wait, elapsed, failed)
+            if elapsed >= SLOW_COMMAND_SECONDS:
+                self._slow.append({
+                    'command': label,
+                    'priority': PRIORITY_NAMES.get(priority, priority),
+                    'wait_ms': round(wait * 1000, 2),
+                    'exec_ms': round(elapsed * 1000, 2),
+                    'at': time.time()
+                })
+        if elapsed >= SLOW_COMMAND_SECONDS:
+            print(f"🐢 [DRIVER] {label} took {elapsed:.1f}s (waited {wait:.2f}s in queue)")
+
+    def stats(self) -> Dict[str, Any]:
+        in_flight = self._in_flight
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'in_flight': {
+                    'command': in_flight[0],
+                    'priority': in_flight[1],
+                    'running_ms': round((time.time() - in_flight[2]) * 1000, 2)
+                } if in_flight else None,
+                'priorities': {str(PRIORITY_NAMES.get(p, p)): s.to_dict() for p, s in sorted(self._priorities.items())},
+                'commands': {label: s.to_dict() for label, s in sorted(self._commands.items())},
+                'slow_commands': list(self._slow)
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop taking commands; ones already queued still run"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put((float('inf'), next(self._sequence), None))
+        if wait and threading.current_thread() is not self._thread:
+            self._thread.join(timeout=30)
+
+
+class SerializedDriver:
+    """
+    Wraps a WebDriver so every method call and property read runs on its
+    DriverExecutor. Elements it returns are re-parented onto the wrapper, so
+    element commands (click, get_attribute, find_element...) are queued too.
+    """
+
+    def __init__(self, driver, executor: Optional[DriverExecutor] = None):
+        object.__setattr__(self, '_driver', driver)
+        object.__setattr__(self, '_executor', executor or DriverExecutor())
+
+    @property
+    def wrapped_driver(self):
+        return self._driver
+
+    @property
+    def executor(self) -> DriverExecutor:
+        return self._executor
+
+    def __getattr__(self, name):
+        # Properties (current_url, page_source, title...) are remote commands themselves
+        if isinstance(getattr(type(self._driver), name, None), property):
+            return self._adopt(self._executor.call(getattr, (self._driver, name), label=name))
+
+        value = getattr(self._driver, name)
+        if not callable(value):
+            return value
+
+        def command(*args, **kwargs):
+            # driver.execute() is what elements call; label it with the W3C command
+            label = str(args[0]) if name == 'execute' and args else name
+            return self._adopt(self._executor.call(value, args, kwargs, label=label))
+
+        command.__name__ = name
+        return command
+
+    def __setattr__(self, name, value):
+        setattr(self._driver, name, value)
+
+    def _adopt(self, result):
+        if isinstance(result, WebElement):
+            return type(result)(self, result.id)
+        if isinstance(result, ShadowRoot):
+            return ShadowRoot(self, result.id)
+        if isinstance(result, list):
+            return [self._adopt(item) for item in result]
+        if isinstance(result, dict):
+            return {key: self._adopt(value) for key, value in result.items()}
+        return result
+
+    def quit(self):
+        try:
+            self._executor.call(self._driver.quit, label='quit')
+        finally:
+            self._executor.shutdown()
+
+    def __repr__(self) -> str:
+        return f"SerializedDriver({self._driver!r})"
+
+
+def serialize_driver(driver, name: str = 'webdriver') -> SerializedDriver:
+    """Route all access to driver through its own executor thread"""
+    if isinstance(driver, SerializedDriver):
+        return driver
+    return SerializedDriver(driver, DriverExecutor(name))
+
+
+def driver_stats(driver) -> Optional[Dict[str, Any]]:
+    """Executor stats for a serialized driver, None for anything else"""
+    if isinstance(driver, SerializedDriver):
+        return driver.executor.stats()
+    return None
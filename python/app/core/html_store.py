@@ -0,0 +1,146 @@
+"""
+Compressed, lazily decoded storage for scraped row HTML
+WhatsApp rows are 1-2 KB of generated class names each; messages keep their
+outerHTML as zlib-compressed bytes and only decode it when a consumer (the
+Django upload, a saved capture, a re-parse) asks for it. Optional minifying
+drops the obfuscated class names and presentation attributes before storage
+and transfer.
+"""
+
+import html as html_lib
+import os
+import re
+import zlib
+from html.parser import HTMLParser
+from typing import Any, Optional
+
+HTML_MODES = ('raw', 'compressed', 'minified')
+DEFAULT_HTML_MODE = os.environ.get('CRAWLER_HTML_MODE', 'compressed')
+
+COMPRESSION_LEVEL = 6
+
+# Class tokens worth keeping: readable dashed names (copyable-text, message-in,
+# read-more-button). Generated ones (x78zum5, _amjv) change with every WhatsApp build.
+_SEMANTIC_CLASS = re.compile(r'^[a-z]+(?:-[a-z]+)+$')
+
+# Presentation-only attributes; 'd' is SVG icon geometry
+_DROPPED_ATTRIBUTES = frozenset(('style', 'tabindex', 'data-virtualized', 'draggable', 'd'))
+
+_VOID_TAGS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+                        'meta', 'source', 'track', 'wbr'))
+
+
+class CompressedHtml:
+    """
+    outerHTML held as zlib bytes. str() decodes it; compares equal to the original string.
+    Serialize with json.dumps(..., default=html_json_default).
+    """
+
+    __slots__ = ('_data', '_length')
+
+    def __init__(self, html: str):
+        html = html or ''
+        self._data = zlib.compress(html.encode('utf-8'), COMPRESSION_LEVEL)
+        self._length = len(html)
+
+    def __str__(self) -> str:
+        return zlib.decompress(self._data).decode('utf-8')
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, CompressedHtml):
+            return self._data == other._data
+        if isinstance(other, str):
+            return len(other) == self._length and str(self) == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self._data)
+
+    def __getstate__(self):
+        return (self._data, self._length)
+
+    def __setstate__(self, state):
+        self._data, self._length = state
+
+    @property
+    def compressed_size(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"CompressedHtml({self._length} chars, {len(self._data)} bytes)"
+
+
+class _Minifier(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+
+    def _start(self, tag, attrs, close=''):
+        kept = []
+        for name, value in attrs:
+            if name in _DROPPED_ATTRIBUTES:
+                continue
+            if name == 'class':
+                value = ' '.join(token for token in (value or '').split() if _SEMANTIC_CLASS.match(token))
+                if not value:
+                    continue
+            if value is None:
+                kept.append(f' {name}')
+            else:
+                kept.append(f' {name}="{html_lib.escape(value, quote=True)}"')
+        self.parts.append(f"<{tag}{''.join(kept)}{close}>")
+
+    def handle_starttag(self, tag, attrs):
+        self._start(tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        self._start(tag, attrs, close='' if tag in _VOID_TAGS else '/')
+
+    def handle_endtag(self, tag):
+        if tag not in _VOID_TAGS:
+            self.parts.append(f"</{tag}>")
+
+    def handle_data(self, data):
+        self.parts.append(html_lib.escape(data, quote=False))
+
+
+def minify_html(html: str) -> str:
+    """Drop generated class names, presentation attributes and comments; text and structure are kept"""
+    if not html:
+        return html or ''
+    try:
+        minifier = _Minifier()
+        minifier.feed(html)
+        minifier.close()
+        return ''.join(minifier.parts)
+    except Exception as e:
+        print(f"⚠️ HTML minify failed, keeping original: {e}")
+        return html
+
+
+def store_html(html: Optional[str], mode: str = None) -> Any:
+    """Row HTML in the configured storage mode ('raw' keeps the plain string)"""
+    mode = mode or DEFAULT_HTML_MODE
+    if not html or mode == 'raw':
+        return html
+    if mode == 'minified':
+        html = minify_html(html)
+    return CompressedHtml(html)
+
+
+def html_text(html: Any) -> str:
+    """Plain string for a stored value (str, CompressedHtml or None)"""
+    return str(html) if html is not None else ''
+
+
+def html_json_default(value: Any):
+    """json.dumps default= hook: CompressedHtml goes over the wire as its HTML"""
+    if isinstance(value, CompressedHtml):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,126 @@
+"""
+Structured order item grammar
+Parses an item line like "2 x 10kg tomatoes" into quantity, multiplier,
+packaging size, unit and product text with precompiled patterns, so the
+routes, the parser and Django all read the same fields instead of
+re-parsing the raw text
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+ITEM_CACHE_SIZE = 8192
+
+_CONTAINERS = r'bags?|boxes?|pcs?|pieces?|pkts?|packets?|heads?|bunches?'
+_MEASURES = r'kg|g|ml|l'
+
+# Quantity (lowercased line). Leading "N x ..." or "N <container>", else trailing "xN",
+# else "<N><measure> product" (one package), else a bare leading number
+_LEAD_QUANTITY = re.compile(rf'^(\d+)(?:\s*(?P<mult>[x×*])|\s+(?P<container>{_CONTAINERS}))')
+_END_MULTIPLIER = re.compile(r'\s+[x×*](\d+)$')
+_PACKAGE_ONLY = re.compile(rf'^\d+\s*(?:{_MEASURES})\s+\w+')
+_LEADING_NUMBER = re.compile(r'^(\d+)\s+')
+
+# Packaging size anywhere in the (lowercased) line: "10kg", "500 g", "2l"
+_PACKAGE_SIZE = re.compile(rf'(\d+(?:[.,]\d+)?)\s*({_MEASURES})(?![a-z])')
+
+# Product text (original case): strip multiplier, container quantity, container after
+# a packaging size and a bare leading count, keeping the packaging size itself
+_STRIP_MULTIPLIER = re.compile(r'^\d+\s*[x×*]\s*')
+_STRIP_CONTAINER = re.compile(rf'^\d+\s+({_CONTAINERS})\s*')
+_STRIP_PACKAGE_CONTAINER = re.compile(rf'(\d+\s*({_MEASURES}))\s+(bags?|boxes?)\s*')
+_STRIP_COUNT = re.compile(r'^\d+\s+(?!\d*(kg|g|ml|l|box|bag))')
+_SPACES = re.compile(r'\s+')
+
+_UNIT_NAMES = {
+    'bag': 'bag', 'bags': 'bag',
+    'box': 'box', 'boxes': 'box',
+    'pc': 'pcs', 'pcs': 'pcs', 'piece': 'pcs', 'pieces': 'pcs',
+    'pkt': 'pkt', 'pkts': 'pkt', 'packet': 'pkt', 'packets': 'pkt',
+    'head': 'head', 'heads': 'head',
+    'bunch': 'bunch', 'bunches': 'bunch',
+}
+
+
+class ParsedItem(NamedTuple):
+    """One order/stock line broken into its parts (quantity is a string, as the API always returned it)"""
+    raw_text: str
+    product: str
+    quantity: str
+    multiplier: Optional[str]    # "2" in "2 x 10kg tomatoes" or "lettuce x2"
+    package_size: Optional[str]  # "10kg"
+    unit: Optional[str]          # container (bag, box, pcs, ...) or the packaging measure (kg, g, ml, l)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+def quantity_of(text: str) -> str:
+    """Quantity from text - understanding multipliers vs packaging ("2 x 10kg" -> "2", "5kg tomatoes" -> "1")"""
+    text = text.strip().lower()
+
+    lead = _LEAD_QUANTITY.match(text)
+    if lead:
+        return lead.group(1)
+
+    end_multiplier = _END_MULTIPLIER.search(text)
+    if end_multiplier:
+        return end_multiplier.group(1)
+
+    if _PACKAGE_ONLY.match(text):
+        return "1"
+
+    leading_number = _LEADING_NUMBER.match(text)
+    if leading_number:
+        return leading_number.group(1)
+
+    return "1"
+
+
+def product_of(text: str) -> str:
+    """Product name with packaging kept ("2 x 10kg bags red onions" -> "10kg red onions")"""
+    text = text.strip()
+    text = _STRIP_MULTIPLIER.sub('', text, count=1)
+    text = _STRIP_CONTAINER.sub('', text, count=1)
+    text = _STRIP_PACKAGE_CONTAINER.sub(r'\1 ', text)
+    text = _STRIP_COUNT.sub('', text, count=1)
+    return _SPACES.sub(' ', text).strip()
+
+
+@lru_cache(maxsize=ITEM_CACHE_SIZE)
+def parse_item(text: str) -> ParsedItem:
+    """Parse one item line (memoized; item lines repeat from order to order)"""
+    lowered = text.strip().lower()
+
+    multiplier = None
+    unit = None
+    lead = _LEAD_QUANTITY.match(lowered)
+    if lead and lead.group('mult'):
+        multiplier = lead.group(1)
+    elif lead:
+        unit = _UNIT_NAMES.get(lead.group('container'))
+    else:
+        end_multiplier = _END_MULTIPLIER.search(lowered)
+        if end_multiplier:
+            multiplier = end_multiplier.group(1)
+
+    package_size = None
+    package = _PACKAGE_SIZE.search(lowered)
+    if package:
+        package_size = package.group(1) + package.group(2)
+        unit = unit or package.group(2)
+
+    return ParsedItem(
+        raw_text=text,
+        product=product_of(text),
+        quantity=quantity_of(text),
+        multiplier=multiplier,
+        package_size=package_size,
+        unit=unit
+    )
+
+
+def parse_items(lines: Iterable[str]) -> List[ParsedItem]:
+    """Parse many item lines at once"""
+    return [parse_item(line) for line in lines]
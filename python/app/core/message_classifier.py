@@ -0,0 +1,48 @@
+"""
+WhatsApp message classification
+Kept free of Selenium imports so offline tools (and worker processes) can
+classify messages without loading the crawler
+"""
+
+import re
+
+
+def classify_message(content, media_type="text"):
+    """Classify message with improved stock detection"""
+    if media_type == "image":
+        return 'image'
+    if media_type == "voice":
+        return 'voice'
+    if media_type == "video":
+        return 'video'
+    if media_type != "text":
+        return 'other'
+
+    content_upper = content.upper()
+
+    # Order day demarcation indicators
+    demarcation_keywords = ['ORDERS STARTS HERE', 'THURSDAY ORDERS', 'TUESDAY ORDERS', 'MONDAY ORDERS']
+    if any(keyword in content_upper for keyword in demarcation_keywords):
+        return 'demarcation'
+
+    # Enhanced stock indicators - including SHALLOME
+    stock_keywords = ['STOCK', 'AVAILABLE', 'INVENTORY', 'SUPPLY', 'STOKE', 'SHALLOME']
+    if any(keyword in content_upper for keyword in stock_keywords):
+        return 'stock'
+
+    # Order indicators
+    order_keywords = ['ORDER', 'NEED', 'WANT', 'KG', 'BOXES', 'X1', 'X2', 'X3', 'X4', 'X5']
+    quantity_patterns = ['\\d+\\s*KG', '\\d+\\s*X', 'X\\d+']
+
+    has_order_keywords = any(keyword in content_upper for keyword in order_keywords)
+    has_quantities = any(re.search(pattern, content_upper) for pattern in quantity_patterns)
+
+    if has_order_keywords or has_quantities:
+        return 'order'
+
+    # Instruction indicators
+    instruction_keywords = ['GOOD MORNING', 'HELLO', 'HI', 'THANKS', 'PLEASE', 'NOTE']
+    if any(keyword in content_upper for keyword in instruction_keywords):
+        return 'instruction'
+
+    return 'other'
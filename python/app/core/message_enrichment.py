@@ -0,0 +1,112 @@
+"""
+Memoized parser enrichment for the messages API
+/api/messages is polled constantly by the Flutter app; the company name,
+order items and instructions of a message are computed once per distinct
+content (keyed by its verification_hash and the parser ruleset version) and
+overlaid on a copy of the message at response time, leaving crawler.messages
+untouched
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.message_feed import project
+from app.core.scraped_message import message_json
+
+DEFAULT_ENRICHMENT_CACHE_SIZE = 20000
+
+# Fields the parser fills in
+ENRICHED_FIELDS = frozenset(('company_name', 'parsed_items', 'instructions'))
+
+
+class MessageEnrichmentCache:
+    """verification_hash -> enrichment fields, LRU-bounded"""
+
+    def __init__(self, parser, max_size: int = DEFAULT_ENRICHMENT_CACHE_SIZE):
+        self.parser = parser
+        self.max_size = max_size
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, message) -> str:
+        return message.get('verification_hash') or message.get('id') or ''
+
+    def _compute(self, message) -> Dict[str, Any]:
+        content = message.get('content') or ''
+        fields = {}
+
+        # Extract company name if present
+        company = self.parser.to_canonical_company(content)
+        if company:
+            fields['company_name'] = company
+
+        # Extract order items if it's an order message
+        if message.get('message_type') == 'order':
+            instructions = self.parser.extract_instructions(content)
+            fields['parsed_items'] = self.parser.extract_order_items(content)
+            fields['instructions'] = '\n'.join(instructions) if instructions else ""
+
+        return fields
+
+    def enrichment(self, message) -> Dict[str, Any]:
+        """Fields the parser adds to message (shared cached dict - don't mutate)"""
+        key = self._key(message)
+        content = message.get('content')
+        message_type = message.get('message_type')
+        version = self.parser.ruleset_version
+
+        with self._lock:
+            entry = self._entries.get(key)
+            # The hash only covers the first 100 characters, so the content itself is checked too
+            if entry is not None and entry[0] == version and entry[1] == message_type and entry[2] == content:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[3]
+
+        fields = self._compute(message)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (version, message_type, content, fields)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return fields
+
+    def enriched(self, message, fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+        """
+        A JSON-ready copy of message with the parser fields applied.
+        fields (see message_feed.parse_fields) limits the copy to those keys, so
+        unrequested fields are never copied or encoded.
+        """
+        if fields is None:
+            data = dict(message_json(message))
+            data.update(self.enrichment(message))
+            return data
+
+        data = project(message, fields)
+        if ENRICHED_FIELDS.intersection(fields):
+            for key, value in self.enrichment(message).items():
+                if key in fields:
+                    data[key] = value
+        return data
+
+    def invalidate(self, message) -> bool:
+        """Forget a message's enrichment (after an edit)"""
+        with self._lock:
+            return self._entries.pop(self._key(message), None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else None
+        }
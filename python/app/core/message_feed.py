@@ -0,0 +1,126 @@
+"""
+Incremental reads of the scraped message list
+A version tag for the current message set (for ETag / 304 handling),
+since_id/limit paging over the list's stable chat order and fields=
+projections, so polling clients only download what changed and what they show
+"""
+
+import hashlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_PAGE_LIMIT = None  # No limit unless the client asks for one
+MAX_PAGE_LIMIT = 1000
+
+# Named fieldsets for fields=; None means every field
+MESSAGE_PROJECTIONS = {
+    'summary': ('id', 'timestamp', 'content', 'message_type', 'company_name'),
+    'compact': ('id', 'chat', 'sender', 'content', 'timestamp', 'message_type', 'items', 'instructions',
+                'media_type', 'media_url', 'media_info', 'company_name', 'parsed_items', 'timestamp_source',
+                'edited', 'original_content', 'edited_at'),
+    'full': None,
+}
+
+ORDER_PROJECTIONS = {
+    'summary': ('company_name', 'items_text', 'timestamp', 'message_ids'),
+    'full': None,
+}
+
+# Always sent so clients can page and match responses up
+REQUIRED_MESSAGE_FIELDS = ('id',)
+
+
+def message_set_version(messages: Sequence[Any], *extra: Any) -> str:
+    """
+    Short digest of the message set: ids, full content, message types and edit times in
+    order, plus anything else the response depends on (e.g. the parser ruleset version).
+    The full content is hashed because verification_hash only covers its first 100
+    characters: an expanded "Read more" message keeps both its id and its hash.
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    for part in extra:
+        digest.update(f"{part}\x1f".encode('utf-8'))
+    for message in messages:
+        digest.update(f"{message.get('id')}\x1f{message.get('message_type') or ''}\x1f"
+                      f"{message.get('edited_at') or ''}\x1f{message.get('content') or ''}\x1e".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def page_etag(version: str, since_id: Optional[str] = None, limit: Optional[int] = None,
+              fields: Optional[Tuple[str, ...]] = None) -> str:
+    """ETag for one page (and projection) of a message set version"""
+    if not since_id and limit is None and fields is None:
+        return version
+    key = f"{version}\x1f{since_id or ''}\x1f{limit}\x1f{','.join(fields) if fields is not None else '*'}"
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def parse_fields(value: Any, projections: Dict[str, Optional[Tuple[str, ...]]] = MESSAGE_PROJECTIONS,
+                 required: Tuple[str, ...] = REQUIRED_MESSAGE_FIELDS) -> Optional[Tuple[str, ...]]:
+    """
+    fields= value -> ordered field names, or None for every field.
+    Accepts projection names and field names, comma separated or as a list
+    ("summary", "id,content", "summary,media_url"); "full" or nothing means everything.
+    """
+    if value in (None, ''):
+        return None
+    names = value if isinstance(value, (list, tuple)) else str(value).split(',')
+    fields: List[str] = list(required)
+    for name in (n.strip() for n in names):
+        if not name:
+            continue
+        if name in projections:
+            if projections[name] is None:
+                return None
+            fields.extend(projections[name])
+        else:
+            fields.append(name)
+    return tuple(dict.fromkeys(fields))
+
+
+def project(data: Any, fields: Optional[Tuple[str, ...]]) -> Dict[str, Any]:
+    """Only the requested fields of a message/order (missing ones are left out)"""
+    if fields is None:
+        return dict(data)
+    return {field: data[field] for field in fields if field in data}
+
+
+def parse_limit(value: Any) -> Optional[int]:
+    """limit query value -> 1..MAX_PAGE_LIMIT, or None for everything"""
+    if value in (None, ''):
+        return DEFAULT_PAGE_LIMIT
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_LIMIT
+    return max(1, min(limit, MAX_PAGE_LIMIT)) if limit > 0 else DEFAULT_PAGE_LIMIT
+
+
+def page_after(messages: Sequence[Any], since_id: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Messages after since_id (chat order), at most limit of them.
+
+    Returns {messages, next_cursor, has_more, reset}: next_cursor is the id to pass as
+    since_id next time; reset is True when since_id is no longer in the list (the chat was
+    re-scraped), in which case paging restarts from the first message.
+    """
+    start = 0
+    reset = False
+    if since_id:
+        position = next((i for i in range(len(messages) - 1, -1, -1) if messages[i].get('id') == since_id), None)
+        if position is None:
+            reset = True
+        else:
+            start = position + 1
+
+    end = len(messages) if limit is None else min(len(messages), start + limit)
+    page: List[Any] = list(messages[start:end])
+    if page:
+        next_cursor = page[-1].get('id')
+    else:
+        next_cursor = since_id if not reset else None
+    return {
+        'messages': page,
+        'next_cursor': next_cursor,
+        'has_more': end < len(messages),
+        'reset': reset
+    }
@@ -0,0 +1,225 @@
+"""
+Durable outbox between the WhatsApp crawler and Django
+Extracted messages are committed to a local SQLite (WAL) database first and
+delivered by a background sender, so a Django outage or a crawler restart
+neither loses messages nor forces them to be scraped again
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.core.html_store import html_json_default
+
+PENDING = 'pending'
+DELIVERED = 'delivered'
+FAILED = 'failed'  # Gave up after max_attempts; kept for inspection, never sent again
+
+DEFAULT_MAX_ATTEMPTS = 10
+
+# Delivered rows are kept (without their payload) for dedupe and resume, then purged
+DELIVERED_RETENTION_SECONDS = 14 * 24 * 3600
+PURGE_INTERVAL_SECONDS = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    fingerprint TEXT,
+    timestamp TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    queued_at REAL NOT NULL,
+    delivered_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, queued_at);
+"""
+
+
+class MessageOutbox:
+    """SQLite-backed queue of messages with per-message delivery state"""
+
+    def __init__(self, path: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    def enqueue(self, messages: Iterable[Dict], fingerprints: Optional[Dict[str, str]] = None) -> List[str]:
+        """
+        Commit messages for delivery. A message already in the outbox is only queued
+        again if its fingerprint changed (an edited message). Returns the ids queued.
+        """
+        fingerprints = fingerprints or {}
+        queued = []
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for message in messages:
+                    message_id = message['id']
+                    fingerprint = fingerprints.get(message_id)
+                    row = self._conn.execute('SELECT fingerprint FROM outbox WHERE id = ?', (message_id,)).fetchone()
+                    if row is not None and (fingerprint is None or row[0] == fingerprint):
+                        continue
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO outbox (id, payload, fingerprint, timestamp, status, queued_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?)',
+                        (message_id, json.dumps(message, default=html_json_default), fingerprint, message.get('timestamp'), PENDING, now)
+                    )
+                    queued.append(message_id)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return queued
+
+    def pending(self, limit: int = 100) -> List[Dict]:
+        """Undelivered messages, fewest failed attempts first (so rejected rows can't starve new ones), then oldest"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT payload FROM outbox WHERE status = ? ORDER BY attempts, queued_at, rowid LIMIT ?',
+                (PENDING, limit)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def mark_delivered(self, message_ids: Iterable[str]):
+        """Mark delivered and drop the payload; the id, fingerprint and timestamp are all that's needed after this"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE outbox SET status = ?, delivered_at = ?, last_error = NULL, payload = '' WHERE id = ?",
+                [(DELIVERED, now, message_id) for message_id in message_ids]
+            )
+
+    def mark_failed(self, message_ids: Iterable[str], error: str = ''):
+        """Count a failed attempt; after max_attempts the message moves to FAILED"""
+        with self._lock:
+            self._conn.executemany(
+                'UPDATE outbox SET attempts = attempts + 1, last_error = ?, '
+                'status = CASE WHEN attempts + 1 >= ? THEN ? ELSE status END '
+                'WHERE id = ? AND status = ?',
+                [(error, self.max_attempts, FAILED, message_id, PENDING) for message_id in message_ids]
+            )
+
+    def retry_failed(self) -> int:
+        """Queue FAILED messages again with a fresh attempt count. Returns how many."""
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE outbox SET status = ?, attempts = 0 WHERE status = ?', (PENDING, FAILED)
+            )
+        return cursor.rowcount
+
+    def fingerprints(self) -> Dict[str, str]:
+        """data-id -> fingerprint of everything in the outbox (to seed the processed index)"""
+        with self._lock:
+            rows = self._conn.execute('SELECT id, fingerprint FROM outbox WHERE fingerprint IS NOT NULL').fetchall()
+        return dict(rows)
+
+    def newest_timestamp(self) -> Optional[str]:
+        """Newest message timestamp in the outbox, delivered or not (None when empty)"""
+        with self._lock:
+            row = self._conn.execute('SELECT MAX(timestamp) FROM outbox').fetchone()
+        return row[0] if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM outbox GROUP BY status').fetchall()
+        counts = {PENDING: 0, DELIVERED: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def purge_delivered(self, older_than_seconds: float = DELIVERED_RETENTION_SECONDS) -> int:
+        """Drop delivered rows older than the cutoff. Returns the number removed."""
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            cursor = self._conn.execute(
+                'DELETE FROM outbox WHERE status = ? AND delivered_at < ?', (DELIVERED, cutoff)
+            )
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class OutboxSender(threading.Thread):
+    """Background thread that drains the outbox through a DjangoUploader"""
+
+    def __init__(self, outbox: MessageOutbox, uploader, batch_size: int = 100, idle_interval: float = 5.0,
+                 retry_interval: float = 30.0, on_delivered: Optional[Callable[[List[str]], None]] = None,
+                 purge_interval: float = PURGE_INTERVAL_SECONDS):
+        super().__init__(daemon=True, name='outbox-sender')
+        self.outbox = outbox
+        self.uploader = uploader
+        self.batch_size = batch_size
+        self.idle_interval = idle_interval
+        self.retry_interval = retry_interval
+        self.on_delivered = on_delivered
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+    def notify(self):
+        """Wake the sender right away (new messages were queued)"""
+        self._wake.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def drain_once(self) -> Dict:
+        """Send one batch. Returns {'delivered': n, 'failed': n}."""
+        batch = self.outbox.pending(self.batch_size)
+        if not batch:
+            return {'delivered': 0, 'failed': 0}
+
+        result = self.uploader.upload(batch)
+        if result['delivered_ids']:
+            self.outbox.mark_delivered(result['delivered_ids'])
+            if self.on_delivered:
+                self.on_delivered(result['delivered_ids'])
+        if result['failed_ids']:
+            self.outbox.mark_failed(result['failed_ids'], f"{result['failed_chunks']} chunks failed")
+
+        print(f"📤 [OUTBOX] Delivered {len(result['delivered_ids'])}/{len(batch)} queued messages")
+        return {'delivered': len(result['delivered_ids']), 'failed': len(result['failed_ids'])}
+
+    def purge_if_due(self) -> int:
+        """Drop old delivered rows, at most once per purge_interval"""
+        now = time.monotonic()
+        if now < self._next_purge:
+            return 0
+        self._next_purge = now + self.purge_interval
+        removed = self.outbox.purge_delivered()
+        if removed:
+            print(f"🧹 [OUTBOX] Purged {removed} delivered messages")
+        return removed
+
+    def run(self):
+        print("📮 [OUTBOX] Sender started")
+        while not self._stopped.is_set():
+            try:
+                self.purge_if_due()
+                sent = self.drain_once()
+            except Exception as e:
+                print(f"⚠️ [OUTBOX] Send error: {e}")
+                sent = {'delivered': 0, 'failed': 1}
+
+            if sent['failed']:
+                wait = self.retry_interval
+            elif sent['delivered']:
+                continue  # Keep draining while there is a backlog
+            else:
+                wait = self.idle_interval
+
+            self._wake.wait(wait)
+            self._wake.clear()
+        print("📮 [OUTBOX] Sender stopped")
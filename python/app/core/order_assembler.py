@@ -0,0 +1,152 @@
+"""
+Incremental order assembly for WhatsApp messages
+Feeds messages one at a time (or in small batches from the crawler) through
+the same rules as MessageParser.parse_messages_to_orders, keeping the pending
+items buffer, the items-before-company look-ahead and the consolidated
+per-company orders between calls
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class OrderAssembler:
+    """
+    Stateful counterpart of MessageParser.parse_messages_to_orders
+
+    A message with items can't be placed until the next message is seen (it may be
+    the company name), so it is held as pending. finish() resolves it as the last
+    message; orders() shows the result as if the stream ended now, without finishing.
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.buffer: List[str] = []  # Items/instructions waiting for a company-only message
+        self.pending: Optional[Tuple[Dict[str, Any], List]] = None  # Message with items awaiting look-ahead
+        self._orders: Dict[str, Dict[str, Any]] = {}  # Consolidated orders by company, in first-seen order
+
+    def feed(self, message: Dict[str, Any]) -> List[str]:
+        """Add the next message. Returns the companies whose consolidated order changed."""
+        lines = self.parser.classify_lines(message.get('content', '').strip())
+        changed = []
+
+        # Any message, even an empty one, is the "next message" for the pending look-ahead
+        if self.pending is not None:
+            changed.extend(self._resolve_pending(message, lines))
+
+        if not lines:
+            return changed
+
+        # Company-only message: flush the buffer to this company
+        if len(lines) == 1 and lines[0].company:
+            if self.buffer:
+                order = self.parser._create_order_from_buffer(lines[0].company, self.buffer, message)
+                if order:
+                    changed.append(self._add_order(order))
+                self.buffer = []
+            return changed
+
+        if any(line.is_item for line in lines):
+            self.pending = (message, lines)
+
+        return changed
+
+    def feed_many(self, messages: Iterable[Dict[str, Any]]) -> List[str]:
+        changed = []
+        for message in messages:
+            for company in self.feed(message):
+                if company not in changed:
+                    changed.append(company)
+        return changed
+
+    def finish(self) -> List[str]:
+        """End of the stream: place the pending message with no look-ahead"""
+        if self.pending is None:
+            return []
+        return self._resolve_pending(None, None)
+
+    def orders(self) -> List[Dict[str, Any]]:
+        """Consolidated orders so far, including what the pending message would add at end of stream"""
+        preview = self._pending_order_without_next()
+        orders = []
+        for company, order in self._orders.items():
+            order = self._new_consolidated(order)
+            if preview and preview['company_name'] == company:
+                self._merged(order, preview)
+                preview = None
+            orders.append(order)
+        if preview:
+            orders.append(self._new_consolidated(preview))
+        return orders
+
+    def _order(self, company: str, message: Dict[str, Any], lines: List, message_ids: List[str]) -> Dict[str, Any]:
+        return {
+            'company_name': company,
+            'items_text': [line.text for line in lines if line.is_order_item],
+            'instructions': [line.text for line in lines if line.is_instruction],
+            'timestamp': message.get('timestamp', ''),
+            'message_ids': message_ids
+        }
+
+    def _mixed_content_order(self, message: Dict[str, Any], lines: List) -> Optional[Dict[str, Any]]:
+        """Order for a message naming its own company (first company line wins)"""
+        company = next((line.company for line in lines if line.company), None)
+        if company and any(line.is_order_item for line in lines):
+            return self._order(company, message, lines, [message.get('id', '')])
+        return None
+
+    def _pending_order_without_next(self) -> Optional[Dict[str, Any]]:
+        """The order the pending message yields if no message follows"""
+        if self.pending is None:
+            return None
+        return self._mixed_content_order(*self.pending)
+
+    def _resolve_pending(self, next_message: Optional[Dict[str, Any]], next_lines: Optional[List]) -> List[str]:
+        message, lines = self.pending
+        self.pending = None
+        items = [line.text for line in lines if line.is_order_item]
+
+        # Items-before-company: the next message is just a company name
+        if next_lines is not None and len(next_lines) == 1 and next_lines[0].company:
+            if items:
+                order = self._order(next_lines[0].company, message, lines,
+                                    [message.get('id', ''), next_message.get('id', '')])
+                return [self._add_order(order)]
+            return []
+
+        # Mixed content: items and company in the same message
+        if any(line.company for line in lines):
+            order = self._mixed_content_order(message, lines)
+            return [self._add_order(order)] if order else []
+
+        # Items without a company wait in the buffer
+        self.buffer.extend(items)
+        self.buffer.extend(line.text for line in lines if line.is_instruction)
+        return []
+
+    @staticmethod
+    def _new_consolidated(order: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'company_name': order['company_name'],
+            'items_text': list(order['items_text']),
+            'instructions': list(order['instructions']),
+            'timestamp': order['timestamp'],
+            'message_ids': list(order['message_ids'])
+        }
+
+    @staticmethod
+    def _merged(consolidated: Dict[str, Any], order: Dict[str, Any]) -> Dict[str, Any]:
+        consolidated['items_text'].extend(order['items_text'])
+        consolidated['instructions'].extend(order['instructions'])
+        consolidated['message_ids'].extend(order['message_ids'])
+        # Keep earliest timestamp
+        if order['timestamp'] < consolidated['timestamp']:
+            consolidated['timestamp'] = order['timestamp']
+        return consolidated
+
+    def _add_order(self, order: Dict[str, Any]) -> str:
+        company = order['company_name']
+        if company not in self._orders:
+            self._orders[company] = self._new_consolidated(order)
+        else:
+            self._merged(self._orders[company], order)
+        return company
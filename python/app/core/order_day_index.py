@@ -0,0 +1,205 @@
+"""
+Order-day partitions over the scraped message stream
+Each "<Day> orders start here" demarcation opens a new partition; the index
+keeps every partition's position range, message id range, time bounds and
+per-company offsets, and is extended incrementally as messages arrive, so
+one day's messages can be fetched (and re-parsed) without walking the history
+"""
+
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.core.message_classifier import classify_message
+
+_WEEKDAY = re.compile(r'\b(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b', re.IGNORECASE)
+
+
+def message_date(timestamp: str) -> Optional[str]:
+    """YYYY-MM-DD for a scraped timestamp ('HH:MM, DD/MM/YYYY' or ISO), None if unparseable"""
+    if not timestamp:
+        return None
+    try:
+        if ', ' in timestamp:
+            return datetime.strptime(timestamp.split(', ', 1)[1].strip(), '%d/%m/%Y').date().isoformat()
+        return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).date().isoformat()
+    except ValueError:
+        return None
+
+
+class OrderDayPartition:
+    """Messages [start, end) of the stream, opened by a demarcation message (or the start of history)"""
+
+    def __init__(self, number: int, start: int, demarcation: Optional[Dict[str, Any]] = None):
+        self.number = number
+        self.start = start
+        self.end = start
+        self.label = None
+        self.demarcation_id = None
+        if demarcation is not None:
+            self.demarcation_id = demarcation.get('id')
+            weekday = _WEEKDAY.search(demarcation.get('content') or '')
+            self.label = weekday.group(1).capitalize() if weekday else None
+        self.first_id = None
+        self.last_id = None
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.date = None
+        self.company_offsets: Dict[str, List[int]] = {}  # company -> offsets (from start) of messages naming it
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def _add(self, message: Dict[str, Any], company: Optional[str]):
+        offset = self.end - self.start
+        self.end += 1
+        message_id = message.get('id')
+        timestamp = message.get('timestamp') or ''
+        if self.first_id is None:
+            self.first_id = message_id
+        self.last_id = message_id
+        if timestamp:
+            if self.first_timestamp is None:
+                self.first_timestamp = timestamp
+            self.last_timestamp = timestamp
+            self.date = self.date or message_date(timestamp)
+        if company:
+            self.company_offsets.setdefault(company, []).append(offset)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'number': self.number,
+            'label': self.label,
+            'date': self.date,
+            'demarcation_id': self.demarcation_id,
+            'start': self.start,
+            'end': self.end,
+            'message_count': len(self),
+            'first_id': self.first_id,
+            'last_id': self.last_id,
+            'first_timestamp': self.first_timestamp,
+            'last_timestamp': self.last_timestamp,
+            'companies': {company: len(offsets) for company, offsets in self.company_offsets.items()}
+        }
+
+
+class OrderDayIndex:
+    """
+    Partition index over an append-only message list
+
+    company_of: text -> canonical company (e.g. MessageParser.to_canonical_company);
+    without it no company offsets are kept.
+    """
+
+    def __init__(self, company_of: Optional[Callable[[str], Optional[str]]] = None):
+        self.company_of = company_of
+        self.messages: List[Dict[str, Any]] = []
+        self.partitions: List[OrderDayPartition] = []
+        self._positions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def add(self, message: Dict[str, Any]) -> OrderDayPartition:
+        """Append one message; returns the partition it landed in"""
+        content = message.get('content') or ''
+        is_demarcation = classify_message(content) == 'demarcation'
+        if is_demarcation or not self.partitions:
+            self.partitions.append(OrderDayPartition(len(self.partitions), len(self.messages),
+                                                     message if is_demarcation else None))
+        partition = self.partitions[-1]
+
+        company = self.company_of(content) if self.company_of and content else None
+        if message.get('id'):
+            self._positions[message['id']] = len(self.messages)
+        self.messages.append(message)
+        partition._add(message, company)
+        return partition
+
+    def extend(self, messages: Iterable[Dict[str, Any]]) -> int:
+        added = 0
+        for message in messages:
+            self.add(message)
+            added += 1
+        return added
+
+    def sync(self, messages: List[Dict[str, Any]]) -> int:
+        """
+        Catch up with a message list that normally only grows (crawler.messages).
+        Indexes just the new tail while the indexed prefix is still the very same message
+        objects; if any was replaced (a re-scrape builds new objects, possibly under the same
+        ids, e.g. a "Read more" expanded) the list is re-indexed. Returns how many messages were indexed.
+        """
+        known = len(self.messages)
+        if known <= len(messages) and all(new is old for new, old in zip(messages, self.messages)):
+            return self.extend(messages[known:])
+        self.rebuild(messages)
+        return len(self.messages)
+
+    def rebuild(self, messages: Iterable[Dict[str, Any]]):
+        self.messages = []
+        self.partitions = []
+        self._positions = {}
+        self.extend(messages)
+
+    def update(self, message_id: str) -> bool:
+        """Re-index from the partition holding an edited message onwards (its company or demarcation may have changed)"""
+        position = self._positions.get(message_id)
+        if position is None:
+            return False
+        partition = self.partition_at(position)
+        tail = self.messages[partition.start:]
+        del self.messages[partition.start:]
+        del self.partitions[partition.number:]
+        for moved in tail:
+            self._positions.pop(moved.get('id'), None)
+        self.extend(tail)
+        return True
+
+    def partition_at(self, position: int) -> OrderDayPartition:
+        """Partition containing a stream position (binary search over partition starts)"""
+        low, high = 0, len(self.partitions) - 1
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.partitions[mid].start <= position:
+                low = mid
+            else:
+                high = mid - 1
+        return self.partitions[low]
+
+    def partition_of(self, message_id: str) -> Optional[OrderDayPartition]:
+        position = self._positions.get(message_id)
+        return self.partition_at(position) if position is not None else None
+
+    def find(self, day: str) -> Optional[OrderDayPartition]:
+        """
+        Most recent partition for day: 'latest', a partition number, a weekday label
+        ('thursday') or a date ('2025-09-03' or '03/09/2025')
+        """
+        if not self.partitions or not day:
+            return None
+        day = day.strip()
+        if day.lower() in ('latest', 'today', 'current'):
+            return self.partitions[-1]
+        if day.isdigit():
+            number = int(day)
+            return self.partitions[number] if number < len(self.partitions) else None
+        if '/' in day:
+            try:
+                day = datetime.strptime(day, '%d/%m/%Y').date().isoformat()
+            except ValueError:
+                return None
+        for partition in reversed(self.partitions):
+            if (partition.label or '').lower() == day.lower() or partition.date == day:
+                return partition
+        return None
+
+    def messages_in(self, partition: OrderDayPartition) -> List[Dict[str, Any]]:
+        return self.messages[partition.start:partition.end]
+
+    def company_messages(self, partition: OrderDayPartition, company: str) -> List[Dict[str, Any]]:
+        """Messages of a partition that name company"""
+        return [self.messages[partition.start + offset] for offset in partition.company_offsets.get(company, [])]
+
+    def summary(self) -> List[Dict[str, Any]]:
+        return [partition.to_dict() for partition in self.partitions]
@@ -0,0 +1,152 @@
+"""
+Offline page-source parsing for the WhatsApp crawlers
+Parses one HTML snapshot locally and exposes it through the subset of the
+Selenium driver/element API the crawlers use, so the existing extraction
+logic runs against a local tree instead of the live WebDriver
+"""
+
+import re
+from typing import Optional
+
+from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import NoSuchElementException
+
+from app.core.dom_scripts import MAIN_HTML_SCRIPT
+
+# lxml is much faster on large chats; html.parser works everywhere
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# The only XPath form the crawlers use against message rows: .//*[contains(text(), ':')]
+CONTAINS_TEXT_XPATH = re.compile(r"""^\.//\*\[contains\(text\(\),\s*['"](?P<needle>[^'"]*)['"]\)\]$""")
+
+
+def _select(tag, by, selector):
+    """Run a Selenium-style locator against a BeautifulSoup tag"""
+    if by == By.CSS_SELECTOR:
+        try:
+            return tag.select(selector)
+        except Exception:
+            return []
+
+    if by == By.XPATH:
+        match = CONTAINS_TEXT_XPATH.match(selector)
+        if match:
+            needle = match.group('needle')
+            return tag.find_all(
+                lambda t: any(needle in s for s in t.find_all(string=True, recursive=False))
+            )
+        print(f"⚠️ [PAGE_SOURCE] Unsupported XPath in offline mode: {selector}")
+        return []
+
+    if by == By.ID:
+        found = tag.find(id=selector)
+        return [found] if found else []
+
+    if by == By.CLASS_NAME:
+        return tag.find_all(class_=selector)
+
+    if by == By.TAG_NAME:
+        return tag.find_all(selector)
+
+    print(f"⚠️ [PAGE_SOURCE] Unsupported locator in offline mode: {by}")
+    return []
+
+
+class PageSourceElement:
+    """A parsed node that quacks like a Selenium WebElement"""
+
+    def __init__(self, tag):
+        self._tag = tag
+
+    @property
+    def tag_name(self):
+        return self._tag.name
+
+    @property
+    def text(self):
+        # Approximates Selenium's rendered .text
+        return self._tag.get_text(" ", strip=True)
+
+    def get_attribute(self, name):
+        if name == 'textContent':
+            return self._tag.get_text()
+        if name == 'outerHTML':
+            return str(self._tag)
+        if name == 'innerHTML':
+            return self._tag.decode_contents()
+        value = self._tag.get(name)
+        if isinstance(value, list):
+            return ' '.join(value)
+        return value
+
+    def is_displayed(self):
+        return True
+
+    def find_elements(self, by, selector):
+        return [PageSourceElement(t) for t in _select(self._tag, by, selector)]
+
+    def find_element(self, by, selector):
+        elements = self.find_elements(by, selector)
+        if not elements:
+            raise NoSuchElementException(f"No offline element matches {selector}")
+        return elements[0]
+
+
+class PageSourceDriver:
+    """A parsed HTML snapshot that quacks like a Selenium WebDriver (read-only)"""
+
+    def __init__(self, soup):
+        self._soup = soup
+
+    @classmethod
+    def from_html(cls, html: str) -> 'PageSourceDriver':
+        """Parse a page, a #main snapshot or a bare list of saved rows"""
+        soup = BeautifulSoup(html or '', HTML_PARSER)
+        if soup.select_one('#main') is None:
+            # Saved row dumps have no chat wrapper; add one so '#main [role="row"]' still matches
+            soup = BeautifulSoup(f'<div id="main">{html or ""}</div>', HTML_PARSER)
+        return cls(soup)
+
+    @property
+    def page_source(self):
+        return str(self._soup)
+
+    def find_elements(self, by, selector):
+        return [PageSourceElement(t) for t in _select(self._soup, by, selector)]
+
+    def find_element(self, by, selector):
+        elements = self.find_elements(by, selector)
+        if not elements:
+            raise NoSuchElementException(f"No offline element matches {selector}")
+        return elements[0]
+
+    def execute_script(self, script, *args):
+        # Nothing to run against a snapshot; callers treat None as "no result"
+        return None
+
+
+def snapshot_driver(driver) -> Optional[PageSourceDriver]:
+    """
+    Grab the open chat (or the whole page) in one round trip and parse it locally.
+    Returns None if the snapshot could not be taken.
+    """
+    try:
+        html = driver.execute_script(MAIN_HTML_SCRIPT)
+        if not html:
+            html = driver.page_source
+        snapshot = PageSourceDriver.from_html(html)
+        print(f"📸 [PAGE_SOURCE] Parsed snapshot of {len(html)} chars with {HTML_PARSER}")
+        return snapshot
+    except Exception as e:
+        print(f"⚠️ [PAGE_SOURCE] Could not snapshot page: {e}")
+        return None
+
+
+def is_offline_element(element) -> bool:
+    """True for nodes from a parsed snapshot, which cannot be clicked"""
+    return isinstance(element, PageSourceElement)
@@ -0,0 +1,244 @@
+"""
+Process-wide, hot-reloadable parser configuration
+config/company_aliases.json (plus the product lexicon it points to) is read
+once, compiled into a ParserRuleset and shared by every MessageParser. A cheap
+mtime check swaps in a recompiled ruleset when either file changes, so alias
+and vocabulary edits apply without restarting the server (and losing the
+logged-in Chrome session)
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.core.alias_matcher import CompanyAliasMatcher, KeywordMatcher, QuantityDetector
+
+DEFAULT_CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'company_aliases.json'))
+
+# Used when the config file is missing or unreadable
+DEFAULT_COMPANY_ALIASES = {
+    "mugg and bean": "Mugg and Bean",
+    "mugg bean": "Mugg and Bean",
+    "mugg": "Mugg and Bean",
+    "venue": "Venue",
+    "debonairs": "Debonairs",
+    "t-junction": "T-junction",
+    "t junction": "T-junction",
+    "wimpy": "Wimpy",
+    "wimpy mooinooi": "Wimpy",
+    "shebeen": "Shebeen",
+    "casa bella": "Casa Bella",
+    "casabella": "Casa Bella",
+    "luma": "Luma",
+    "marco": "Marco",
+    "maltos": "Maltos"
+}
+
+DEFAULT_QUANTITY_PATTERNS = [
+    r'\d+\s*x\s*\d*\s*kg',  # 2x5kg, 10x kg
+    r'\d+\s*kg',            # 10kg, 5 kg
+    r'\d+\s*box',           # 3box, 5 box
+    r'\d+\s*boxes',         # 3boxes
+    r'x\d+',                # x3, x12
+    r'\d+x',                # 3x, 12x
+    r'\d+\*',               # 3*, 5*
+    r'\d+\s*pcs',           # 5pcs, 10 pcs
+    r'\d+\s*pieces',        # 5pieces
+    r'\d+\s*pkts',          # 6pkts
+    r'\d+\s*packets',       # 6packets
+    r'\d+\s*heads',         # 5heads
+    r'\d+\s*bunches',       # 10bunches
+]
+
+DEFAULT_FOOD_KEYWORDS = [
+    'tomato', 'potato', 'onion', 'lettuce', 'spinach', 'carrot',
+    'mushroom', 'pepper', 'cucumber', 'broccoli', 'cauliflower',
+    'cabbage', 'rocket', 'lemon', 'orange', 'banana', 'apple',
+    'avocado', 'corn', 'butternut', 'marrow', 'chilli', 'basil',
+    'parsley', 'coriander', 'rosemary', 'strawberry', 'lime',
+    'naartjie', 'ginger', 'garlic', 'herbs', 'greens'
+]
+
+DEFAULT_INSTRUCTION_KEYWORDS = [
+    'GOOD MORNING', 'MORNING', 'HELLO', 'HI', 'HALLO',
+    'THANKS', 'THANK YOU', 'PLEASE', 'PLZ', 'PLIZ',
+    'NOTE', 'REMEMBER', 'SEPARATE INVOICE', 'SEPERATE INVOICE',
+    'THAT\'S ALL', 'THATS ALL', 'TNX', 'CHEERS'
+]
+
+# Catalogue names shorter than this would match inside unrelated words
+MIN_PRODUCT_NAME_LENGTH = 3
+
+
+def load_product_lexicon(path: str) -> Dict[str, List[str]]:
+    """
+    Read a product lexicon file:
+    {"food_keywords": [...], "instruction_keywords": [...], "products": [...]}
+    "products" may be plain names or catalogue export rows with a "name" field,
+    and a bare list is treated as "products". Product names count as food keywords.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        lexicon = json.load(f)
+    if isinstance(lexicon, list):
+        lexicon = {'products': lexicon}
+
+    food = list(lexicon.get('food_keywords', DEFAULT_FOOD_KEYWORDS))
+    for product in lexicon.get('products', []):
+        name = product.get('name', '') if isinstance(product, dict) else str(product)
+        name = ' '.join(name.lower().split())
+        if len(name) >= MIN_PRODUCT_NAME_LENGTH:
+            food.append(name)
+
+    return {
+        'food_keywords': food,
+        'instruction_keywords': list(lexicon.get('instruction_keywords', DEFAULT_INSTRUCTION_KEYWORDS))
+    }
+
+
+class ParserRuleset:
+    """One compiled version of the parser config (never mutated after construction)"""
+
+    def __init__(self, version: int, company_aliases: Dict[str, str], quantity_patterns: List[str],
+                 source: str = 'defaults', mtime: Optional[float] = None,
+                 food_keywords: Optional[List[str]] = None, instruction_keywords: Optional[List[str]] = None):
+        self.version = version
+        self.source = source
+        self.mtime = mtime
+        self.company_aliases = company_aliases
+        self.quantity_patterns = quantity_patterns
+        self.food_keywords = food_keywords
+        self.instruction_keywords = instruction_keywords
+        self.company_matcher = CompanyAliasMatcher(company_aliases)
+        self.quantity_detector = QuantityDetector(quantity_patterns)
+        # Substring semantics as before: "tomato" matches "Tomatoes", "HI" matches "CHILLI"
+        self.food_matcher = KeywordMatcher(food_keywords or DEFAULT_FOOD_KEYWORDS, fold=str.lower)
+        self.instruction_matcher = KeywordMatcher(instruction_keywords or DEFAULT_INSTRUCTION_KEYWORDS, fold=str.upper)
+
+    def describe(self) -> Dict:
+        return {
+            'version': self.version,
+            'source': self.source,
+            'mtime': self.mtime,
+            'company_aliases': len(self.company_aliases),
+            'quantity_patterns': len(self.quantity_patterns),
+            'food_keywords': len(self.food_matcher),
+            'instruction_keywords': len(self.instruction_matcher)
+        }
+
+
+class ParserConfigRegistry:
+    """Holds the current ruleset for one config file and reloads it when the file changes"""
+
+    def __init__(self, path: str = DEFAULT_CONFIG_PATH, check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._stat_key = None
+        self._lexicon_path = None
+        self._ruleset = self._load(version=1, initial=True)
+
+    def _stat(self):
+        """Change key over the config file and the lexicon it names"""
+        key = []
+        for path in (self.path, self._lexicon_path):
+            try:
+                st = os.stat(path) if path else None
+                key.append((st.st_mtime_ns, st.st_size) if st else None)
+            except OSError:
+                key.append(None)
+        return tuple(key)
+
+    def _load(self, version: int, initial: bool = False) -> Optional[ParserRuleset]:
+        """Read and compile the config. On a failed reload returns None (keep the old ruleset)."""
+        config_mtime = None
+        try:
+            if os.path.exists(self.path):
+                config_mtime = os.path.getmtime(self.path)
+                with open(self.path, 'r') as f:
+                    config = json.load(f)
+
+                self._lexicon_path = None
+                if config.get('product_lexicon'):
+                    self._lexicon_path = os.path.join(os.path.dirname(self.path), config['product_lexicon'])
+                lexicon = self._load_lexicon(initial)
+
+                ruleset = ParserRuleset(
+                    version,
+                    config.get('company_aliases', {}),
+                    config.get('quantity_patterns', []),
+                    source=self.path,
+                    mtime=config_mtime,
+                    food_keywords=lexicon.get('food_keywords'),
+                    instruction_keywords=lexicon.get('instruction_keywords')
+                )
+                self._stat_key = self._stat()
+                return ruleset
+        except Exception as e:
+            print(f"⚠️ Failed to load parser config {self.path}: {e}")
+            if not initial:
+                # Keep serving the last good ruleset; retry when a file changes again
+                self._stat_key = self._stat()
+                return None
+
+        self._stat_key = self._stat()
+        return ParserRuleset(version, dict(DEFAULT_COMPANY_ALIASES), list(DEFAULT_QUANTITY_PATTERNS))
+
+    def _load_lexicon(self, initial: bool) -> Dict[str, List[str]]:
+        """
+        Keyword lists from the product lexicon. A broken lexicon only affects the
+        keywords (last good ones, or the defaults at startup), never the aliases.
+        """
+        if not self._lexicon_path:
+            return {}
+        try:
+            return load_product_lexicon(self._lexicon_path)
+        except Exception as e:
+            print(f"⚠️ Failed to load product lexicon {self._lexicon_path}: {e}")
+            if initial:
+                return {}
+            return {
+                'food_keywords': self._ruleset.food_keywords,
+                'instruction_keywords': self._ruleset.instruction_keywords
+            }
+
+    def current(self) -> ParserRuleset:
+        """The live ruleset; stats the file at most once per check_interval"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return self._ruleset
+        with self._lock:
+            if now >= self._next_check:
+                self._next_check = now + self.check_interval
+                if self._stat() != self._stat_key:
+                    self.reload()
+        return self._ruleset
+
+    def reload(self) -> ParserRuleset:
+        """Recompile now and swap the new ruleset in (a single reference assignment)"""
+        ruleset = self._load(version=self._ruleset.version + 1)
+        if ruleset is not None:
+            self._ruleset = ruleset
+            print(f"🔄 Parser config reloaded: v{ruleset.version} "
+                  f"({len(ruleset.company_aliases)} aliases, {len(ruleset.quantity_patterns)} quantity patterns, "
+                  f"{len(ruleset.food_matcher)} food keywords)")
+        return self._ruleset
+
+
+_registries: Dict[str, ParserConfigRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_parser_config(path: Optional[str] = None) -> ParserConfigRegistry:
+    """The process-wide registry for a config file (created on first use)"""
+    path = os.path.abspath(path or DEFAULT_CONFIG_PATH)
+    registry = _registries.get(path)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.get(path)
+            if registry is None:
+                registry = ParserConfigRegistry(path)
+                _registries[path] = registry
+    return registry
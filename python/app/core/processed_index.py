@@ -0,0 +1,60 @@
+"""
+Processed-message index for incremental WhatsApp scans
+Remembers which WhatsApp data-ids were already handled, with a cheap
+fingerprint of each row, so unchanged rows are skipped before any
+text extraction, expansion or outerHTML fetch
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+# Enough of the row text to notice edits, short enough to survive "read more" expansion
+FINGERPRINT_PREFIX_CHARS = 80
+
+
+def row_fingerprint(text_content: Optional[str]) -> str:
+    """Fingerprint a row from its textContent (whitespace-normalised prefix)"""
+    prefix = ' '.join((text_content or '').split())[:FINGERPRINT_PREFIX_CHARS]
+    return hashlib.md5(prefix.encode('utf-8')).hexdigest()
+
+
+class ProcessedMessageIndex:
+    """Insertion-ordered set of processed data-ids -> fingerprint, bounded in size"""
+
+    def __init__(self, max_size: int = 5000):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[str, str]' = OrderedDict()
+
+    def __contains__(self, message_id: str) -> bool:
+        return message_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def high_water_mark(self) -> Optional[str]:
+        """The most recently processed data-id"""
+        return next(reversed(self._entries), None)
+
+    def is_unchanged(self, message_id: Optional[str], fingerprint: str) -> bool:
+        """True if this row was processed before and its content has not changed"""
+        if not message_id:
+            return False
+        return self._entries.get(message_id) == fingerprint
+
+    def mark(self, message_id: Optional[str], fingerprint: str):
+        """Record a processed row (re-marking moves it to the newest position)"""
+        if not message_id:
+            return
+        self._entries.pop(message_id, None)
+        self._entries[message_id] = fingerprint
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def mark_many(self, items: Iterable[Tuple[str, str]]):
+        for message_id, fingerprint in items:
+            self.mark(message_id, fingerprint)
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,67 @@
+"""
+Batch "read more" expansion for the WhatsApp crawlers
+Clicks every truncated row's expand button in one script call, then waits
+once for all of them to finish rendering instead of sleeping per message
+"""
+
+import json
+from typing import Dict, List, Optional
+
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+
+from app.core.dom_scripts import BULK_EXPAND_SCRIPT, EXPANSION_PENDING_SCRIPT
+
+# Upper bound for the single wait; WhatsApp usually renders all expansions well within this
+DEFAULT_EXPANSION_TIMEOUT = 6
+EXPANSION_POLL_INTERVAL = 0.2
+
+
+def expand_truncated_rows(driver, row_ids: Optional[List[str]] = None,
+                          timeout: float = DEFAULT_EXPANSION_TIMEOUT) -> Dict:
+    """
+    Expand every truncated row (or only row_ids) with one click pass and one wait.
+
+    Returns {'expanded': [id], 'failed': [id], 'previews': {id: text}}.
+    'failed' holds rows that had no expand button or were still truncated at the timeout.
+    Returns None if the click script itself could not run, so callers can fall back
+    to per-element expansion.
+    """
+    try:
+        raw = driver.execute_script(BULK_EXPAND_SCRIPT, row_ids)
+        result = json.loads(raw) if raw else None
+    except Exception as e:
+        print(f"⚠️ [EXPAND] Bulk expand script failed: {e}")
+        return None
+
+    if not isinstance(result, dict):
+        return None
+
+    clicked = result.get('clicked', [])
+    failed = list(result.get('no_button', []))
+    previews = result.get('previews', {})
+
+    if not clicked:
+        if failed:
+            print(f"⚠️ [EXPAND] {len(failed)} truncated rows have no expand button")
+        return {'expanded': [], 'failed': failed, 'previews': previews}
+
+    print(f"🔄 [EXPAND] Clicked read more on {len(clicked)} rows, waiting for them to render...")
+    pending = list(clicked)
+
+    def nothing_pending(d):
+        still = d.execute_script(EXPANSION_PENDING_SCRIPT, clicked)
+        pending[:] = still or []
+        return not pending
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=EXPANSION_POLL_INTERVAL).until(nothing_pending)
+    except TimeoutException:
+        print(f"⚠️ [EXPAND] {len(pending)} rows still truncated after {timeout}s")
+    except Exception as e:
+        print(f"⚠️ [EXPAND] Error waiting for expansion: {e}")
+
+    failed.extend(pending)
+    expanded = [row_id for row_id in clicked if row_id not in pending]
+    print(f"✅ [EXPAND] Expanded {len(expanded)}/{len(clicked)} rows")
+    return {'expanded': expanded, 'failed': failed, 'previews': previews}
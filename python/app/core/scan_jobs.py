@@ -0,0 +1,183 @@
+"""
+Background scan jobs
+Long scrapes (scroll loops, expansion, upload) run on one worker thread
+instead of inside the HTTP request. Each job reports its phase, rows processed
+and an ETA for GET /api/jobs/<id>; a request for a scan that is already queued
+or running joins that job instead of starting another (single-flight).
+"""
+
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+# Finished jobs kept for polling
+DEFAULT_JOB_HISTORY = 100
+
+_current = threading.local()
+
+
+def report_progress(phase: str, processed: Optional[int] = None, total: Optional[int] = None):
+    """Progress from inside a scan; does nothing when the code isn't running as a job"""
+    job = getattr(_current, 'job', None)
+    if job is not None:
+        job.update(phase, processed, total)
+
+
+class ScanJob:
+    def __init__(self, key: str, description: str = ''):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.description = description or key
+        self.status = QUEUED
+        self.phase = QUEUED
+        self.processed = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.coalesced = 0  # Requests that joined this job instead of starting their own
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._phase_started = self.created_at
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def update(self, phase: str, processed: Optional[int] = None, total: Optional[int] = None):
+        if phase != self.phase:
+            self.phase = phase
+            self._phase_started = time.time()
+            self.processed = 0
+            self.total = None
+        if processed is not None:
+            self.processed = processed
+        if total is not None:
+            self.total = total
+
+    def eta_seconds(self) -> Optional[float]:
+        """Remaining time in the current phase, from its rate so far"""
+        if self.done or not self.total or not self.processed:
+            return None
+        elapsed = time.time() - self._phase_started
+        remaining = max(0, self.total - self.processed)
+        return round(elapsed / self.processed * remaining, 1)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = self.finished_at or time.time()
+        return {
+            'job_id': self.id,
+            'key': self.key,
+            'description': self.description,
+            'status': self.status,
+            'phase': self.phase,
+            'processed': self.processed,
+            'total': self.total,
+            'eta_seconds': self.eta_seconds(),
+            'coalesced_requests': self.coalesced,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'elapsed_seconds': round(now - (self.started_at or now), 1),
+            'result': self.result,
+            'error': self.error
+        }
+
+
+class ScanJobManager:
+    """Runs scans one at a time (they share the Chrome driver) and coalesces duplicates"""
+
+    def __init__(self, history: int = DEFAULT_JOB_HISTORY):
+        self.history = history
+        self._jobs: 'OrderedDict[str, ScanJob]' = OrderedDict()
+        self._active: Dict[str, ScanJob] = {}  # key -> queued/running job
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scan-job')
+
+    def submit(self, key: str, fn: Callable[[], Any], description: str = ''):
+        """
+        Queue fn as a job, or join the queued/running job with the same key.
+        fn's return value becomes the job result (keep it JSON-serializable).
+        Returns (job, created).
+        """
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None:
+                job.coalesced += 1
+                print(f"🔁 [JOBS] Joined running {job.key} job {job.id} ({job.coalesced} coalesced)")
+                return job, False
+
+            job = ScanJob(key, description)
+            self._active[key] = job
+            self._jobs[job.id] = job
+            self._trim()
+
+        print(f"🧵 [JOBS] Queued {key} job {job.id}")
+        self._executor.submit(self._run, job, fn)
+        return job, True
+
+    def _run(self, job: ScanJob, fn: Callable[[], Any]):
+        _current.job = job
+        job.status = RUNNING
+        job.started_at = time.time()
+        job.update('starting')
+        try:
+            job.result = fn()
+            job.status = SUCCEEDED
+        except Exception as e:
+            print(f"❌ [JOBS] {job.key} job {job.id} failed: {e}")
+            print(traceback.format_exc())
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            _current.job = None
+            job.finished_at = time.time()
+            job.phase = 'done'
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+            job._done.set()
+            print(f"✅ [JOBS] {job.key} job {job.id} {job.status} in {job.finished_at - job.started_at:.1f}s")
+
+    def _trim(self):
+        """Drop the oldest finished jobs beyond the history size"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[ScanJob]:
+        return self._jobs.get(job_id)
+
+    def active(self):
+        with self._lock:
+            return list(self._active.values())
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_scan_jobs() -> ScanJobManager:
+    """The process-wide job manager (one worker, shared by every route module)"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = ScanJobManager()
+    return _manager
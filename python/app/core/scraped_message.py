@@ -0,0 +1,159 @@
+"""
+Compact in-memory representation of a scraped WhatsApp message
+crawler.messages lives for the whole Flask process, so each message is a
+__slots__ object instead of a 21-key dict: the duplicate keys
+(cleanedContent, mediaInfo) are derived, the small vocabularies (chat,
+sender, type, media, company) are interned, and empty lists are only
+created when someone asks for them. It still reads and writes like the old
+dict (message['content'], .get(), 'key' in message) and to_dict() gives the
+exact JSON shape the Flutter app expects.
+"""
+
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# JSON key order of the old message dict
+FIELDS = (
+    'id', 'chat', 'sender', 'content', 'cleanedContent', 'timestamp', 'scraped_at', 'message_type',
+    'items', 'instructions', 'media_type', 'media_url', 'media_info', 'mediaInfo', 'company_name',
+    'parsed_items', 'timestamp_source', 'verification_hash'
+)
+
+# Keys that duplicate another field until something writes them separately
+_MIRRORS = {'cleanedContent': 'content', 'mediaInfo': 'media_info'}
+
+# Few distinct values across thousands of messages: share one string object each
+_INTERNED = frozenset(('chat', 'sender', 'message_type', 'media_type', 'company_name', 'timestamp_source'))
+
+_LISTS = frozenset(('items', 'parsed_items'))
+
+# Field -> attribute ('items' would shadow the dict-style items() method)
+_SLOTS = {name: ('item_list' if name == 'items' else name) for name in FIELDS if name not in _MIRRORS}
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class ScrapedMessage:
+    """One scraped message; behaves like the dict it replaces"""
+
+    __slots__ = tuple(_SLOTS.values()) + ('html', '_mirrors', '_extra')
+
+    def __init__(self, **fields):
+        for attr in _SLOTS.values():
+            setattr(self, attr, None)
+        self.html = None
+        self._mirrors: Optional[Dict[str, Any]] = None  # cleanedContent/mediaInfo once they differ
+        self._extra: Optional[Dict[str, Any]] = None    # keys added later (edited, original_content, ...)
+        for key, value in fields.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ScrapedMessage':
+        return cls(**data)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _MIRRORS:
+            if self._mirrors and key in self._mirrors:
+                return self._mirrors[key]
+            return getattr(self, _SLOTS[_MIRRORS[key]])
+        if key in _LISTS:
+            value = getattr(self, _SLOTS[key])
+            if value is None:
+                value = []
+                setattr(self, _SLOTS[key], value)
+            return value
+        if key in _SLOTS:
+            value = getattr(self, _SLOTS[key])
+            return '' if value is None and key == 'instructions' else value
+        if key == 'html' and self.html is not None:
+            return self.html
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key in _MIRRORS:
+            if value != getattr(self, _SLOTS[_MIRRORS[key]]) or (self._mirrors and key in self._mirrors):
+                self._mirrors = self._mirrors or {}
+                self._mirrors[key] = value
+            return
+        if key in _SLOTS:
+            if key in _LISTS and isinstance(value, list) and not value:
+                value = None  # created on first read
+            mirror = next((m for m, source in _MIRRORS.items() if source == key), None)
+            if mirror and not (self._mirrors and mirror in self._mirrors):
+                # The mirror keeps the old value, as the separate dict key used to
+                old = getattr(self, _SLOTS[key])
+                if old is not None and old != value:
+                    self._mirrors = self._mirrors or {}
+                    self._mirrors[mirror] = old
+            setattr(self, _SLOTS[key], _intern(value) if key in _INTERNED else value)
+            return
+        if key == 'html':
+            self.html = value
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __contains__(self, key: object) -> bool:
+        if key in FIELDS:
+            return True
+        if key == 'html':
+            return self.html is not None
+        return bool(self._extra) and key in self._extra
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def keys(self) -> List[str]:
+        keys = list(FIELDS)
+        if self.html is not None:
+            keys.append('html')
+        if self._extra:
+            keys.extend(self._extra)
+        return keys
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return ((key, self[key]) for key in self.keys())
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (ScrapedMessage, dict)):
+            return self.to_dict() == (other.to_dict() if isinstance(other, ScrapedMessage) else other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The JSON shape of the old message dict (plus any keys added since)"""
+        return {key: self[key] for key in self.keys()}
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__init__(**state)
+
+    def __repr__(self) -> str:
+        return f"ScrapedMessage(id={self.id!r}, message_type={self.message_type!r}, content={(self.content or '')[:40]!r})"
+
+
+def message_json(message: Any) -> Any:
+    """API boundary: ScrapedMessage -> plain dict (dicts pass through)"""
+    return message.to_dict() if isinstance(message, ScrapedMessage) else message
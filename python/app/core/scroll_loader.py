@@ -0,0 +1,142 @@
+"""
+Adaptive scroll loading for the WhatsApp crawlers
+Scrolls the chat to the top and waits only until WhatsApp has rendered older
+rows (row count or oldest data-id changed), backing off exponentially while
+nothing loads, instead of sleeping a fixed 3-6 s per scroll
+"""
+
+import json
+import time
+from typing import Callable, Dict, List, Optional
+
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+
+from app.core.dom_scripts import ROW_WINDOW_SCRIPT
+from app.core.scan_jobs import report_progress
+
+
+class ScrollLoader:
+    """
+    Scroll-to-top engine driven by DOM changes
+
+    Each step scrolls once and waits up to step_timeout for new rows. A step that
+    loads nothing doubles the next timeout (capped at max_step_timeout); a step that
+    loads resets it. Loading stops after stable_limit empty steps in a row, when
+    should_stop(window) says so, or after max_scrolls steps.
+    """
+
+    def __init__(self, driver, container, step_timeout: float = 2.0, max_step_timeout: float = 8.0,
+                 backoff: float = 2.0, stable_limit: int = 4, poll_interval: float = 0.2,
+                 aggressive_every: int = 5):
+        self.driver = driver
+        self.container = container
+        self.step_timeout = step_timeout
+        self.max_step_timeout = max_step_timeout
+        self.backoff = backoff
+        self.stable_limit = stable_limit
+        self.poll_interval = poll_interval
+        self.aggressive_every = aggressive_every
+        self.timings: List[Dict] = []
+
+    def read_window(self) -> Dict:
+        """Row count plus the data-ids and pre-plain-text headers of the oldest rows, in one round trip"""
+        try:
+            raw = self.driver.execute_script(ROW_WINDOW_SCRIPT, 5)
+            window = json.loads(raw) if isinstance(raw, str) else raw
+            if isinstance(window, dict):
+                return window
+        except Exception as e:
+            print(f"⚠️ [SCROLL] Could not read row window: {e}")
+        return {'count': 0, 'first_id': None, 'oldest_ids': [], 'pre_plain_texts': []}
+
+    def scroll_step(self, step: int, before: Dict, timeout: float) -> Dict:
+        """Scroll to the top once and wait until older rows render (or timeout). Returns the new window."""
+        self.driver.execute_script("arguments[0].scrollTop = 0", self.container)
+
+        if self.aggressive_every and step % self.aggressive_every == 0:
+            try:
+                self.container.send_keys(Keys.CONTROL + Keys.HOME)
+            except Exception:
+                pass
+
+        after = [before]
+
+        def window_changed(_driver):
+            after[0] = self.read_window()
+            return (after[0].get('count') != before.get('count')
+                    or after[0].get('first_id') != before.get('first_id'))
+
+        started = time.monotonic()
+        loaded = True
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=self.poll_interval).until(window_changed)
+        except TimeoutException:
+            loaded = False
+
+        self.timings.append({
+            'step': step + 1,
+            'seconds': round(time.monotonic() - started, 3),
+            'timeout': timeout,
+            'loaded': loaded,
+            'rows': after[0].get('count', 0)
+        })
+        return after[0]
+
+    def load(self, max_scrolls: int = 50, should_stop: Optional[Callable[[Dict], bool]] = None,
+             on_step: Optional[Callable[[int], None]] = None) -> Dict:
+        """
+        Scroll until the top of the chat, a should_stop(window) cutoff or max_scrolls.
+
+        on_step(step_number) runs after every scroll (e.g. to capture rows as they appear).
+        Returns the final row window.
+        """
+        self.timings = []
+        window = self.read_window()
+        timeout = self.step_timeout
+        stable_count = 0
+        started = time.monotonic()
+
+        for step in range(max_scrolls):
+            print(f"📊 Scroll {step + 1}: {window.get('count', 0)} messages")
+            report_progress('scrolling', step, max_scrolls)
+
+            if should_stop and should_stop(window):
+                break
+
+            new_window = self.scroll_step(step, window, timeout)
+
+            if new_window.get('count') == window.get('count') and new_window.get('first_id') == window.get('first_id'):
+                stable_count += 1
+                print(f"🔄 No new messages loaded in {timeout:.1f}s (stable count: {stable_count})")
+                if stable_count >= self.stable_limit:
+                    print("🔝 Reached top of chat - no more messages to load")
+                    window = new_window
+                    if on_step:
+                        on_step(step + 1)
+                    break
+                timeout = min(timeout * self.backoff, self.max_step_timeout)
+            else:
+                print(f"✅ New messages loaded: {window.get('count', 0)} → {new_window.get('count', 0)} "
+                      f"in {self.timings[-1]['seconds']:.2f}s")
+                stable_count = 0
+                timeout = self.step_timeout
+
+            window = new_window
+            if on_step:
+                on_step(step + 1)
+
+        print(f"⏱️ [SCROLL] {len(self.timings)} steps in {time.monotonic() - started:.1f}s")
+        return window
+
+    def timing_summary(self) -> Dict:
+        """Aggregate scroll-step timings for logging / API responses"""
+        seconds = [t['seconds'] for t in self.timings]
+        return {
+            'steps': len(self.timings),
+            'loaded_steps': sum(1 for t in self.timings if t['loaded']),
+            'total_seconds': round(sum(seconds), 3),
+            'max_step_seconds': max(seconds) if seconds else 0,
+            'rows': self.timings[-1]['rows'] if self.timings else 0
+        }
@@ -6,21 +6,37 @@ import hashlib
 from datetime import datetime, timezone, timedelta
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 import subprocess
+from app.core.dom_scripts import ROW_IDS_SCRIPT
+from app.core.message_classifier import classify_message
+from app.core.driver_executor import serialize_driver
+from app.core.page_source import PageSourceDriver, snapshot_driver, is_offline_element
+from app.core.row_expansion import expand_truncated_rows
+from app.core.scan_jobs import report_progress
+from app.core.scraped_message import ScrapedMessage
+from app.core.html_store import html_json_default, store_html
+from app.core.scroll_loader import ScrollLoader
 
 class WhatsAppCrawler:
-    def __init__(self):
+    # 'webdriver': query each row through the live driver
+    # 'page_source': snapshot #main once per scan and parse rows locally
+    EXTRACTION_BACKENDS = ('webdriver', 'page_source')
+
+    def __init__(self, extraction_backend='webdriver'):
+        if extraction_backend not in self.EXTRACTION_BACKENDS:
+            raise ValueError(f"Unknown extraction backend: {extraction_backend} (expected one of {self.EXTRACTION_BACKENDS})")
         self.driver = None
         self.is_running = False
         self.messages = []
         self.session_dir = None
         self.dom_snapshots = []  # Track DOM changes
+        self.extraction_backend = extraction_backend
+        self.last_scroll_timings = {}  # ScrollLoader.timing_summary() of the last scroll
         
     def cleanup_existing_sessions(self):
         """Kill any existing Chrome processes using our session directory"""
@@ -56,7 +72,8 @@ class WhatsAppCrawler:
         # Use system ChromeDriver
         print("🔧 Using system ChromeDriver...")
         print("🚀 Starting Chrome browser...")
-        self.driver = webdriver.Chrome(options=chrome_options)
+        # One executor thread issues every command (Selenium isn't thread-safe)
+        self.driver = serialize_driver(webdriver.Chrome(options=chrome_options))
         self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
         print("✅ Chrome WebDriver initialized")
     
@@ -227,15 +244,38 @@ class WhatsAppCrawler:
         print("📜 Scrolling to load messages...")
         messages_captured_during_scroll = self._scroll_and_capture_messages()
         
+        # Expand every truncated row in one pass so extraction (and any snapshot) sees full text
+        expand_truncated_rows(self.driver)
+        
         # Get message elements strictly from the open chat area
-        message_elements = self.driver.find_elements(By.CSS_SELECTOR, '#main [role="row"]')
+        row_source = self.driver
+        if self.extraction_backend == 'page_source':
+            row_source = snapshot_driver(self.driver) or self.driver
+        message_elements = row_source.find_elements(By.CSS_SELECTOR, '#main [role="row"]')
         print(f"🔍 Found {len(message_elements)} messages in #main after scrolling")
         
         if len(message_elements) == 0:
             raise Exception("No messages found in open chat")
 
         self.messages = []
-        messages = self.messages
+        messages = self._process_message_elements(message_elements, self.messages)
+        self.messages = messages
+        print(f"🚨 [SCRAPER] FINISHED - Setting self.messages to {len(messages)} messages")
+        print(f"[PY][SCRAPE] total_messages={len(messages)}")
+        return messages
+
+    def parse_html(self, html, apply_date_filter=False):
+        """
+        Re-parse saved WhatsApp HTML (a page, a #main snapshot or saved rows) without Chrome.
+        Runs the same extraction as a live scrape; truncated messages stay truncated.
+        """
+        snapshot = PageSourceDriver.from_html(html)
+        message_elements = snapshot.find_elements(By.CSS_SELECTOR, '#main [role="row"]')
+        print(f"🔍 [PAGE_SOURCE] Parsing {len(message_elements)} saved rows")
+        return self._process_message_elements(message_elements, [], apply_date_filter=apply_date_filter)
+
+    def _process_message_elements(self, message_elements, messages, apply_date_filter=True):
+        """Extract, date-filter and verify rows, appending them to messages"""
         seen_ids = set()
         messages_in_date_range = 0
         messages_filtered_out = 0
@@ -243,6 +283,7 @@ class WhatsAppCrawler:
         print(f"📋 Processing messages with date filtering...")
         
         for msg_index, msg_elem in enumerate(message_elements):
+            report_progress('extracting', msg_index, len(message_elements))
             # Deduplicate based on WhatsApp's stable data-id when present
             data_id_nodes = msg_elem.find_elements(By.CSS_SELECTOR, '[data-id]')
             row_id = data_id_nodes[0].get_attribute('data-id') if data_id_nodes else None
@@ -258,7 +299,7 @@ class WhatsAppCrawler:
                 continue
 
             # DATE FILTER: Only include messages from current day or previous day
-            if not self.is_message_in_date_range(message_data['timestamp']):
+            if apply_date_filter and not self.is_message_in_date_range(message_data['timestamp']):
                 messages_filtered_out += 1
                 continue
 
@@ -270,10 +311,7 @@ class WhatsAppCrawler:
             else:
                 print(f"❌ Failed verification for message {msg_index}")
 
-        self.messages = messages
-        print(f"🚨 [SCRAPER] FINISHED - Setting self.messages to {len(messages)} messages")
         print(f"📊 [DATE_FILTER] Messages in range: {messages_in_date_range}, Filtered out: {messages_filtered_out}")
-        print(f"[PY][SCRAPE] total_messages={len(messages)}")
         return messages
 
     def _extract_message_content(self, msg_elem, msg_index):
@@ -309,12 +347,11 @@ class WhatsAppCrawler:
                 return None
             
             # Create message object
-            message = {
+            message = ScrapedMessage.from_dict({
                 "id": msg_elem.find_elements(By.CSS_SELECTOR, '[data-id]')[0].get_attribute('data-id') if msg_elem.find_elements(By.CSS_SELECTOR, '[data-id]') else f"msg_{msg_index}_{int(time.time())}",
                 "chat": os.environ.get('TARGET_GROUP_NAME', 'ORDERS Restaurants'),
                 "sender": "Group Member",  # WhatsApp Web doesn't show individual senders in groups
                 "content": message_text,
-                "cleanedContent": message_text,
                 "timestamp": timestamp_data['timestamp'],
                 "scraped_at": datetime.now().isoformat(),
                 "message_type": classified_type,
@@ -323,12 +360,11 @@ class WhatsAppCrawler:
                 "media_type": media_type,
                 "media_url": media_url,
                 "media_info": media_info,
-                "mediaInfo": media_info,
                 "company_name": "",
                 "parsed_items": [],
                 "timestamp_source": timestamp_data['source'],
                 "verification_hash": self._generate_message_hash(message_text, media_type, timestamp_data['timestamp'])
-            }
+            })
             
             return message
             
@@ -417,6 +453,11 @@ class WhatsAppCrawler:
 
     def _expand_truncated_message(self, msg_elem, truncated_text):
         """Expand truncated messages by clicking Read more button"""
+        if is_offline_element(msg_elem):
+            # A parsed snapshot cannot be clicked; keep the truncated text
+            print(f"⚠️ [EXPAND] Offline row - expansion not available")
+            return None
+        
         try:
             # Look for expand buttons
             expand_buttons = msg_elem.find_elements(By.CSS_SELECTOR, 'div[role="button"]')
@@ -701,81 +742,35 @@ class WhatsAppCrawler:
         # Find scrollable container
         scrollable_container = self._find_scrollable_container()
         
-        previous_message_count = 0
-        scroll_attempts = 0
-        max_scrolls = 200
-        stable_count = 0
         messages_captured = []
         seen_message_ids = set()
-        should_stop_scrolling = False
+        expansion_failed = set()  # Rows whose "read more" didn't expand - not clicked again
         
-        while scroll_attempts < max_scrolls and not should_stop_scrolling:
-            # Get current message count
-            current_messages = self.driver.find_elements(By.CSS_SELECTOR, '#main [role="row"]')
-            current_count = len(current_messages)
-            
-            print(f"📊 Scroll {scroll_attempts + 1}: {current_count} messages")
-            
-            # Check if we've hit the date cutoff by examining oldest visible message
-            if scroll_attempts > 0 and current_count > 0:
-                # Check the first few messages (oldest) for their dates
-                for i in range(min(5, len(current_messages))):
-                    try:
-                        msg_elem = current_messages[i]
-                        pre_nodes = msg_elem.find_elements(By.CSS_SELECTOR, '.copyable-text')
-                        for pn in pre_nodes:
-                            pre = pn.get_attribute('data-pre-plain-text') or ''
-                            if pre.startswith('[') and ']' in pre:
-                                inside = pre[1:pre.index(']')].strip()
-                                parts = [p.strip() for p in inside.split(',')]
-                                if len(parts) == 2 and '/' in parts[1]:
-                                    # Parse date
-                                    dt = datetime.strptime(parts[1], "%d/%m/%Y")
-                                    msg_date = dt.date()
-                                    if msg_date < cutoff_date:
-                                        print(f"📅 [SCROLL] Found message from {msg_date} which is older than cutoff {cutoff_date}")
-                                        print(f"🛑 [SCROLL] Stopping scroll - reached date limit")
-                                        should_stop_scrolling = True
-                                        break
-                    except Exception as e:
-                        continue
-                    if should_stop_scrolling:
-                        break
-            
-            if should_stop_scrolling:
-                break
-            
-            # If no new messages loaded, increment stable counter
-            if current_count == previous_message_count:
-                stable_count += 1
-                print(f"🔄 No new messages loaded (stable count: {stable_count})")
-                if stable_count >= 20:
-                    print("🔝 Reached top of chat - no more messages to load")
-                    break
-            else:
-                stable_count = 0
-                print(f"✅ New messages loaded: {previous_message_count} → {current_count}")
-            
-            previous_message_count = current_count
-            
-            # Scroll to top
-            self.driver.execute_script("arguments[0].scrollTop = 0", scrollable_container)
-            
-            # Every 10th scroll, add Ctrl+Home for aggressive scroll
-            if scroll_attempts % 10 == 0:
+        def reached_cutoff(window):
+            # Check the oldest visible messages for their dates
+            for pre in window.get('pre_plain_texts') or []:
                 try:
-                    scrollable_container.send_keys(Keys.CONTROL + Keys.HOME)
-                    print(f"🔼 Used Ctrl+Home for aggressive scroll (attempt {scroll_attempts + 1})")
-                except:
-                    pass
-            
-            # Wait for messages to load
-            time.sleep(6)
-            
-            # Capture new messages that appeared after this scroll
-            self._capture_new_messages(messages_captured, seen_message_ids, scroll_attempts + 1)
-            
-            scroll_attempts += 1
+                    inside = pre[1:pre.index(']')].strip()
+                    parts = [p.strip() for p in inside.split(',')]
+                    if len(parts) == 2 and '/' in parts[1]:
+                        msg_date = datetime.strptime(parts[1], "%d/%m/%Y").date()
+                        if msg_date < cutoff_date:
+                            print(f"📅 [SCROLL] Found message from {msg_date} which is older than cutoff {cutoff_date}")
+                            print(f"🛑 [SCROLL] Stopping scroll - reached date limit")
+                            return True
+                except Exception:
+                    continue
+            return False
+        
+        # Wait only until older rows render; capture whatever each scroll revealed
+        loader = ScrollLoader(self.driver, scrollable_container, aggressive_every=10)
+        loader.load(
+            max_scrolls=200,
+            should_stop=reached_cutoff,
+            on_step=lambda step: self._capture_new_messages(messages_captured, seen_message_ids, step,
+                                                            expansion_failed)
+        )
+        self.last_scroll_timings = loader.timing_summary()
         
         final_count = len(self.driver.find_elements(By.CSS_SELECTOR, '#main [role="row"]'))
         print(f"✅ Finished scrolling. Total messages loaded: {final_count}")
@@ -815,9 +810,19 @@ class WhatsAppCrawler:
         
         return scrollable_container
 
-    def _capture_new_messages(self, messages_captured, seen_message_ids, scroll_attempt):
+    def _capture_new_messages(self, messages_captured, seen_message_ids, scroll_attempt, expansion_failed=None):
         """Capture new messages that appeared after scrolling"""
+        if expansion_failed is None:
+            expansion_failed = set()
         try:
+            # One click pass + one wait, only for rows this scroll revealed
+            new_ids = [row_id for row_id in (self.driver.execute_script(ROW_IDS_SCRIPT) or [])
+                       if row_id not in seen_message_ids and row_id not in expansion_failed]
+            if new_ids:
+                expansion = expand_truncated_rows(self.driver, row_ids=new_ids)
+                if expansion:
+                    expansion_failed.update(expansion['failed'])
+            
             current_message_elements = self.driver.find_elements(By.CSS_SELECTOR, '#main [role="row"]')
             new_messages_count = 0
             
@@ -849,8 +854,8 @@ class WhatsAppCrawler:
                             timestamp = pre_text[1:pre_text.index(']')].strip()
                             break
                     
-                    # Handle truncated messages
-                    if '…' in message_text or '...' in message_text:
+                    # Handle truncated messages (unless the bulk pass already couldn't expand it)
+                    if ('…' in message_text or '...' in message_text) and msg_id not in expansion_failed:
                         expanded_text = self._expand_truncated_message(msg_elem, message_text)
                         if expanded_text:
                             message_text = expanded_text
@@ -860,7 +865,7 @@ class WhatsAppCrawler:
                         'id': msg_id,
                         'text': message_text,
                         'timestamp': timestamp,
-                        'html': msg_elem.get_attribute('outerHTML'),
+                        'html': store_html(msg_elem.get_attribute('outerHTML')),
                         'scroll_attempt': scroll_attempt
                     })
                     
@@ -898,7 +903,7 @@ class WhatsAppCrawler:
             # Save to file
             filename = f'messages_captured_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(messages_captured, f, indent=2, ensure_ascii=False)
+                json.dump(messages_captured, f, indent=2, ensure_ascii=False, default=html_json_default)
             
             print(f"💾 Saved {len(messages_captured)} captured messages to {filename}")
             
@@ -906,44 +911,8 @@ class WhatsAppCrawler:
             print(f"❌ Error saving captured messages: {e}")
     
     def classify_message(self, content, media_type="text"):
-        """Classify message with improved stock detection"""
-        if media_type == "image":
-            return 'image'
-        if media_type == "voice":
-            return 'voice'
-        if media_type == "video":
-            return 'video'
-        if media_type != "text":
-            return 'other'
-        
-        content_upper = content.upper()
-        
-        # Order day demarcation indicators
-        demarcation_keywords = ['ORDERS STARTS HERE', 'THURSDAY ORDERS', 'TUESDAY ORDERS', 'MONDAY ORDERS']
-        if any(keyword in content_upper for keyword in demarcation_keywords):
-            return 'demarcation'
-        
-        # Enhanced stock indicators - including SHALLOME
-        stock_keywords = ['STOCK', 'AVAILABLE', 'INVENTORY', 'SUPPLY', 'STOKE', 'SHALLOME']
-        if any(keyword in content_upper for keyword in stock_keywords):
-            return 'stock'
-        
-        # Order indicators
-        order_keywords = ['ORDER', 'NEED', 'WANT', 'KG', 'BOXES', 'X1', 'X2', 'X3', 'X4', 'X5']
-        quantity_patterns = ['\\d+\\s*KG', '\\d+\\s*X', 'X\\d+']
-        
-        has_order_keywords = any(keyword in content_upper for keyword in order_keywords)
-        has_quantities = any(re.search(pattern, content_upper) for pattern in quantity_patterns)
-        
-        if has_order_keywords or has_quantities:
-            return 'order'
-        
-        # Instruction indicators
-        instruction_keywords = ['GOOD MORNING', 'HELLO', 'HI', 'THANKS', 'PLEASE', 'NOTE']
-        if any(keyword in content_upper for keyword in instruction_keywords):
-            return 'instruction'
-        
-        return 'other'
+        """Classify message with improved stock detection (see app/core/message_classifier.py)"""
+        return classify_message(content, media_type)
     
     def stop(self):
         """Stop the crawler and close browser"""
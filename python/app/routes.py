@@ -4,13 +4,23 @@ import os
 import requests
 from app.core.whatsapp_crawler import WhatsAppCrawler
 from app.core.message_parser import MessageParser
+from app.core.item_grammar import parse_item, product_of, quantity_of
+from app.core.message_enrichment import MessageEnrichmentCache
+from app.core.message_feed import (
+    ORDER_PROJECTIONS, message_set_version, page_after, page_etag, parse_fields, parse_limit, project
+)
+from app.core.order_day_index import OrderDayIndex
+from app.core.driver_executor import SCAN, driver_priority, driver_stats
+from app.core.scan_jobs import FAILED, get_scan_jobs
 from selenium.webdriver.common.by import By
 
 whatsapp_bp = Blueprint('whatsapp', __name__)
 
 # Global instances
-crawler = WhatsAppCrawler()
+crawler = WhatsAppCrawler(extraction_backend=os.environ.get('CRAWLER_EXTRACTION_BACKEND', 'webdriver'))
 parser = MessageParser()
+order_days = OrderDayIndex(company_of=parser.to_canonical_company)
+enrichment = MessageEnrichmentCache(parser)
 print(f"🚨 [INIT] Created crawler instance: {id(crawler)}")
 print(f"🚨 [INIT] Crawler messages attr exists: {hasattr(crawler, 'messages')}")
 print(f"🚨 [INIT] Crawler messages length: {len(crawler.messages)}")
@@ -22,7 +32,9 @@ def get_status():
     status = {
         "crawler_running": crawler.is_running,
         "driver_active": crawler.driver is not None,
-        "message_count": len(crawler.messages)
+        "message_count": len(crawler.messages),
+        "enrichment_cache": enrichment.stats(),
+        "driver": driver_stats(crawler.driver)
     }
     return jsonify(status)
 
@@ -79,62 +91,109 @@ def get_messages():
         print(f"🚨 [API] CACHE HIT - using cached {len(crawler.messages)} messages")
         messages = crawler.messages
     
-    # Enhance messages with parsing information
-    enhanced_messages = []
-    for message in messages:
-        # Extract company name if present
-        company = parser.to_canonical_company(message['content'])
-        if company:
-            message['company_name'] = company
-        
-        # Extract order items if it's an order message
-        if message['message_type'] == 'order':
-            items = parser.extract_order_items(message['content'])
-            instructions = parser.extract_instructions(message['content'])
-            message['parsed_items'] = items
-            message['instructions'] = '\n'.join(instructions) if instructions else ""
-        
-        enhanced_messages.append(message)
+    # Unchanged message set (and cursor) -> 304, nothing to re-send
+    since_id = request.args.get('since_id')
+    limit = parse_limit(request.args.get('limit'))
+    fields = parse_fields(request.args.get('fields'))
+    version = message_set_version(messages, parser.ruleset_version)
+    etag = page_etag(version, since_id, limit, fields)
+    if request.if_none_match.contains(etag):
+        print(f"[PY][API]/messages -> 304 (version {version})")
+        return '', 304, {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
     
-    print(f"[PY][API]/messages -> count={len(enhanced_messages)}")
-    return jsonify(enhanced_messages)
+    page = page_after(messages, since_id=since_id, limit=limit)
+    
+    # Enhance messages with parsing information (memoized per message content)
+    enhanced_messages = [enrichment.enriched(message, fields) for message in page['messages']]
+    
+    print(f"[PY][API]/messages -> count={len(enhanced_messages)} of {len(messages)} (since_id={since_id}, limit={limit})")
+    response = jsonify(enhanced_messages)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Message-Set-Version'] = version
+    response.headers['X-Total-Count'] = str(len(messages))
+    response.headers['X-Has-More'] = 'true' if page['has_more'] else 'false'
+    if page['next_cursor']:
+        response.headers['X-Next-Cursor'] = page['next_cursor']
+    if page['reset']:
+        response.headers['X-Cursor-Reset'] = 'true'
+    return response
+
+def run_refresh():
+    """The scrape behind /api/messages/refresh (runs as a background job)"""
+    print(f"🚨 [API] REFRESH - calling scrape_messages()")
+    # Request handlers using the driver meanwhile (e.g. /api/debug/analyze) go first
+    with driver_priority(SCAN):
+        messages = crawler.scrape_messages()
+    print(f"🚨 [API] REFRESH - scrape_messages() returned {len(messages)} messages")
+    return {"message_count": len(messages)}
 
 @whatsapp_bp.route('/api/messages/refresh', methods=['POST'])
 def refresh_messages():
-    """Manually refresh messages with enhanced parsing"""
+    """
+    Manually refresh messages with enhanced parsing.
+    The scrape runs as a background job; with "async": true this returns 202 and a job_id
+    to poll at /api/jobs/<job_id>, then read /api/messages. Concurrent refreshes share one scrape.
+    """
     print(f"🚨 [API] /api/messages/refresh called - FORCE REFRESH")
     
     if not crawler.driver or not crawler.is_running:
         return jsonify({"error": "Crawler not running"}), 400
     
-    print(f"🚨 [API] REFRESH - calling scrape_messages()")
-    messages = crawler.scrape_messages()
-    print(f"🚨 [API] REFRESH - scrape_messages() returned {len(messages)} messages")
+    data = request.get_json(silent=True) or {}
+    job, created = get_scan_jobs().submit('refresh', run_refresh, description="Messages refresh")
+    if data.get('async'):
+        return jsonify({
+            "status": "accepted",
+            "job_id": job.id,
+            "status_url": f"/api/jobs/{job.id}",
+            "coalesced": not created
+        }), 202
     
-    # Enhance messages with parsing information
-    enhanced_messages = []
-    for message in messages:
-        # Extract company name if present
-        company = parser.to_canonical_company(message['content'])
-        if company:
-            message['company_name'] = company
-        
-        # Extract order items if it's an order message
-        if message['message_type'] == 'order':
-            items = parser.extract_order_items(message['content'])
-            instructions = parser.extract_instructions(message['content'])
-            message['parsed_items'] = items
-            message['instructions'] = '\n'.join(instructions) if instructions else ""
-        
-        enhanced_messages.append(message)
+    job.wait()
+    if job.status == FAILED:
+        return jsonify({"error": job.error, "job_id": job.id}), 500
+    messages = crawler.messages
+    
+    # Optional cursor: only return what the client hasn't seen
+    since_id = data.get('since_id') or request.args.get('since_id')
+    limit = parse_limit(data.get('limit') or request.args.get('limit'))
+    fields = parse_fields(data.get('fields') or request.args.get('fields'))
+    page = page_after(messages, since_id=since_id, limit=limit)
     
-    print(f"[PY][API]/messages/refresh -> count={len(enhanced_messages)}")
+    # Enhance messages with parsing information (memoized per message content)
+    enhanced_messages = [enrichment.enriched(message, fields) for message in page['messages']]
+    
+    print(f"[PY][API]/messages/refresh -> count={len(enhanced_messages)} of {len(messages)}")
     return jsonify({
         "status": "success",
         "message_count": len(enhanced_messages),
+        "total_count": len(messages),
+        "next_cursor": page['next_cursor'],
+        "has_more": page['has_more'],
+        "cursor_reset": page['reset'],
+        "version": message_set_version(messages, parser.ruleset_version),
+        "job_id": job.id,
         "messages": enhanced_messages
     })
 
+@whatsapp_bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Phase, progress, ETA and (when finished) result of a background scan job"""
+    job = get_scan_jobs().get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return jsonify(job.to_dict())
+
+
+@whatsapp_bp.route('/api/debug/driver-stats', methods=['GET'])
+def get_driver_stats():
+    """Queue depth plus queue-wait and execution time per WebDriver command and priority"""
+    stats = driver_stats(crawler.driver)
+    if stats is None:
+        return jsonify({"error": "Driver not initialized"}), 400
+    return jsonify(stats)
+
 
 @whatsapp_bp.route('/api/debug/analyze', methods=['GET'])
 def analyze_page():
@@ -199,10 +258,14 @@ def edit_message():
             message['edited'] = True
             message['edited_at'] = datetime.now().isoformat()
             message['type'] = crawler.classify_message(edited_content)
+            # Pick up a refreshed message list first, so the index holds this very object
+            order_days.sync(crawler.messages)
+            order_days.update(message_id)
+            enrichment.invalidate(message)
             
             return jsonify({
                 "status": "success",
-                "message": message
+                "message": enrichment.enriched(message)
             })
     
     return jsonify({"error": "Message not found"}), 404
@@ -225,14 +288,14 @@ def process_messages():
         if message['type'] == 'stock_update':
             stock_updates.append({
                 "id": f"stock_{len(stock_updates)}",
-                "message": message,
+                "message": enrichment.enriched(message),
                 "items": extract_stock_items(message['content']),
                 "processed_at": datetime.now().isoformat()
             })
         elif message['type'] == 'order':
             orders.append({
                 "id": f"order_{len(orders)}",
-                "message": message,
+                "message": enrichment.enriched(message),
                 "items": extract_order_items(message['content']),
                 "processed_at": datetime.now().isoformat()
             })
@@ -257,8 +320,14 @@ def parse_messages_to_orders():
             # Use current scraped messages if none provided
             messages = crawler.messages
         
+        # Optional projection: fields=summary, full or a list of order keys
+        fields = parse_fields(data.get('fields') or request.args.get('fields'), ORDER_PROJECTIONS, required=())
+        
         # Parse messages into orders
         orders = parser.parse_messages_to_orders(messages)
+        if fields is None or 'parsed_items' in fields:
+            for order in orders:
+                order['parsed_items'] = [item.to_dict() for item in parser.parse_items(order['items_text'])]
         
         print(f"[PY][PARSE] Parsed {len(messages)} messages into {len(orders)} orders")
         for order in orders:
@@ -268,7 +337,7 @@ def parse_messages_to_orders():
             "status": "success",
             "message_count": len(messages),
             "order_count": len(orders),
-            "orders": orders
+            "orders": [project(order, fields) for order in orders]
         })
         
     except Exception as e:
@@ -277,6 +346,44 @@ def parse_messages_to_orders():
         print(f"Full traceback: {traceback.format_exc()}")
         return jsonify({"error": str(e)}), 500
 
+@whatsapp_bp.route('/api/orders/days', methods=['GET'])
+def list_order_days():
+    """Order-day partitions of the scraped messages (split at the "orders start here" messages)"""
+    indexed = order_days.sync(crawler.messages)
+    print(f"[PY][DAYS] {len(order_days.partitions)} partitions ({indexed} messages indexed)")
+    return jsonify({
+        "status": "success",
+        "message_count": len(order_days),
+        "days": order_days.summary()
+    })
+
+@whatsapp_bp.route('/api/orders/days/<day>', methods=['GET'])
+def get_order_day(day):
+    """One order day's messages and parsed orders (day: latest, a weekday, a date or a partition number)"""
+    order_days.sync(crawler.messages)
+    partition = order_days.find(day)
+    if partition is None:
+        return jsonify({"error": f"No order day matching '{day}'"}), 404
+    
+    company = request.args.get('company')
+    if company:
+        company = parser.to_canonical_company(company) or company
+        messages = order_days.company_messages(partition, company)
+    else:
+        messages = order_days.messages_in(partition)
+    fields = parse_fields(request.args.get('fields'))
+    
+    payload = {
+        "status": "success",
+        "day": partition.to_dict(),
+        "messages": [project(m, fields) for m in messages]
+    }
+    if request.args.get('parse', '1') != '0':
+        payload["orders"] = parser.parse_messages_to_orders(order_days.messages_in(partition))
+        if company:
+            payload["orders"] = [o for o in payload["orders"] if o['company_name'] == company]
+    return jsonify(payload)
+
 def extract_stock_items(content):
     """Extract stock items from message content"""
     lines = content.split('\n')
@@ -285,11 +392,7 @@ def extract_stock_items(content):
     for line in lines:
         line = line.strip()
         if any(char.isdigit() for char in line) and len(line) > 3:
-            items.append({
-                "raw_text": line,
-                "product": extract_product_name(line),
-                "quantity": extract_quantity(line)
-            })
+            items.append(parse_item(line).to_dict())
     
     return items
 
@@ -299,69 +402,8 @@ def extract_order_items(content):
 
 def extract_product_name(text):
     """Extract product name while preserving packaging information"""
-    import re
-    
-    # Clean the text
-    text = text.strip()
-    
-    # Remove multiplier patterns but keep packaging
-    # "2 x 10kg tomatoes" -> "10kg tomatoes"
-    text = re.sub(r'^\d+\s*[x×*]\s*', '', text)
-    
-    # Remove leading quantity + container words but keep packaging sizes
-    # "3 bags 5kg potatoes" -> "5kg potatoes"
-    # "3 bags potatoes" -> "potatoes"
-    text = re.sub(r'^\d+\s+(bags?|boxes?|pcs?|pieces?|pkts?|packets?|heads?|bunches?)\s*', '', text)
-    
-    # Remove "bags" or "box" that appears after packaging size
-    # "10kg bags red onions" -> "10kg red onions"
-    text = re.sub(r'(\d+\s*(kg|g|ml|l))\s+(bags?|boxes?)\s*', r'\1 ', text)
-    
-    # Remove standalone quantity at start if followed by space
-    # "5 tomatoes" -> "tomatoes" (but keep "5kg tomatoes")
-    text = re.sub(r'^\d+\s+(?!\d*(kg|g|ml|l|box|bag))', '', text)
-    
-    # Clean up extra spaces
-    text = re.sub(r'\s+', ' ', text).strip()
-    
-    return text
+    return product_of(text)
 
 def extract_quantity(text):
     """Extract quantity from text - understanding multipliers vs packaging"""
-    import re
-    
-    # Clean the text
-    text = text.strip().lower()
-    
-    # Pattern 1: "2 x 10kg" - multiplier pattern
-    multiplier_match = re.search(r'^(\d+)\s*[x×*]\s*\d+\s*(kg|box|bags?|pcs?|pieces?|pkts?|packets?|heads?|bunches?)', text)
-    if multiplier_match:
-        return multiplier_match.group(1)
-    
-    # Pattern 2: "3 bags", "5 boxes" - quantity + container
-    container_match = re.search(r'^(\d+)\s+(bags?|boxes?|pcs?|pieces?|pkts?|packets?|heads?|bunches?)', text)
-    if container_match:
-        return container_match.group(1)
-    
-    # Pattern 3: "2 x" at start - multiplier without packaging
-    simple_multiplier = re.search(r'^(\d+)\s*[x×*]', text)
-    if simple_multiplier:
-        return simple_multiplier.group(1)
-    
-    # Pattern 3b: "x12" at end - multiplier at end
-    end_multiplier = re.search(r'\s+[x×*](\d+)$', text)
-    if end_multiplier:
-        return end_multiplier.group(1)
-    
-    # Pattern 4: Just packaging size like "5kg tomatoes" - quantity is 1
-    packaging_only = re.search(r'^\d+\s*(kg|g|ml|l)\s+\w+', text)
-    if packaging_only:
-        return "1"
-    
-    # Pattern 5: Leading number that's clearly a quantity
-    leading_number = re.search(r'^(\d+)\s+', text)
-    if leading_number:
-        return leading_number.group(1)
-    
-    # Default: assume quantity is 1
-    return "1"
+    return quantity_of(text)
@@ -3,6 +3,8 @@ import threading
 import time
 import os
 from .simplified_whatsapp_crawler import SimplifiedWhatsAppCrawler
+from app.core.driver_executor import BACKGROUND, SCAN, driver_priority, driver_stats
+from app.core.scan_jobs import FAILED, get_scan_jobs
 
 app = Flask(__name__)
 
@@ -39,13 +41,32 @@ def start_whatsapp():
         if django_url.endswith('/api'):
             django_url = django_url[:-4]
         check_interval = data.get('check_interval', 30)
+        extraction_mode = data.get('extraction_mode') or os.environ.get('CRAWLER_EXTRACTION_MODE') or 'script'
+        use_observer = data.get('use_observer', True)
+        upload_chunk_size = int(data.get('upload_chunk_size') or os.environ.get('DJANGO_UPLOAD_CHUNK_SIZE') or 25)
+        # Gzip upload bodies only if the Django side decodes Content-Encoding: gzip
+        upload_gzip = data.get('upload_gzip', os.environ.get('DJANGO_UPLOAD_GZIP', '').lower() in ('1', 'true', 'yes'))
+        # Durable delivery queue; pass an empty outbox_path to send straight to Django
+        outbox_path = data.get('outbox_path', os.environ.get('CRAWLER_OUTBOX_PATH', os.path.abspath('./whatsapp-outbox.db')))
+        delivered_index_path = data.get('delivered_index_path', os.environ.get('CRAWLER_DELIVERED_INDEX_PATH', os.path.abspath('./whatsapp-delivered.idx')))
+        # raw, compressed (zlib in memory) or minified (generated class names stripped, then compressed)
+        html_mode = data.get('html_mode') or os.environ.get('CRAWLER_HTML_MODE') or 'compressed'
         
         print(f"🚀 Starting simplified WhatsApp crawler...")
         print(f"📡 Django URL: {django_url}")
         print(f"⏰ Check interval: {check_interval}s")
+        print(f"🧩 Extraction mode: {extraction_mode}")
+        print(f"👀 New-message observer: {'on' if use_observer else 'off'}")
+        print(f"📦 Upload chunk size: {upload_chunk_size} ({'gzip' if upload_gzip else 'plain JSON'})")
+        print(f"📮 Outbox: {outbox_path or 'disabled'}")
+        print(f"📚 Delivered index: {delivered_index_path or 'disabled'}")
+        print(f"🗜️ Row HTML: {html_mode}")
         
         # Create new crawler instance
-        crawler = SimplifiedWhatsAppCrawler(django_url=django_url)
+        crawler = SimplifiedWhatsAppCrawler(django_url=django_url, extraction_mode=extraction_mode,
+                                            upload_chunk_size=upload_chunk_size, outbox_path=outbox_path or None,
+                                            delivered_index_path=delivered_index_path or None,
+                                            html_mode=html_mode, upload_gzip=bool(upload_gzip))
         
         # Start WhatsApp session
         if not crawler.start_whatsapp_session():
@@ -57,7 +78,9 @@ def start_whatsapp():
         # Start periodic checking in background thread
         def run_crawler():
             try:
-                crawler.run_periodic_check(check_interval=check_interval)
+                # Polling yields the driver to API requests and scan jobs
+                with driver_priority(BACKGROUND):
+                    crawler.run_periodic_check(check_interval=check_interval, use_observer=use_observer)
             except Exception as e:
                 print(f"❌ Crawler thread error: {e}")
         
@@ -68,7 +91,8 @@ def start_whatsapp():
             'status': 'started',
             'message': 'WhatsApp crawler started successfully',
             'django_url': django_url,
-            'check_interval': check_interval
+            'check_interval': check_interval,
+            'use_observer': use_observer
         })
         
     except Exception as e:
@@ -128,12 +152,64 @@ def get_status():
         'status': 'initialized',
         'running': crawler.is_running,
         'last_message_count': getattr(crawler, 'last_message_count', 0),
-        'session_dir': getattr(crawler, 'session_dir', None)
+        'session_dir': getattr(crawler, 'session_dir', None),
+        'scroll_timings': getattr(crawler, 'last_scroll_timings', {}),
+        'outbox': crawler.outbox.counts() if getattr(crawler, 'outbox', None) else None,
+        'active_jobs': [job.to_dict() for job in get_scan_jobs().active()],
+        'driver': driver_stats(crawler.driver)
     })
 
+def run_manual_scan(scanner, scroll_to_load_more, days_back):
+    """The scan behind /api/whatsapp/manual-scan (runs as a background job)"""
+    # Get messages (ahead of background polling in the driver queue)
+    with driver_priority(SCAN):
+        messages = scanner.get_current_messages(scroll_to_load_more=scroll_to_load_more, days_back=days_back)
+    
+    if not messages:
+        return {
+            'status': 'success',
+            'message_count': 0,
+            'message': 'No messages found'
+        }
+    
+    # Commit to the outbox (sent in the background), or straight to Django without one
+    success = scanner.deliver(messages)
+    
+    if scanner.last_queued_count is not None:
+        scanner.last_message_count = len(messages)
+        return {
+            'status': 'success',
+            'message_count': len(messages),
+            'queued_count': scanner.last_queued_count,
+            'already_queued_count': len(messages) - scanner.last_queued_count,
+            'sent_to_django': False,
+            'outbox': scanner.outbox.counts(),
+            'scroll_timings': scanner.last_scroll_timings if scroll_to_load_more else {}
+        }
+    if success:
+        scanner.last_message_count = len(messages)
+        return {
+            'status': 'success',
+            'message_count': len(messages),
+            'sent_to_django': True,
+            'scroll_timings': scanner.last_scroll_timings if scroll_to_load_more else {}
+        }
+    return {
+        'status': 'partial_success',
+        'message_count': len(messages),
+        'sent_to_django': False,
+        'delivered_count': len(scanner.last_upload.get('delivered_ids', [])),
+        'failed_count': len(scanner.last_upload.get('failed_ids', [])),
+        'message': 'Messages extracted but failed to send to Django'
+    }
+
 @app.route('/api/whatsapp/manual-scan', methods=['POST'])
 def manual_scan():
-    """Manually trigger a message scan"""
+    """
+    Manually trigger a message scan.
+    Runs as a background job; waits for it unless "async": true, which returns 202 and
+    a job_id to poll at /api/jobs/<job_id>. Identical concurrent scans share one job.
+    """
     global crawler
     
     try:
@@ -143,39 +219,32 @@ def manual_scan():
                 'message': 'Crawler is not running'
             }), 400
         
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or {}
         scroll_to_load_more = data.get('scroll_to_load_more', True)
         days_back = data.get('days_back', 1)  # Default: 1 day (today + yesterday)
+        run_async = bool(data.get('async', False))
         
-        print(f"🔍 Manual scan triggered (scroll={scroll_to_load_more}, days_back={days_back})")
+        print(f"🔍 Manual scan triggered (scroll={scroll_to_load_more}, days_back={days_back}, async={run_async})")
         
-        # Get messages
-        messages = crawler.get_current_messages(scroll_to_load_more=scroll_to_load_more, days_back=days_back)
+        scanner = crawler
+        job, created = get_scan_jobs().submit(
+            f"manual-scan:{scroll_to_load_more}:{days_back}",
+            lambda: run_manual_scan(scanner, scroll_to_load_more, days_back),
+            description=f"Manual scan (scroll={scroll_to_load_more}, days_back={days_back})"
+        )
         
-        if messages:
-            # Send to Django
-            success = crawler.send_to_django(messages)
-            
-            if success:
-                crawler.last_message_count = len(messages)
-                return jsonify({
-                    'status': 'success',
-                    'message_count': len(messages),
-                    'sent_to_django': True
-                })
-            else:
-                return jsonify({
-                    'status': 'partial_success',
-                    'message_count': len(messages),
-                    'sent_to_django': False,
-                    'message': 'Messages extracted but failed to send to Django'
-                })
-        else:
+        if run_async:
             return jsonify({
-                'status': 'success',
-                'message_count': 0,
-                'message': 'No messages found'
-            })
+                'status': 'accepted',
+                'job_id': job.id,
+                'status_url': f"/api/jobs/{job.id}",
+                'coalesced': not created
+            }), 202
+        
+        job.wait()
+        if job.status == FAILED:
+            raise Exception(job.error)
+        return jsonify(dict(job.result, job_id=job.id))
             
     except Exception as e:
         print(f"❌ Error during manual scan: {e}")
@@ -184,6 +253,22 @@ def manual_scan():
             'message': str(e)
         }), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Phase, progress, ETA and (when finished) result of a background scan job"""
+    job = get_scan_jobs().get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': f'Unknown job: {job_id}'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/debug/driver-stats', methods=['GET'])
+def get_driver_stats():
+    """Queue depth plus queue-wait and execution time per WebDriver command and priority"""
+    stats = driver_stats(crawler.driver) if crawler else None
+    if stats is None:
+        return jsonify({'status': 'error', 'message': 'No WebDriver session'}), 400
+    return jsonify(stats)
+
 @app.route('/api/debug/test-django', methods=['POST'])
 def test_django_connection():
     """Test connection to Django backend"""
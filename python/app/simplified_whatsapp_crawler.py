@@ -1,7 +1,6 @@
 import os
 import re
 import time
-import requests
 import hashlib
 import uuid
 import json
@@ -16,6 +15,23 @@ from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 import subprocess
 from bs4 import BeautifulSoup
+from app.core.dom_scripts import (
+    EXTRACT_ROWS_SCRIPT,
+    ROW_FINGERPRINTS_SCRIPT,
+    INSTALL_MESSAGE_OBSERVER_SCRIPT,
+    DRAIN_MESSAGE_QUEUE_ASYNC_SCRIPT,
+    DRAIN_MESSAGE_QUEUE_SCRIPT,
+)
+from app.core.driver_executor import serialize_driver
+from app.core.page_source import PageSourceDriver, snapshot_driver, is_offline_element
+from app.core.row_expansion import expand_truncated_rows
+from app.core.scan_jobs import report_progress
+from app.core.scroll_loader import ScrollLoader
+from app.core.django_uploader import DEFAULT_UPLOAD_GZIP, DjangoUploader
+from app.core.delivered_index import DeliveredMessageIndex
+from app.core.html_store import DEFAULT_HTML_MODE, HTML_MODES, store_html
+from app.core.message_outbox import MessageOutbox, OutboxSender
+from app.core.processed_index import ProcessedMessageIndex, row_fingerprint
 
 class SimplifiedWhatsAppCrawler:
     """
@@ -24,15 +40,46 @@ class SimplifiedWhatsAppCrawler:
     2. Handles "read more" expansion
     3. Sends raw HTML to Django backend
     4. Periodically checks for new messages
+    
+    Extraction modes:
+    - 'script': one execute_script call collects every row (falls back to 'element' on failure)
+    - 'element': per-element WebDriver calls for each row
+    - 'page_source': snapshot #main once and run the per-element logic on a local parse
     """
     
-    def __init__(self, django_url="http://localhost:8000"):
+    EXTRACTION_MODES = ('script', 'element', 'page_source')
+
+    # Longest single observer long-poll (seconds)
+    OBSERVER_POLL_SLICE = 0.5
+
+    def __init__(self, django_url="http://localhost:8000", extraction_mode="script", upload_chunk_size=25,
+                 outbox_path=None, delivered_index_path=None, html_mode=DEFAULT_HTML_MODE,
+                 upload_gzip=DEFAULT_UPLOAD_GZIP):
+        # Validate before opening the outbox / delivered index files
+        if html_mode not in HTML_MODES:
+            raise ValueError(f"Unknown HTML mode: {html_mode} (expected one of {HTML_MODES})")
+        if extraction_mode not in self.EXTRACTION_MODES:
+            raise ValueError(f"Unknown extraction mode: {extraction_mode} (expected one of {self.EXTRACTION_MODES})")
+        self.html_mode = html_mode  # How row outerHTML is held until delivery (see app.core.html_store)
+        self.extraction_mode = extraction_mode
+        
         self.driver = None
         self.is_running = False
         self.session_dir = None
         self.django_url = django_url
         self.last_message_count = 0
         self.messages_captured_during_scroll = []  # Track messages during scroll
+        self.observer_max_queue = 500  # Rows buffered in-page between drains
+        self.processed_index = ProcessedMessageIndex()  # data-id -> fingerprint of rows already handled
+        self.row_fingerprints = {}  # Fingerprints of extracted rows awaiting mark_processed()
+        self.last_scroll_timings = {}  # ScrollLoader.timing_summary() of the last scrolled scan
+        self.uploader = DjangoUploader(django_url, chunk_size=upload_chunk_size, compress=upload_gzip)
+        self.last_upload = {}  # DjangoUploader.upload() result of the last send_to_django
+        self.last_queued_count = None  # Messages the last deliver() newly queued (None: sent directly)
+        self.outbox = MessageOutbox(outbox_path) if outbox_path else None  # Durable queue in front of Django
+        self.outbox_sender = None
+        # data-ids Django has acknowledged, kept across restarts
+        self.delivered_index = DeliveredMessageIndex(delivered_index_path) if delivered_index_path else None
         
     def cleanup_existing_sessions(self):
         """Kill any existing Chrome processes using our session directory"""
@@ -68,7 +115,8 @@ class SimplifiedWhatsAppCrawler:
         try:
             # Try system ChromeDriver first
             print("🔧 Using system ChromeDriver...")
-            self.driver = webdriver.Chrome(options=chrome_options)
+            # One executor thread issues every command (Selenium isn't thread-safe)
+            self.driver = serialize_driver(webdriver.Chrome(options=chrome_options))
             self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
             print("✅ Chrome WebDriver initialized successfully")
             return True
@@ -371,6 +419,46 @@ class SimplifiedWhatsAppCrawler:
             # If we can't parse the date, include the message to be safe
             return True
 
+    def parse_pre_plain_timestamp(self, pre):
+        """Parse a data-pre-plain-text header like '[08:52, 01/09/2025] Karl: ' into an ISO timestamp"""
+        if not (pre.startswith('[') and ']' in pre):
+            return None
+        try:
+            inside = pre[1:pre.index(']')].strip()
+            parts = [p.strip() for p in inside.split(',')]
+            if len(parts) == 2 and ':' in parts[0] and '/' in parts[1]:
+                # Try both date formats (MM/DD/YYYY and DD/MM/YYYY)
+                date_str = parts[1]
+                time_str = parts[0]
+                dt = None
+                
+                # Try MM/DD/YYYY first (American format)
+                try:
+                    dt = datetime.strptime(f"{date_str} {time_str}", "%m/%d/%Y %H:%M")
+                except ValueError:
+                    # Try DD/MM/YYYY (European format)
+                    try:
+                        dt = datetime.strptime(f"{date_str} {time_str}", "%d/%m/%Y %H:%M")
+                    except ValueError:
+                        pass
+                
+                if dt:
+                    return dt.replace(tzinfo=timezone.utc).isoformat()
+        except Exception as e:
+            print(f"⚠️ Error parsing timestamp from pre-plain-text: {e}")
+        return None
+
+    def parse_time_text_timestamp(self, time_text):
+        """Parse a visible 'HH:MM' time badge as today's timestamp"""
+        if time_text and ':' in time_text and re.match(r'^\d{1,2}:\d{2}$', time_text):
+            today = datetime.now().strftime("%d/%m/%Y")
+            try:
+                parsed_datetime = datetime.strptime(f"{today} {time_text}", "%d/%m/%Y %H:%M")
+                return parsed_datetime.replace(tzinfo=timezone.utc).isoformat()
+            except Exception:
+                return None
+        return None
+
     def extract_timestamp_from_element(self, msg_elem):
         """Extract timestamp with improved accuracy"""
         timestamp = None
@@ -380,50 +468,19 @@ class SimplifiedWhatsAppCrawler:
             # Method 1: data-pre-plain-text attribute
             pre_nodes = msg_elem.find_elements(By.CSS_SELECTOR, '.copyable-text')
             for pn in pre_nodes:
-                pre = pn.get_attribute('data-pre-plain-text') or ''
-                if pre.startswith('[') and ']' in pre:
-                    try:
-                        inside = pre[1:pre.index(']')].strip()
-                        parts = [p.strip() for p in inside.split(',')]
-                        if len(parts) == 2 and ':' in parts[0] and '/' in parts[1]:
-                            # Try both date formats (MM/DD/YYYY and DD/MM/YYYY)
-                            date_str = parts[1]
-                            time_str = parts[0]
-                            dt = None
-                            
-                            # Try MM/DD/YYYY first (American format)
-                            try:
-                                dt = datetime.strptime(f"{date_str} {time_str}", "%m/%d/%Y %H:%M")
-                            except ValueError:
-                                # Try DD/MM/YYYY (European format)
-                                try:
-                                    dt = datetime.strptime(f"{date_str} {time_str}", "%d/%m/%Y %H:%M")
-                                except ValueError:
-                                    pass
-                            
-                            if dt:
-                                timestamp = dt.replace(tzinfo=timezone.utc).isoformat()
-                                ts_source = 'pre_plain'
-                                break
-                    except Exception as e:
-                        print(f"⚠️ Error parsing timestamp from pre-plain-text: {e}")
-                        continue
+                timestamp = self.parse_pre_plain_timestamp(pn.get_attribute('data-pre-plain-text') or '')
+                if timestamp:
+                    ts_source = 'pre_plain'
+                    break
             
             # Method 2: Visible time spans
             if not timestamp:
                 time_elems = msg_elem.find_elements(By.CSS_SELECTOR, 'span.x1c4vz4f.x2lah0s')
                 for elem in time_elems:
-                    time_text = (elem.text or '').strip()
-                    if time_text and ':' in time_text and re.match(r'^\d{1,2}:\d{2}$', time_text):
-                        today = datetime.now().strftime("%d/%m/%Y")
-                        full_datetime_str = f"{today} {time_text}"
-                        try:
-                            parsed_datetime = datetime.strptime(full_datetime_str, "%d/%m/%Y %H:%M")
-                            timestamp = parsed_datetime.replace(tzinfo=timezone.utc).isoformat()
-                            ts_source = 'span_time_today'
-                            break
-                        except Exception:
-                            continue
+                    timestamp = self.parse_time_text_timestamp((elem.text or '').strip())
+                    if timestamp:
+                        ts_source = 'span_time_today'
+                        break
             
             # Method 3: Fallback to processing time
             if not timestamp:
@@ -437,6 +494,20 @@ class SimplifiedWhatsAppCrawler:
         
         return timestamp, ts_source
 
+    def timestamp_from_row_data(self, row):
+        """Same three-method timestamp extraction as extract_timestamp_from_element, on batch row data"""
+        for pre in row.get('pre_plain_texts') or []:
+            timestamp = self.parse_pre_plain_timestamp(pre)
+            if timestamp:
+                return timestamp, 'pre_plain'
+        
+        for time_text in row.get('time_texts') or []:
+            timestamp = self.parse_time_text_timestamp(time_text)
+            if timestamp:
+                return timestamp, 'span_time_today'
+        
+        return datetime.now(timezone.utc).isoformat(), 'processing_time_fallback'
+
     def clean_timestamp_contamination(self, text):
         """Clean timestamp contamination from message text"""
         if not text:
@@ -467,7 +538,7 @@ class SimplifiedWhatsAppCrawler:
         
         return cleaned
 
-    def get_current_messages(self, scroll_to_load_more=False, days_back=1):
+    def get_current_messages(self, scroll_to_load_more=False, days_back=1, stop_at_delivered=False):
         """
         Get current messages from the chat
         
@@ -476,6 +547,8 @@ class SimplifiedWhatsAppCrawler:
             days_back: Number of days back to include (default: 1 = today + yesterday)
                        Use 7 for last week, 30 for last month, etc.
                        Set to None to disable date filtering entirely
+            stop_at_delivered: Also stop scrolling once the oldest visible rows were all
+                               delivered to Django before (needs delivered_index)
         """
         try:
             # Calculate date range
@@ -501,68 +574,46 @@ class SimplifiedWhatsAppCrawler:
                     scroll_container = self.driver.find_element(By.CSS_SELECTOR, '.copyable-area')
                     print("✅ Found scroll container: .copyable-area")
                     
-                    # Scroll with date checking
-                    scroll_attempts = 0
-                    max_scrolls = 50
-                    stable_count = 0
-                    previous_count = 0
-                    should_stop = False
+                    # Scroll with date checking, waiting only as long as rows take to render
+                    def reached_cutoff(window):
+                        if (stop_at_delivered and self.delivered_index is not None
+                                and self.delivered_index.contiguous_run(window.get('oldest_ids') or [])):
+                            print(f"📚 [SCROLL] Oldest visible rows were already delivered - stopping scroll")
+                            return True
+                        if not cutoff_date:
+                            return False
+                        for pre in window.get('pre_plain_texts') or []:
+                            timestamp = self.parse_pre_plain_timestamp(pre)
+                            msg_date = datetime.fromisoformat(timestamp).date() if timestamp else None
+                            if msg_date and msg_date < cutoff_date:
+                                print(f"📅 [SCROLL] Found message from {msg_date} - stopping scroll")
+                                return True
+                        return False
+                    
+                    loader = ScrollLoader(self.driver, scroll_container)
+                    loader.load(max_scrolls=50, should_stop=reached_cutoff)
+                    self.last_scroll_timings = loader.timing_summary()
                     
-                    while scroll_attempts < max_scrolls and not should_stop:
-                        current_messages = self.driver.find_elements(By.CSS_SELECTOR, '#main [role="row"]')
-                        current_count = len(current_messages)
-                        
-                        print(f"📊 Scroll {scroll_attempts + 1}: {current_count} messages")
-                        
-                        # Check oldest visible messages for date cutoff (only if date filtering enabled)
-                        if cutoff_date and scroll_attempts > 0 and current_count > 0:
-                            for i in range(min(5, len(current_messages))):
-                                try:
-                                    msg_elem = current_messages[i]
-                                    timestamp, _ = self.extract_timestamp_from_element(msg_elem)
-                                    if timestamp:
-                                        msg_datetime = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                                        msg_date = msg_datetime.date()
-                                        if msg_date < cutoff_date:
-                                            print(f"📅 [SCROLL] Found message from {msg_date} - stopping scroll")
-                                            should_stop = True
-                                            break
-                                except Exception:
-                                    continue
-                        
-                        if should_stop:
-                            break
-                        
-                        # Check if no new messages loaded
-                        if current_count == previous_count:
-                            stable_count += 1
-                            if stable_count >= 10:
-                                print("🔝 Reached top - no more messages")
-                                break
-                        else:
-                            stable_count = 0
-                        
-                        previous_count = current_count
-                        
-                        # Scroll up
-                        self.driver.execute_script("arguments[0].scrollTop = 0", scroll_container)
-                        
-                        # Aggressive scroll every 5th attempt
-                        if scroll_attempts % 5 == 0:
-                            try:
-                                scroll_container.send_keys(Keys.CONTROL + Keys.HOME)
-                            except:
-                                pass
-                        
-                        time.sleep(3)
-                        scroll_attempts += 1
-                        
                 except Exception as e:
                     print(f"⚠️ Could not scroll: {e} - continuing with visible messages")
             
-            # Get message elements
+            # Fast path: extract every row in a single script call
+            if self.extraction_mode == 'script':
+                html_messages = self.get_messages_via_script(days_back=days_back)
+                if html_messages is not None:
+                    return html_messages
+                print("⚠️ [BATCH] Script extraction failed - falling back to per-element extraction")
+            
+            # Expand truncated rows up front so the per-row loop (or snapshot) sees full text
+            expanded_previews = self.expand_visible_rows()
+            
+            # Get message elements (from a local snapshot in page_source mode)
+            row_source = self.driver
+            if self.extraction_mode == 'page_source':
+                row_source = snapshot_driver(self.driver) or self.driver
+            
             try:
-                message_elements = self.driver.find_elements(By.CSS_SELECTOR, '#main [role="row"]')
+                message_elements = row_source.find_elements(By.CSS_SELECTOR, '#main [role="row"]')
                 print(f"📝 Found {len(message_elements)} total message elements")
                 
                 if not message_elements:
@@ -573,69 +624,327 @@ class SimplifiedWhatsAppCrawler:
                 print(f"❌ Error finding message elements: {e}")
                 return []
             
-            html_messages = []
-            messages_in_range = 0
-            messages_filtered = 0
+            return self.extract_messages_from_elements(message_elements, days_back=days_back,
+                                                       expanded_previews=expanded_previews)
             
-            for i, msg_elem in enumerate(message_elements):
-                try:
-                    # Extract timestamp first for date filtering
-                    timestamp, ts_source = self.extract_timestamp_from_element(msg_elem)
+        except Exception as e:
+            print(f"❌ Error getting messages: {e}")
+            import traceback
+            print(f"Full traceback: {traceback.format_exc()}")
+            return []
+
+    def extract_messages_from_elements(self, message_elements, days_back=1, skip_processed=False,
+                                       expanded_previews=None):
+        """
+        Per-row extraction shared by live elements and parsed snapshots
+        
+        Args:
+            skip_processed: Skip rows whose data-id and fingerprint are already in processed_index
+            expanded_previews: {data-id: truncated preview} for rows already expanded by expand_visible_rows
+        """
+        expanded_previews = expanded_previews or {}
+        html_messages = []
+        messages_in_range = 0
+        messages_filtered = 0
+        messages_skipped = 0
+        
+        for i, msg_elem in enumerate(message_elements):
+            report_progress('extracting', i, len(message_elements))
+            try:
+                # Identify the row cheaply before any extraction
+                data_id_nodes = msg_elem.find_elements(By.CSS_SELECTOR, '[data-id]')
+                row_id = data_id_nodes[0].get_attribute('data-id') if data_id_nodes else None
+                fingerprint = row_fingerprint(msg_elem.get_attribute('textContent'))
+                
+                if skip_processed and (not row_id or self.processed_index.is_unchanged(row_id, fingerprint)):
+                    messages_skipped += 1
+                    continue
+                
+                # Extract timestamp first for date filtering
+                timestamp, ts_source = self.extract_timestamp_from_element(msg_elem)
+                
+                # DATE FILTER: Apply date filtering if enabled
+                if days_back is not None and not self.is_message_in_date_range(timestamp, days_back=days_back):
+                    messages_filtered += 1
+                    self.processed_index.mark(row_id, fingerprint)
+                    continue
+                
+                # Extract message with expansion handling
+                message_data = self.extract_message_with_expansion(msg_elem)
+                if message_data and row_id in expanded_previews and not message_data.get('was_expanded'):
+                    message_data['was_expanded'] = True
+                    message_data['original_preview'] = expanded_previews[row_id]
+                
+                if message_data and message_data['content'].strip():
+                    # Clean timestamp contamination from content
+                    cleaned_content = self.clean_timestamp_contamination(message_data['content'])
+                    message_data['content'] = cleaned_content
                     
-                    # DATE FILTER: Apply date filtering if enabled
-                    if days_back is not None and not self.is_message_in_date_range(timestamp, days_back=days_back):
-                        messages_filtered += 1
-                        continue
+                    # Get unique message ID from WhatsApp
+                    message_id = row_id or f"msg_{int(time.time())}_{i}"
                     
-                    # Extract message with expansion handling
-                    message_data = self.extract_message_with_expansion(msg_elem)
+                    # Get raw HTML (expanded snapshot rows were re-read from the live page)
+                    raw_html = msg_elem.get_attribute('outerHTML')
+                    if message_data.get('was_expanded') and is_offline_element(msg_elem) and row_id not in expanded_previews:
+                        live_elem = self.find_row_element(message_id)
+                        if live_elem is not None:
+                            raw_html = live_elem.get_attribute('outerHTML')
                     
-                    if message_data and message_data['content'].strip():
-                        # Clean timestamp contamination from content
-                        cleaned_content = self.clean_timestamp_contamination(message_data['content'])
-                        message_data['content'] = cleaned_content
-                        
-                        # Get raw HTML
-                        raw_html = msg_elem.get_attribute('outerHTML')
-                        
-                        # Get unique message ID from WhatsApp
-                        data_id_nodes = msg_elem.find_elements(By.CSS_SELECTOR, '[data-id]')
-                        message_id = data_id_nodes[0].get_attribute('data-id') if data_id_nodes else f"msg_{int(time.time())}_{i}"
-                        
-                        html_message = {
-                            'id': message_id,
-                            'chat': os.environ.get('TARGET_GROUP_NAME', 'ORDERS Restaurants'),
-                            'html': raw_html,
-                            'timestamp': timestamp,
-                            'timestamp_source': ts_source,
-                            'message_data': message_data
-                        }
-                        
-                        html_messages.append(html_message)
-                        messages_in_range += 1
-                        
-                        expansion_status = ""
-                        if message_data.get('was_expanded'):
-                            expansion_status = " [EXPANDED]"
-                        elif message_data.get('expansion_failed'):
-                            expansion_status = " [EXPANSION FAILED]"
-                        
-                        print(f"📝 Message {i}: {cleaned_content[:50]}...{expansion_status}")
+                    html_message = {
+                        'id': message_id,
+                        'chat': os.environ.get('TARGET_GROUP_NAME', 'ORDERS Restaurants'),
+                        'html': store_html(raw_html, self.html_mode),
+                        'timestamp': timestamp,
+                        'timestamp_source': ts_source,
+                        'message_data': message_data
+                    }
                     
-                except Exception as e:
-                    print(f"⚠️ Error processing message {i}: {e}")
+                    html_messages.append(html_message)
+                    self.row_fingerprints[message_id] = fingerprint
+                    messages_in_range += 1
+                    
+                    expansion_status = ""
+                    if message_data.get('was_expanded'):
+                        expansion_status = " [EXPANDED]"
+                    elif message_data.get('expansion_failed'):
+                        expansion_status = " [EXPANSION FAILED]"
+                    
+                    print(f"📝 Message {i}: {cleaned_content[:50]}...{expansion_status}")
+                else:
+                    # Nothing to send for this row - don't look at it again until it changes
+                    self.processed_index.mark(row_id, fingerprint)
+                
+            except Exception as e:
+                print(f"⚠️ Error processing message {i}: {e}")
+                continue
+        
+        print(f"✅ Extracted {len(html_messages)} messages in date range")
+        print(f"📊 [DATE_FILTER] In range: {messages_in_range}, Filtered out: {messages_filtered}")
+        if skip_processed:
+            print(f"📊 [INCREMENTAL] Skipped {messages_skipped} already-processed rows")
+        return html_messages
+
+    def parse_html(self, html, days_back=None):
+        """Re-parse saved WhatsApp HTML without Chrome (no expansion possible offline)"""
+        snapshot = PageSourceDriver.from_html(html)
+        message_elements = snapshot.find_elements(By.CSS_SELECTOR, '#main [role="row"]')
+        print(f"📝 [PAGE_SOURCE] Parsing {len(message_elements)} saved rows")
+        return self.extract_messages_from_elements(message_elements, days_back=days_back)
+
+    def extract_rows_via_script(self, row_ids=None):
+        """
+        Collect id, pre-plain-text, text, truncation flag and outerHTML for every
+        row (or only row_ids) in one WebDriver round trip. Returns None if the script fails.
+        """
+        try:
+            raw = self.driver.execute_script(EXTRACT_ROWS_SCRIPT, row_ids)
+            rows = json.loads(raw) if isinstance(raw, str) else raw
+            if not isinstance(rows, list):
+                print(f"⚠️ [BATCH] Unexpected script result: {type(rows).__name__}")
+                return None
+            return rows
+        except Exception as e:
+            print(f"⚠️ [BATCH] Row extraction script error: {e}")
+            return None
+
+    def find_changed_row_ids(self):
+        """
+        data-ids of visible rows that are new or changed since they were processed,
+        from one cheap fingerprint script. Returns None if the script fails.
+        """
+        try:
+            raw = self.driver.execute_script(ROW_FINGERPRINTS_SCRIPT)
+            rows = json.loads(raw) if isinstance(raw, str) else raw
+        except Exception as e:
+            print(f"⚠️ [INCREMENTAL] Fingerprint script error: {e}")
+            return None
+        
+        changed = [
+            row['id'] for row in rows
+            if row.get('id') and not self.processed_index.is_unchanged(row['id'], row_fingerprint(row.get('fingerprint_text')))
+        ]
+        print(f"📊 [INCREMENTAL] {len(changed)} new/changed of {len(rows)} visible rows")
+        return changed
+
+    def live_element_for(self, offline_elem):
+        """Map a parsed snapshot row back to the live row element (None offline or if gone)"""
+        if self.driver is None or isinstance(self.driver, PageSourceDriver):
+            return None
+        data_id_nodes = offline_elem.find_elements(By.CSS_SELECTOR, '[data-id]')
+        message_id = data_id_nodes[0].get_attribute('data-id') if data_id_nodes else None
+        return self.find_row_element(message_id) if message_id else None
+
+    def find_row_element(self, message_id):
+        """Find the live row element for a WhatsApp data-id (None if not rendered)"""
+        rows = self.driver.find_elements(By.XPATH, f'//div[@id="main"]//div[@role="row"][.//*[@data-id="{message_id}"]]')
+        return rows[0] if rows else None
+
+    def get_messages_via_script(self, days_back=1, row_ids=None):
+        """
+        Batch counterpart of the per-element loop in get_current_messages.
+        Truncated rows are expanded together with one wait, then re-read in one more call.
+        Returns None when the batch script is unavailable so the caller can fall back.
+        """
+        rows = self.extract_rows_via_script(row_ids)
+        if rows is None:
+            return None
+        
+        print(f"📝 Found {len(rows)} total message elements (batch)")
+        if not rows:
+            print("❌ No message elements found")
+            return []
+        
+        html_messages = []
+        messages_in_range = 0
+        messages_filtered = 0
+        
+        # Pass 1: date filter and drop empty rows
+        kept = []
+        for row in rows:
+            try:
+                fingerprint = row_fingerprint(row.get('fingerprint_text'))
+                timestamp, ts_source = self.timestamp_from_row_data(row)
+                
+                # DATE FILTER: Apply date filtering if enabled
+                if days_back is not None and not self.is_message_in_date_range(timestamp, days_back=days_back):
+                    messages_filtered += 1
+                    self.processed_index.mark(row.get('id'), fingerprint)
+                    continue
+                
+                if not (row.get('text') or '').strip():
+                    self.processed_index.mark(row.get('id'), fingerprint)
                     continue
+                
+                kept.append((row, fingerprint, timestamp, ts_source))
+            except Exception as e:
+                print(f"⚠️ Error processing message {row.get('index', 0)}: {e}")
+                continue
+        
+        # Pass 2: expand every truncated row at once, then re-read just those rows
+        truncated_ids = [row['id'] for row, _, _, _ in kept if row.get('truncated') and row.get('id')]
+        expansion = None
+        expanded_rows = {}
+        if truncated_ids:
+            report_progress('expanding', 0, len(truncated_ids))
+            expansion = expand_truncated_rows(self.driver, truncated_ids)
+            if expansion and expansion['expanded']:
+                for fresh in self.extract_rows_via_script(expansion['expanded']) or []:
+                    expanded_rows[fresh.get('id')] = fresh
+        
+        for n, (row, fingerprint, timestamp, ts_source) in enumerate(kept):
+            report_progress('extracting', n, len(kept))
+            i = row.get('index', 0)
+            try:
+                text = row.get('text') or ''
+                message_id = row.get('id') or f"msg_{int(time.time())}_{i}"
+                raw_html = row.get('html') or ''
+                message_data = {
+                    'content': text,
+                    'was_expanded': False
+                }
+                
+                if row.get('truncated') and row.get('id'):
+                    if expansion is None:
+                        # Bulk expansion unavailable - click this row on its own
+                        msg_elem = self.find_row_element(row['id'])
+                        if msg_elem is not None:
+                            message_data = self.extract_message_with_expansion(msg_elem) or message_data
+                            if message_data.get('was_expanded'):
+                                raw_html = msg_elem.get_attribute('outerHTML')
+                    elif row['id'] in expanded_rows:
+                        fresh = expanded_rows[row['id']]
+                        message_data = {
+                            'content': fresh.get('text') or text,
+                            'was_expanded': True,
+                            'original_preview': text[:100]
+                        }
+                        raw_html = fresh.get('html') or raw_html
+                    else:
+                        message_data = {
+                            'content': text,
+                            'was_expanded': False,
+                            'expansion_failed': True,
+                            'error': 'Could not find or click expand button',
+                            'original_preview': text[:100]
+                        }
+                
+                cleaned_content = self.clean_timestamp_contamination(message_data['content'])
+                message_data['content'] = cleaned_content
+                
+                self.row_fingerprints[message_id] = fingerprint
+                html_messages.append({
+                    'id': message_id,
+                    'chat': os.environ.get('TARGET_GROUP_NAME', 'ORDERS Restaurants'),
+                    'html': store_html(raw_html, self.html_mode),
+                    'timestamp': timestamp,
+                    'timestamp_source': ts_source,
+                    'message_data': message_data
+                })
+                messages_in_range += 1
+                
+                expansion_status = ""
+                if message_data.get('was_expanded'):
+                    expansion_status = " [EXPANDED]"
+                elif message_data.get('expansion_failed'):
+                    expansion_status = " [EXPANSION FAILED]"
+                
+                print(f"📝 Message {i}: {cleaned_content[:50]}...{expansion_status}")
+                
+            except Exception as e:
+                print(f"⚠️ Error processing message {i}: {e}")
+                continue
+        
+        print(f"✅ Extracted {len(html_messages)} messages in date range")
+        print(f"📊 [DATE_FILTER] In range: {messages_in_range}, Filtered out: {messages_filtered}")
+        return html_messages
+
+    def get_new_messages(self, days_back=1):
+        """
+        Visible rows that were not processed yet (or changed since), without scrolling.
+        Already-processed rows are skipped before any text extraction or HTML fetch.
+        """
+        try:
+            if self.extraction_mode == 'script':
+                changed_ids = self.find_changed_row_ids()
+                if changed_ids is not None:
+                    if not changed_ids:
+                        return []
+                    html_messages = self.get_messages_via_script(days_back=days_back, row_ids=changed_ids)
+                    if html_messages is not None:
+                        return html_messages
+                print("⚠️ [BATCH] Script extraction failed - falling back to per-element extraction")
             
-            print(f"✅ Extracted {len(html_messages)} messages in date range")
-            print(f"📊 [DATE_FILTER] In range: {messages_in_range}, Filtered out: {messages_filtered}")
-            return html_messages
+            expanded_previews = self.expand_visible_rows()
+            row_source = self.driver
+            if self.extraction_mode == 'page_source':
+                row_source = snapshot_driver(self.driver) or self.driver
+            message_elements = row_source.find_elements(By.CSS_SELECTOR, '#main [role="row"]')
+            return self.extract_messages_from_elements(message_elements, days_back=days_back, skip_processed=True,
+                                                       expanded_previews=expanded_previews)
             
         except Exception as e:
-            print(f"❌ Error getting messages: {e}")
-            import traceback
-            print(f"Full traceback: {traceback.format_exc()}")
+            print(f"❌ Error getting new messages: {e}")
             return []
 
+    def mark_processed(self, html_messages):
+        """Record delivered messages so later scans skip their rows"""
+        for message in html_messages:
+            fingerprint = self.row_fingerprints.pop(message['id'], None)
+            if fingerprint is not None:
+                self.processed_index.mark(message['id'], fingerprint)
+
+    def expand_visible_rows(self, row_ids=None):
+        """
+        Click read more on every truncated row (or row_ids) in one pass with a single wait.
+        Returns {data-id: truncated preview} for the rows that expanded ({} offline or on failure).
+        """
+        if self.driver is None or isinstance(self.driver, PageSourceDriver):
+            return {}
+        expansion = expand_truncated_rows(self.driver, row_ids)
+        if not expansion:
+            return {}
+        return {row_id: expansion['previews'].get(row_id, '') for row_id in expansion['expanded']}
+
     def extract_message_with_expansion(self, msg_element):
         """Extract message content with automatic read more expansion"""
         try:
@@ -649,6 +958,18 @@ class SimplifiedWhatsAppCrawler:
             if self.is_truncated(initial_text):
                 print(f"🔍 [TRUNCATE] Detected truncated message: '{initial_text[:50]}...'")
                 
+                # Snapshot rows can't be clicked - expand the matching live row instead
+                if is_offline_element(msg_element):
+                    msg_element = self.live_element_for(msg_element)
+                    if msg_element is None:
+                        return {
+                            'content': initial_text,
+                            'was_expanded': False,
+                            'expansion_failed': True,
+                            'error': 'Row not available on the live page',
+                            'original_preview': initial_text[:100]
+                        }
+                
                 # Step 3: Find and click expand button
                 if self.expand_message(msg_element):
                     # Step 4: Re-extract full content after expansion
@@ -794,71 +1115,224 @@ class SimplifiedWhatsAppCrawler:
             return ""
 
     def send_to_django(self, html_messages):
-        """Send HTML messages to Django backend"""
+        """
+        Send HTML messages to Django backend in acknowledged chunks.
+        Delivered chunks are marked processed straight away, so a failed chunk is
+        the only part picked up again by the next scan. Returns True if everything was delivered.
+        """
         if not html_messages:
             print("📭 No messages to send to Django")
             return True
             
         try:
-            url = f"{self.django_url}/api/whatsapp/receive-html/"
-            payload = {
-                'messages': html_messages
-            }
+            print(f"📤 Sending {len(html_messages)} messages to Django: {self.uploader.url} "
+                  f"({self.uploader.chunk_size} per chunk)")
             
-            print(f"📤 Sending {len(html_messages)} messages to Django: {url}")
+            result = self.uploader.upload(html_messages)
+            self.last_upload = result
             
-            response = requests.post(url, json=payload, timeout=30)
+            delivered = set(result['delivered_ids'])
+            self.mark_processed([m for m in html_messages if m['id'] in delivered])
+            if self.delivered_index is not None:
+                self.delivered_index.add_many(result['delivered_ids'])
             
-            if response.status_code == 200:
-                result = response.json()
-                print(f"✅ Django processed {result.get('processed_count', 0)} messages")
-                print(f"📊 Expansion stats: {result.get('expansion_stats', {})}")
-                return True
-            else:
-                print(f"❌ Django error {response.status_code}: {response.text}")
+            print(f"✅ Django processed {result['processed_count']} messages "
+                  f"({len(delivered)}/{len(html_messages)} delivered in {result['chunks']} chunks)")
+            print(f"📊 Expansion stats: {result['expansion_stats']}")
+            
+            if result['failed_ids']:
+                print(f"❌ {result['failed_chunks']} chunks failed - {len(result['failed_ids'])} messages will be retried")
                 return False
+            return True
                 
         except Exception as e:
             print(f"❌ Error sending to Django: {e}")
             return False
 
-    def run_periodic_check(self, check_interval=30):
+    def deliver(self, html_messages):
+        """
+        Hand messages over for delivery: committed to the outbox (and sent in the
+        background) when one is configured, otherwise sent to Django right away
+        """
+        self.last_queued_count = None
+        if not html_messages:
+            return True
+        
+        if self.outbox is None:
+            success = self.send_to_django(html_messages)
+            self.last_message_count += len(self.last_upload.get('delivered_ids', []))
+            return success
+        
+        try:
+            fingerprints = {m['id']: self.row_fingerprints.get(m['id']) for m in html_messages}
+            queued = self.outbox.enqueue(html_messages, fingerprints)
+            # Safely on disk - later scans can skip these rows
+            self.mark_processed(html_messages)
+            self.last_queued_count = len(queued)
+            print(f"📮 [OUTBOX] Queued {len(queued)} messages ({len(html_messages) - len(queued)} already queued)")
+            if self.outbox_sender:
+                self.outbox_sender.notify()
+            return True
+        except Exception as e:
+            print(f"❌ [OUTBOX] Could not queue messages: {e} - sending directly")
+            return self.send_to_django(html_messages)
+
+    def skip_delivered(self, html_messages):
+        """Drop messages Django already acknowledged (in an earlier run); they count as processed"""
+        if self.delivered_index is None:
+            return html_messages
+        already = [m for m in html_messages if m['id'] in self.delivered_index]
+        if already:
+            self.mark_processed(already)
+            print(f"📚 [DELIVERED] Skipping {len(already)} messages Django already has")
+        return [m for m in html_messages if m['id'] not in self.delivered_index]
+
+    def start_outbox_sender(self):
+        """Start the background thread that drains the outbox"""
+        if self.outbox is None or (self.outbox_sender and self.outbox_sender.is_alive()):
+            return
+        
+        def delivered(message_ids):
+            self.last_message_count += len(message_ids)
+            if self.delivered_index is not None:
+                self.delivered_index.add_many(message_ids)
+        
+        self.outbox_sender = OutboxSender(self.outbox, self.uploader, on_delivered=delivered)
+        self.outbox_sender.start()
+
+    def outbox_resume_days_back(self, max_days=7):
+        """
+        How far back a restart needs to scan: up to the newest message already in the
+        outbox, instead of the full max_days. None when the outbox is empty.
+        """
+        if self.outbox is None:
+            return None
+        newest = self.outbox.newest_timestamp()
+        if not newest:
+            return None
+        try:
+            newest_date = datetime.fromisoformat(newest.replace('Z', '+00:00')).date()
+        except ValueError:
+            return None
+        days = (datetime.now(timezone.utc).date() - newest_date).days
+        return max(0, min(days, max_days))
+
+    def install_message_observer(self):
+        """Install the in-page MutationObserver that queues newly inserted rows"""
+        try:
+            installed = bool(self.driver.execute_script(INSTALL_MESSAGE_OBSERVER_SCRIPT, self.observer_max_queue))
+            if installed:
+                print("👀 [OBSERVER] Watching #main for new messages")
+            else:
+                print("⚠️ [OBSERVER] #main not found - observer not installed")
+            return installed
+        except Exception as e:
+            print(f"⚠️ [OBSERVER] Could not install observer: {e}")
+            return False
+
+    def drain_observed_rows(self, wait_seconds=2.0):
+        """
+        Fetch and clear the observer queue, long-polling up to wait_seconds.
+        Returns a list of {id, html, observed_at}, or None if the observer is gone.
+        """
+        try:
+            # Wait in short slices: each one holds the driver, and API requests queue behind it
+            slice_seconds = min(wait_seconds, self.OBSERVER_POLL_SLICE)
+            deadline = time.time() + wait_seconds
+            self.driver.set_script_timeout(slice_seconds + 5)
+            while True:
+                raw = self.driver.execute_async_script(DRAIN_MESSAGE_QUEUE_ASYNC_SCRIPT, int(slice_seconds * 1000))
+                if raw is None or raw not in ('[]', []) or time.time() >= deadline:
+                    break
+        except Exception as e:
+            # Fall back to a short poll if async scripts misbehave
+            print(f"⚠️ [OBSERVER] Long-poll failed ({e}) - using short poll")
+            try:
+                time.sleep(wait_seconds)
+                raw = self.driver.execute_script(DRAIN_MESSAGE_QUEUE_SCRIPT)
+            except Exception as e:
+                print(f"⚠️ [OBSERVER] Short poll failed: {e}")
+                return None
+        
+        if raw is None:
+            return None
+        return json.loads(raw) if isinstance(raw, str) else raw
+
+    def messages_from_observed_rows(self, observed_rows):
+        """Parse queued row HTML locally; only truncated rows touch the live page"""
+        if not observed_rows:
+            return []
+        snapshot = PageSourceDriver.from_html(''.join(row.get('html') or '' for row in observed_rows))
+        message_elements = snapshot.find_elements(By.CSS_SELECTOR, '#main [role="row"]')
+        return self.extract_messages_from_elements(message_elements, days_back=None, skip_processed=True)
+
+    def run_periodic_check(self, check_interval=30, use_observer=True, observer_wait=2.0):
         """
         Run periodic checks for new messages
         
         Args:
-            check_interval: Seconds between checks (default 30)
+            check_interval: Seconds between full checks when the observer is unavailable (default 30)
+            use_observer: Detect new rows with an in-page MutationObserver instead of polling
+            observer_wait: Seconds each observer long-poll waits for new rows
         """
         print(f"🔄 Starting periodic message checking (every {check_interval}s)")
         
-        # Initial full scan - use 7 days back to catch any missed messages
-        print("🚀 Performing initial message scan (fetching last 7 days to catch missed messages)...")
-        messages = self.get_current_messages(scroll_to_load_more=True, days_back=7)
-        if messages:
-            self.send_to_django(messages)
-            self.last_message_count = len(messages)
+        # Initial full scan - use 7 days back to catch any missed messages,
+        # or resume from the outbox and only go back to its newest message
+        initial_days_back = 7
+        if self.outbox is not None:
+            self.processed_index.mark_many(self.outbox.fingerprints().items())
+            self.start_outbox_sender()
+            print(f"📮 [OUTBOX] {self.outbox.counts()} messages in outbox")
+            resume_days_back = self.outbox_resume_days_back()
+            if resume_days_back is not None:
+                initial_days_back = resume_days_back
+        
+        print(f"🚀 Performing initial message scan (fetching last {initial_days_back} days to catch missed messages)...")
+        messages = self.get_current_messages(scroll_to_load_more=True, days_back=initial_days_back,
+                                             stop_at_delivered=True)
+        # Only the gap since the last run goes to Django
+        self.deliver(self.skip_delivered(messages))
+        
+        observer_active = use_observer and self.install_message_observer()
         
         # Periodic checks for new messages
         while self.is_running:
             try:
+                if observer_active:
+                    observed_rows = self.drain_observed_rows(wait_seconds=observer_wait)
+                    if observed_rows is None:
+                        print("⚠️ [OBSERVER] Observer lost - reinstalling")
+                        observer_active = self.install_message_observer()
+                        if not observer_active:
+                            print(f"🔁 [OBSERVER] Falling back to polling every {check_interval}s")
+                            continue
+                        # Catch up on anything inserted while the observer was gone
+                        new_messages = self.get_new_messages()
+                    else:
+                        new_messages = self.messages_from_observed_rows(observed_rows)
+                        if observed_rows:
+                            print(f"📬 [OBSERVER] {len(observed_rows)} new rows, {len(new_messages)} messages")
+                    
+                    self.deliver(new_messages)
+                    continue
+                
                 time.sleep(check_interval)
                 
                 print(f"🔍 Checking for new messages...")
                 
-                # Get current messages without scrolling (just check what's visible)
-                current_messages = self.get_current_messages(scroll_to_load_more=False)
+                # Only rows we haven't processed yet (by data-id + fingerprint)
+                new_messages = self.get_new_messages()
                 
-                # Simple check: if message count increased, send new batch
-                if len(current_messages) > self.last_message_count:
-                    new_message_count = len(current_messages) - self.last_message_count
-                    print(f"📬 Found {new_message_count} new messages")
-                    
-                    # Send only the new messages (last N messages)
-                    new_messages = current_messages[-new_message_count:]
-                    if self.send_to_django(new_messages):
-                        self.last_message_count = len(current_messages)
+                if new_messages:
+                    print(f"📬 Found {len(new_messages)} new messages")
+                    self.deliver(new_messages)
                 else:
                     print("📭 No new messages found")
+                
+                # Try to switch back to the observer after a polling round
+                if use_observer:
+                    observer_active = self.install_message_observer()
                     
             except Exception as e:
                 print(f"⚠️ Error during periodic check: {e}")
@@ -867,7 +1341,16 @@ class SimplifiedWhatsAppCrawler:
     def stop(self):
         """Stop the crawler"""
         self.is_running = False
-        if self.driver:
+        if getattr(self, 'outbox_sender', None):
+            self.outbox_sender.stop()
+            self.outbox_sender.join(timeout=5)
+            self.outbox_sender = None
+        if getattr(self, 'uploader', None):
+            self.uploader.close()
+        if getattr(self, 'outbox', None):
+            self.outbox.close()
+            self.outbox = None
+        if getattr(self, 'driver', None):
             try:
                 self.driver.quit()
                 print("🛑 WebDriver stopped")
@@ -0,0 +1,30 @@
+from pathlib import Path
+from app.core.bulk_reparse import bulk_reparse, load_day_file, shard_by_demarcation
+from app.core.message_parser import MessageParser
+
+FIXTURES = sorted(str(p) for p in Path(__file__).resolve().parent.glob('*_messages.json'))
+
+
+def test_shards_start_at_each_demarcation():
+    messages = [
+        {'id': 'a', 'content': '2x lettuce'},
+        {'id': 'b', 'content': 'Good morning. Tuesday orders starts here'},
+        {'id': 'c', 'content': 'Venue'},
+        {'id': 'd', 'content': 'THURSDAY ORDERS'},
+    ]
+    assert [[m['id'] for m in shard] for shard in shard_by_demarcation(messages)] == [['a'], ['b', 'c'], ['d']]
+
+
+def test_process_pool_matches_serial_parse_in_input_order():
+    serial = bulk_reparse(FIXTURES, workers=1)
+    pooled = bulk_reparse(FIXTURES, workers=2)
+
+    assert [s['source'] for s in pooled['shards']] == [s['source'] for s in serial['shards']]
+    assert [s['orders'] for s in pooled['shards']] == [s['orders'] for s in serial['shards']]
+    assert pooled['stats']['messages'] == serial['stats']['messages'] == 170
+    assert pooled['stats']['workers'] == 2
+
+    # Each fixture is one order day: a shard parses exactly like the whole file
+    parser = MessageParser()
+    first = serial['shards'][0]
+    assert first['orders'] == parser.parse_messages_to_orders(load_day_file(first['source']))
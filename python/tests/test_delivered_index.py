@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+from app.core.delivered_index import DeliveredMessageIndex, DIGEST_SIZE
+from app.core.dom_scripts import ROW_WINDOW_SCRIPT
+from app.simplified_whatsapp_crawler import SimplifiedWhatsAppCrawler
+
+
+def test_index_persists_compact_digests(tmp_path):
+    path = tmp_path / 'delivered.idx'
+    index = DeliveredMessageIndex(str(path))
+    assert index.add_many(['a', 'b', 'a', None]) == 2
+    assert path.stat().st_size == 2 * DIGEST_SIZE
+
+    # A torn write at the end is ignored on reload
+    with open(path, 'ab') as f:
+        f.write(b'\x01\x02')
+    reloaded = DeliveredMessageIndex(str(path))
+    assert 'a' in reloaded and 'b' in reloaded and 'c' not in reloaded
+    assert reloaded.contiguous_run(['a', 'b']) and not reloaded.contiguous_run(['a', 'c'])
+    assert not reloaded.contiguous_run([])
+
+    # ...and cut off the file, so later appends stay aligned
+    assert path.stat().st_size == 2 * DIGEST_SIZE
+    reloaded.add_many(['c'])
+    again = DeliveredMessageIndex(str(path))
+    assert 'c' in again and 'a' in again and len(again) == 3
+
+
+def test_startup_scan_stops_at_delivered_run_and_sends_only_the_gap(tmp_path):
+    index_path = str(tmp_path / 'delivered.idx')
+    DeliveredMessageIndex(index_path).add_many(['old_1', 'old_2'])
+
+    class Container:
+        def send_keys(self, *keys):
+            pass
+
+    class ChatDriver:
+        def __init__(self):
+            self.scrolls = 0
+
+        def find_element(self, by, selector):
+            return Container()
+
+        def execute_script(self, script, *args):
+            if script is ROW_WINDOW_SCRIPT:
+                return json.dumps({'count': 3, 'first_id': 'old_1', 'oldest_ids': ['old_1', 'old_2'],
+                                   'pre_plain_texts': []})
+            if script.startswith('arguments[0].scrollTop'):
+                self.scrolls += 1
+                return None
+            now = datetime.now()
+            pre = f"[{now.strftime('%H:%M')}, {now.strftime('%d/%m/%Y')}] Karl: "
+            return json.dumps([
+                {'index': i, 'id': row_id, 'pre_plain_texts': [pre], 'time_texts': [], 'text': row_id,
+                 'truncated': False, 'fingerprint_text': row_id, 'html': '<div/>'}
+                for i, row_id in enumerate(['old_1', 'old_2', 'new_1'])
+            ])
+
+    crawler = SimplifiedWhatsAppCrawler(delivered_index_path=index_path)
+    crawler.driver = ChatDriver()
+    messages = crawler.get_current_messages(scroll_to_load_more=True, days_back=None, stop_at_delivered=True)
+
+    assert crawler.driver.scrolls == 0
+    assert [m['id'] for m in crawler.skip_delivered(messages)] == ['new_1']
+    assert 'old_1' in crawler.processed_index
+    crawler.driver = None
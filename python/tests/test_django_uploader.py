@@ -0,0 +1,100 @@
+import gzip
+import json
+import requests
+from app.core.django_uploader import DjangoUploader
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self._body = body or {}
+        self.text = json.dumps(self._body)
+
+    def json(self):
+        return self._body
+
+
+class FakeSession:
+    """Answers each POST from a script of statuses / exceptions"""
+    def __init__(self, script):
+        self.script = list(script)
+        self.requests = []
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        body = gzip.decompress(data) if headers.get('Content-Encoding') == 'gzip' else data
+        self.requests.append({'ids': [m['id'] for m in json.loads(body)['messages']], 'headers': headers})
+        outcome = self.script.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome, {'processed_count': len(self.requests[-1]['ids'])})
+
+    def close(self):
+        pass
+
+
+def _messages(n):
+    return [{'id': f'id_{i}', 'html': '<div/>' * 50} for i in range(n)]
+
+
+def test_chunks_are_gzipped_and_acknowledged_individually():
+    uploader = DjangoUploader('http://django', chunk_size=2, backoff=0, compress=True)
+    uploader.session = FakeSession([200, 503, 503, 503, 503, 200])
+
+    result = uploader.upload(_messages(5))
+
+    assert [r['ids'] for r in uploader.session.requests][:2] == [['id_0', 'id_1'], ['id_2', 'id_3']]
+    assert uploader.session.requests[0]['headers']['Content-Encoding'] == 'gzip'
+    assert result['delivered_ids'] == ['id_0', 'id_1', 'id_4']
+    assert result['failed_ids'] == ['id_2', 'id_3']
+    assert result['chunks'] == 3 and result['failed_chunks'] == 1
+    assert result['processed_count'] == 3
+
+
+def test_timeouts_are_retried_but_client_errors_are_not():
+    uploader = DjangoUploader('http://django', chunk_size=10, backoff=0)
+    uploader.session = FakeSession([requests.Timeout('slow link'), 200])
+    assert uploader.upload(_messages(3))['failed_ids'] == []
+
+    uploader.session = FakeSession([400])
+    assert uploader.upload(_messages(1))['failed_ids'] == ['id_0']
+    assert len(uploader.session.requests) == 1
+
+
+def test_rejected_chunk_is_split_so_only_the_bad_message_fails():
+    class RejectingSession(FakeSession):
+        def post(self, url, data=None, headers=None, timeout=None):
+            ids = [m['id'] for m in json.loads(data)['messages']]
+            self.requests.append({'ids': ids, 'headers': headers})
+            return FakeResponse(400 if 'id_5' in ids else 200, {'processed_count': len(ids)})
+
+    uploader = DjangoUploader('http://django', chunk_size=8, backoff=0)
+    uploader.session = RejectingSession([])
+    result = uploader.upload(_messages(8))
+
+    assert result['failed_ids'] == ['id_5'] and result['failed_chunks'] == 1
+    assert result['delivered_ids'] == ['id_0', 'id_1', 'id_2', 'id_3', 'id_4', 'id_6', 'id_7']
+    assert result['processed_count'] == 7 and result['chunks'] == 1 and result['split_chunks'] == 3
+    assert len(uploader.session.requests) == 7
+
+
+def test_falls_back_to_plain_json_when_gzip_is_rejected():
+    uploader = DjangoUploader('http://django', chunk_size=10, backoff=0, compress=True)
+    uploader.session = FakeSession([415, 200])
+    assert uploader.upload(_messages(1))['delivered_ids'] == ['id_0']
+    assert 'Content-Encoding' not in uploader.session.requests[1]['headers']
+
+
+def test_stock_django_error_on_first_gzip_body_resends_plain_json():
+    assert 'Content-Encoding' not in DjangoUploader('http://django')._encode({})[1]
+
+    # json.loads(request.body) on gzip bytes -> 400; the chunk goes again uncompressed
+    uploader = DjangoUploader('http://django', chunk_size=1, backoff=0, compress=True)
+    uploader.session = FakeSession([400, 200, 200])
+    assert uploader.upload(_messages(2))['delivered_ids'] == ['id_0', 'id_1']
+    assert [r['headers'].get('Content-Encoding') for r in uploader.session.requests] == ['gzip', None, None]
+
+    # Once gzip has been accepted, a 400 is the data being rejected
+    uploader = DjangoUploader('http://django', chunk_size=1, backoff=0, compress=True)
+    uploader.session = FakeSession([200, 400])
+    assert uploader.upload(_messages(2))['failed_ids'] == ['id_1']
+    assert uploader.compress and len(uploader.session.requests) == 2
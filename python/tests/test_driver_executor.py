@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+from selenium.webdriver.remote.webelement import WebElement
+
+from app.core.driver_executor import (
+    BACKGROUND, INTERACTIVE, SCAN, DriverExecutor, SerializedDriver, driver_priority, driver_stats,
+)
+
+
+def test_interactive_commands_run_before_queued_background_ones():
+    executor = DriverExecutor('test')
+    busy = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def block():
+        busy.set()
+        release.wait(5)
+
+    executor.submit(block, priority=BACKGROUND)
+    assert busy.wait(5)
+    with driver_priority(BACKGROUND):
+        background = [executor.submit(order.append, (f'poll_{i}',)) for i in range(3)]
+    scan = executor.submit(order.append, ('scan',), priority=SCAN)
+    interactive = executor.submit(order.append, ('request',))  # Threads default to interactive
+
+    release.set()
+    for future in background + [scan, interactive]:
+        future.result(5)
+    assert order == ['request', 'scan', 'poll_0', 'poll_1', 'poll_2']
+
+    stats = executor.stats()
+    assert stats['priorities']['interactive']['count'] == 1 and stats['priorities']['background']['count'] == 4
+    assert stats['commands']['append']['max_wait_ms'] > 0
+    executor.shutdown()
+    with pytest.raises(RuntimeError):
+        executor.submit(order.append, ('late',), priority=INTERACTIVE)
+
+
+class FakeDriver:
+    def __init__(self):
+        self.active = 0
+        self.overlaps = 0
+        self.commands = []
+        self.quit_called = False
+
+    def _enter(self, command):
+        self.active += 1
+        self.overlaps += self.active > 1
+        threading.Event().wait(0.001)
+        self.commands.append(command)
+        self.active -= 1
+
+    @property
+    def title(self):
+        self._enter('title')
+        return 'WhatsApp'
+
+    def find_elements(self, by, value):
+        self._enter('find_elements')
+        return [WebElement(self, 'row_1')]
+
+    def execute(self, command, params=None):
+        self._enter(command)
+        if command == 'fail':
+            raise ValueError('stale element')
+        return {'value': None}
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_serialized_driver_never_overlaps_commands():
+    fake = FakeDriver()
+    driver = SerializedDriver(fake)
+
+    def worker():
+        for _ in range(20):
+            driver.find_elements('css selector', '#main [role="row"]')
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert fake.overlaps == 0 and len(fake.commands) == 80
+
+    # Properties are commands too; elements are re-parented so their commands are queued
+    assert driver.title == 'WhatsApp'
+    row = driver.find_elements('css selector', '#main [role="row"]')[0]
+    assert isinstance(row, WebElement) and row.parent is driver and row.id == 'row_1'
+    row.click()
+    assert fake.commands[-1] == 'clickElement'
+
+    with pytest.raises(ValueError):
+        driver.execute('fail')
+
+    stats = driver_stats(driver)
+    assert stats['commands']['find_elements']['count'] == 81
+    assert stats['commands']['title']['count'] == 1 and stats['commands']['clickElement']['count'] == 1
+    assert stats['commands']['fail']['errors'] == 1
+    assert driver_stats(fake) is None
+
+    driver.quit()
+    assert fake.quit_called
@@ -0,0 +1,40 @@
+import json
+import pickle
+from pathlib import Path
+
+from app.core.html_store import CompressedHtml, html_json_default, minify_html, store_html
+
+FIXTURES = Path(__file__).resolve().parent
+
+
+def test_compressed_html_decodes_on_demand_and_serializes_as_text():
+    row_html = json.loads((FIXTURES / 'Tuesday_01_09_2025_messages.json').read_text(encoding='utf-8'))[1]['html']
+    stored = store_html(row_html, 'compressed')
+    assert isinstance(stored, CompressedHtml)
+    assert stored == row_html and str(stored) == row_html and len(stored) == len(row_html)
+    assert stored.compressed_size * 2 < len(row_html.encode('utf-8'))
+    assert pickle.loads(pickle.dumps(stored)) == row_html
+    assert json.loads(json.dumps({'html': stored}, default=html_json_default)) == {'html': row_html}
+    assert store_html(row_html, 'raw') is row_html and store_html('', 'compressed') == ''
+
+
+def test_minified_html_keeps_what_the_parsers_read():
+    row = ('<div tabindex="-1" class="x78zum5 message-in _amjv" role="row" style="x">'
+           '<span class="copyable-text" data-pre-plain-text="[08:52, 01/09/2025] Karl: ">2 &amp; 3 &lt;kg&gt;</span>'
+           '<img src="blob:x" alt="pic"><svg><path d="M0 0h24"></path></svg><!-- note --></div>')
+    assert minify_html(row) == (
+        '<div class="message-in" role="row">'
+        '<span class="copyable-text" data-pre-plain-text="[08:52, 01/09/2025] Karl: ">2 &amp; 3 &lt;kg&gt;</span>'
+        '<img src="blob:x" alt="pic"><svg><path></path></svg></div>')
+
+
+def test_minified_page_parses_to_the_same_messages():
+    from app.core.whatsapp_crawler import WhatsAppCrawler
+
+    page = (FIXTURES / 'Tuesday_15_09_2025_messages.html').read_text(encoding='utf-8')
+    minified = minify_html(page)
+    assert len(minified) * 2 < len(page)
+
+    key = lambda m: (m['id'], m['content'], m['timestamp'], m['message_type'], m['media_type'])
+    crawler = WhatsAppCrawler()
+    assert [key(m) for m in crawler.parse_html(minified)] == [key(m) for m in crawler.parse_html(page)]
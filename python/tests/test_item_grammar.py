@@ -0,0 +1,29 @@
+from app.core.item_grammar import ParsedItem, parse_item, parse_items, product_of, quantity_of
+
+
+def test_quantity_and_product_match_the_old_route_helpers():
+    cases = {
+        '2 x 10kg tomatoes': ('2', '10kg tomatoes'),
+        '3 bags potatoes': ('3', 'potatoes'),
+        '3 bags 5kg potatoes': ('3', '5kg potatoes'),
+        '10kg bags red onions': ('1', '10kg red onions'),
+        'Lettuce x12': ('12', 'Lettuce x12'),
+        '5 tomatoes': ('5', 'tomatoes'),
+        '5 kg tomatoes': ('1', '5 kg tomatoes'),
+        'Spinach': ('1', 'Spinach'),
+    }
+    for text, (quantity, product) in cases.items():
+        assert quantity_of(text) == quantity, text
+        assert product_of(text) == product, text
+
+
+def test_parse_item_fields():
+    assert parse_item('2 x 10kg tomatoes') == ParsedItem(
+        raw_text='2 x 10kg tomatoes', product='10kg tomatoes', quantity='2',
+        multiplier='2', package_size='10kg', unit='kg')
+    assert parse_item('3 boxes lemons').unit == 'box'
+    assert parse_item('Lettuce x3').multiplier == '3'
+
+    items = parse_items(['5 heads broccoli', 'Garlic'])
+    assert [item.to_dict()['quantity'] for item in items] == ['5', '1']
+    assert items[0].unit == 'head' and items[1].package_size is None
@@ -0,0 +1,35 @@
+from app.core.message_enrichment import MessageEnrichmentCache
+from app.core.message_parser import MessageParser
+
+
+def order_message(content, message_id='m1', verification_hash='h1'):
+    return {'id': message_id, 'content': content, 'message_type': 'order', 'company_name': '',
+            'parsed_items': [], 'instructions': '', 'verification_hash': verification_hash}
+
+
+def test_enrichment_is_computed_once_and_not_written_back():
+    cache = MessageEnrichmentCache(MessageParser())
+    message = order_message('Venue\n2x lettuce\nThanks')
+
+    first = cache.enriched(message)
+    assert first['company_name'] == 'Venue'
+    assert first['parsed_items'] == ['2x lettuce'] and first['instructions'] == 'Thanks'
+    assert message['company_name'] == '' and message['parsed_items'] == []
+
+    assert cache.enriched(message) == first
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_edited_content_is_re_enriched():
+    cache = MessageEnrichmentCache(MessageParser())
+    message = order_message('Venue\n2x lettuce')
+    cache.enriched(message)
+
+    # Same verification_hash, new content: never served stale
+    message['content'] = 'Wimpy\n3kg onions'
+    assert cache.enriched(message)['company_name'] == 'Wimpy'
+
+    assert cache.invalidate(message)
+    assert not cache.invalidate(message)
+    message['message_type'] = 'other'
+    assert 'parsed_items' not in cache.enrichment(message)
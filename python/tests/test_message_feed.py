@@ -0,0 +1,91 @@
+from app.core.message_feed import message_set_version, page_after, page_etag, parse_limit
+
+
+def messages(n):
+    return [{'id': f'id_{i}', 'verification_hash': f'h{i}'} for i in range(n)]
+
+
+def test_since_id_and_limit_page_in_chat_order():
+    rows = messages(5)
+    first = page_after(rows, limit=2)
+    assert [m['id'] for m in first['messages']] == ['id_0', 'id_1']
+    assert first['next_cursor'] == 'id_1' and first['has_more']
+
+    rest = page_after(rows, since_id=first['next_cursor'])
+    assert [m['id'] for m in rest['messages']] == ['id_2', 'id_3', 'id_4'] and not rest['has_more']
+
+    idle = page_after(rows, since_id='id_4')
+    assert idle['messages'] == [] and idle['next_cursor'] == 'id_4'
+
+    gone = page_after(rows, since_id='rescraped_away', limit=1)
+    assert gone['reset'] and gone['messages'][0]['id'] == 'id_0'
+
+    assert parse_limit('0') is None and parse_limit('abc') is None and parse_limit('5000') == 1000
+
+
+def test_version_changes_with_the_message_set():
+    rows = messages(3)
+    version = message_set_version(rows, 1)
+    assert version == message_set_version(messages(3), 1)
+    assert version != message_set_version(rows, 2)
+    rows[1]['edited_at'] = '2025-09-01T10:00:00'
+    assert version != message_set_version(rows, 1)
+    assert page_etag(version) == version != page_etag(version, 'id_1', 10)
+
+
+def test_version_changes_when_text_past_the_hashed_prefix_changes():
+    truncated = {'id': 'id_0', 'verification_hash': 'h0', 'message_type': 'order',
+                 'content': 'Venue\n' + 'x' * 100 + ' 2kg tomato'}
+    expanded = dict(truncated, content=truncated['content'] + '\n5 boxes lettuce')
+    version = message_set_version([truncated], 1)
+    assert version != message_set_version([expanded], 1)
+    assert version != message_set_version([dict(truncated, message_type='other')], 1)
+
+
+def test_messages_endpoint_returns_304_for_an_unchanged_poll():
+    from flask import Flask
+    from app import routes
+
+    app = Flask(__name__)
+    app.register_blueprint(routes.whatsapp_bp)
+    routes.crawler.driver, routes.crawler.is_running = object(), True
+    routes.crawler.messages = [dict(m, content='Venue', message_type='other') for m in messages(3)]
+    try:
+        client = app.test_client()
+        first = client.get('/api/messages?limit=2')
+        assert [m['id'] for m in first.get_json()] == ['id_0', 'id_1']
+        assert first.headers['X-Next-Cursor'] == 'id_1' and first.headers['X-Has-More'] == 'true'
+
+        again = client.get('/api/messages?limit=2', headers={'If-None-Match': first.headers['ETag']})
+        assert again.status_code == 304 and again.data == b''
+
+        routes.crawler.messages.append({'id': 'id_3', 'verification_hash': 'h3', 'content': 'x', 'message_type': 'other'})
+        changed = client.get('/api/messages?limit=2', headers={'If-None-Match': first.headers['ETag']})
+        assert changed.status_code == 200
+
+        summary = client.get('/api/messages?fields=summary').get_json()
+        assert summary[0] == {'id': 'id_0', 'content': 'Venue', 'message_type': 'other', 'company_name': 'Venue'}
+
+        # "Read more" expanded on a re-scrape: same id and verification_hash, longer content
+        routes.crawler.messages[0]['content'] = 'Venue' + ' ' * 100 + '3kg onions'
+        etag = changed.headers['ETag']
+        expanded = client.get('/api/messages?limit=2', headers={'If-None-Match': etag})
+        assert expanded.status_code == 200 and expanded.headers['ETag'] != etag
+    finally:
+        routes.crawler.driver, routes.crawler.is_running, routes.crawler.messages = None, False, []
+
+
+def test_fields_select_named_projections_and_single_fields():
+    from app.core.message_feed import ORDER_PROJECTIONS, parse_fields, project
+    from app.core.scraped_message import ScrapedMessage
+
+    assert parse_fields(None) is None and parse_fields('full') is None
+    assert parse_fields('summary') == ('id', 'timestamp', 'content', 'message_type', 'company_name')
+    assert parse_fields('content,media_url,content') == ('id', 'content', 'media_url')
+    assert parse_fields(['summary'], ORDER_PROJECTIONS, required=())[0] == 'company_name'
+
+    message = ScrapedMessage(id='m1', content='Venue', timestamp='t', message_type='other', company_name='',
+                             verification_hash='h', media_info='', scraped_at='s')
+    assert project(message, parse_fields('summary,nope')) == {
+        'id': 'm1', 'timestamp': 't', 'content': 'Venue', 'message_type': 'other', 'company_name': ''}
+    assert 'verification_hash' not in project(message, parse_fields('compact'))
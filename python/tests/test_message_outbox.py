@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta, timezone
+from app.core.message_outbox import FAILED, MessageOutbox, OutboxSender
+from app.simplified_whatsapp_crawler import SimplifiedWhatsAppCrawler
+
+
+def _message(message_id, days_ago=0):
+    ts = (datetime.now(timezone.utc) - timedelta(days=days_ago)).isoformat()
+    return {'id': message_id, 'timestamp': ts, 'html': '<div/>', 'message_data': {'content': message_id}}
+
+
+class FakeUploader:
+    def __init__(self, fail_ids=()):
+        self.fail_ids = set(fail_ids)
+        self.sent = []
+
+    def upload(self, messages):
+        ids = [m['id'] for m in messages]
+        self.sent.append(ids)
+        failed = [i for i in ids if i in self.fail_ids]
+        return {'delivered_ids': [i for i in ids if i not in self.fail_ids], 'failed_ids': failed,
+                'failed_chunks': 1 if failed else 0}
+
+
+def test_enqueue_is_idempotent_until_message_changes(tmp_path):
+    outbox = MessageOutbox(str(tmp_path / 'outbox.db'))
+    assert outbox.enqueue([_message('a'), _message('b')], {'a': 'fp1', 'b': 'fp1'}) == ['a', 'b']
+    assert outbox.enqueue([_message('a')], {'a': 'fp1'}) == []
+    assert outbox.enqueue([_message('a')], {'a': 'fp2'}) == ['a']
+    assert outbox.counts() == {'pending': 2, 'delivered': 0, 'failed': 0}
+
+
+def test_sender_tracks_delivery_per_message_and_survives_restart(tmp_path):
+    path = str(tmp_path / 'outbox.db')
+    outbox = MessageOutbox(path)
+    outbox.enqueue([_message('a'), _message('b')])
+
+    delivered = []
+    sender = OutboxSender(outbox, FakeUploader(fail_ids={'b'}), on_delivered=delivered.extend)
+    assert sender.drain_once() == {'delivered': 1, 'failed': 1}
+    assert delivered == ['a']
+    outbox.close()
+
+    reopened = MessageOutbox(path)
+    assert [m['id'] for m in reopened.pending()] == ['b']
+    uploader = FakeUploader()
+    OutboxSender(reopened, uploader).drain_once()
+    assert uploader.sent == [['b']]
+    assert reopened.counts() == {'pending': 0, 'delivered': 2, 'failed': 0}
+
+
+def test_rejected_messages_dead_letter_instead_of_blocking_new_ones(tmp_path):
+    outbox = MessageOutbox(str(tmp_path / 'outbox.db'), max_attempts=3)
+    outbox.enqueue([_message(f'bad_{i}') for i in range(3)])
+    uploader = FakeUploader(fail_ids={'bad_0', 'bad_1', 'bad_2'})
+    sender = OutboxSender(outbox, uploader, batch_size=3)
+
+    sender.drain_once()
+    outbox.enqueue([_message('fresh')])
+    # Rows that already failed go behind the new one
+    assert sender.drain_once() == {'delivered': 1, 'failed': 2}
+    assert uploader.sent[1] == ['fresh', 'bad_0', 'bad_1']
+
+    sender.drain_once()
+    sender.drain_once()
+    assert outbox.counts() == {'pending': 0, 'delivered': 1, 'failed': 3}
+    assert outbox.pending() == [] and sender.drain_once() == {'delivered': 0, 'failed': 0}
+
+    assert outbox.retry_failed() == 3
+    assert [m['id'] for m in outbox.pending()] == ['bad_0', 'bad_1', 'bad_2']
+    assert outbox.counts()[FAILED] == 0
+
+
+def test_restart_scans_back_only_to_newest_outbox_message(tmp_path):
+    crawler = SimplifiedWhatsAppCrawler(outbox_path=str(tmp_path / 'outbox.db'))
+    assert crawler.outbox_resume_days_back() is None
+
+    crawler.row_fingerprints = {'old': 'fp_old', 'new': 'fp_new'}
+    crawler.deliver([_message('old', days_ago=5), _message('new', days_ago=2)])
+    assert crawler.outbox_resume_days_back() == 2
+    assert crawler.processed_index.is_unchanged('new', 'fp_new')
+    assert crawler.outbox.fingerprints() == {'old': 'fp_old', 'new': 'fp_new'}
+
+
+def test_bad_crawler_arguments_open_nothing_and_stop_closes_the_outbox(tmp_path):
+    import pytest
+
+    path = tmp_path / 'outbox.db'
+    with pytest.raises(ValueError):
+        SimplifiedWhatsAppCrawler(outbox_path=str(path), html_mode='nope')
+    assert not path.exists()
+
+    crawler = SimplifiedWhatsAppCrawler(outbox_path=str(path))
+    outbox = crawler.outbox
+    crawler.stop()
+    assert crawler.outbox is None
+    with pytest.raises(Exception):
+        outbox.counts()
+
+
+def test_delivered_rows_drop_their_payload_and_are_purged(tmp_path):
+    import time
+
+    outbox = MessageOutbox(str(tmp_path / 'outbox.db'))
+    outbox.enqueue([_message('a'), _message('b')], {'a': 'fp1', 'b': 'fp1'})
+    sender = OutboxSender(outbox, FakeUploader(fail_ids={'b'}))
+    sender.drain_once()
+    payloads = dict(outbox._conn.execute('SELECT id, payload FROM outbox').fetchall())
+    assert payloads['a'] == '' and 'html' in payloads['b']
+    assert outbox.enqueue([_message('a')], {'a': 'fp1'}) == []  # Still deduped
+
+    outbox._conn.execute('UPDATE outbox SET delivered_at = ?', (time.time() - 15 * 24 * 3600,))
+    assert sender.purge_if_due() == 1
+    assert sender.purge_if_due() == 0  # Not due again for an hour
+    assert outbox.counts() == {'pending': 1, 'delivered': 0, 'failed': 0}
+
+
+def test_manual_scan_commits_to_the_outbox(tmp_path):
+    from app.simplified_routes import run_manual_scan
+
+    crawler = SimplifiedWhatsAppCrawler(outbox_path=str(tmp_path / 'outbox.db'))
+    crawler.get_current_messages = lambda **kwargs: [_message('a'), _message('b')]
+    crawler.send_to_django = lambda messages: (_ for _ in ()).throw(AssertionError('bypassed the outbox'))
+
+    result = run_manual_scan(crawler, False, 1)
+    assert result['queued_count'] == 2 and result['message_count'] == 2 and not result['sent_to_django']
+    assert [m['id'] for m in crawler.outbox.pending()] == ['a', 'b']
+    assert run_manual_scan(crawler, False, 1)['already_queued_count'] == 2
+    crawler.stop()
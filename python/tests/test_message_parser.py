@@ -0,0 +1,176 @@
+import re
+from app.core.alias_matcher import CompanyAliasMatcher, trie_pattern
+from app.core.message_parser import MessageParser
+
+
+def test_trie_pattern_prefers_longest_word_at_a_position():
+    pattern = re.compile(trie_pattern(['mugg', 'mugg bean', 'mugg and bean', 'm.x']))
+    assert pattern.match('mugg and bean please').group(0) == 'mugg and bean'
+    assert pattern.match('mugg beans').group(0) == 'mugg bean'
+    assert pattern.match('mugg an').group(0) == 'mugg'
+    assert pattern.match('m.x').group(0) == 'm.x'
+    assert pattern.match('max') is None
+
+
+def test_alias_matcher_longest_match_policy():
+    matcher = CompanyAliasMatcher({'ab': 'Short', 'bcd': 'Long', 'venue': 'Venue', 'casa bella': 'Casa Bella'})
+    # Overlapping aliases: the longer one wins even though it starts later
+    assert matcher.match('abcd') == 'Long'
+    assert matcher.match('Casa Bella and Venue') == 'Casa Bella'
+    # Text inside an alias still resolves, in config order
+    assert matcher.match('  casa ') == 'Casa Bella'
+    assert matcher.match('xyz') is None
+    assert matcher.match('') is None
+
+
+def test_parser_company_lookup_matches_config_aliases():
+    parser = MessageParser()
+    assert parser.to_canonical_company('Mugg and Bean') == 'Mugg and Bean'
+    assert parser.to_canonical_company('WIMPY MOOINOOI') == 'Wimpy'
+    assert parser.to_canonical_company('T junction order') == 'T-junction'
+    assert parser.to_canonical_company('mug') == 'Mugg and Bean'
+    assert parser.to_canonical_company('2x Lettuce') is None
+
+
+def test_quantity_detector_reports_pattern_family():
+    from app.core.alias_matcher import QuantityDetector
+
+    detector = QuantityDetector([r'\d+\s*kg', r'\d+x', r'(unclosed'])
+    assert detector.patterns == [r'\d+\s*kg', r'\d+x']
+    assert detector.family('Tomatoes 5 KG') == r'\d+\s*kg'
+    assert detector.family('3X lettuce') == r'\d+x'
+    assert not detector('Good morning')
+
+    parser = MessageParser()
+    assert parser.has_quantity_indicators('2x5kg potatoes')
+    assert parser.quantity_pattern_for('10 bunches parsley') == r'\d+\s*bunches'
+    assert parser.quantity_pattern_for('Thanks') is None
+
+
+def test_lines_are_classified_once_and_cached():
+    parser = MessageParser()
+    messages = [
+        {'id': '1', 'content': 'Good morning\n2x lettuce\n3kg tomato', 'timestamp': 't1'},
+        {'id': '2', 'content': 'Venue', 'timestamp': 't2'},
+    ]
+    orders = parser.parse_messages_to_orders(messages)
+    assert orders == [{'company_name': 'Venue', 'items_text': ['2x lettuce', '3kg tomato'],
+                       'instructions': ['Good morning'], 'timestamp': 't1', 'message_ids': ['1', '2']}]
+    assert parser.line_cache_info().misses == 4
+
+    parser.parse_messages_to_orders(messages)
+    assert parser.line_cache_info().misses == 4
+
+    info = parser.classify_line('  Good morning  ')
+    assert info.is_greeting and info.is_instruction and not info.is_company
+
+
+def test_order_assembler_matches_batch_parse_after_every_message():
+    import json
+    from pathlib import Path
+    from app.core.order_assembler import OrderAssembler
+
+    parser = MessageParser()
+    fixture = Path(__file__).resolve().parent / 'Thursday_03_09_2025_messages.json'
+    messages = [{'id': m['id'], 'content': m['text'], 'timestamp': m['timestamp']}
+                for m in json.loads(fixture.read_text(encoding='utf-8'))]
+    messages.insert(3, {'id': 'empty', 'content': '', 'timestamp': ''})
+
+    assembler = OrderAssembler(parser)
+    for n, message in enumerate(messages, start=1):
+        assembler.feed(message)
+        assert assembler.orders() == parser.parse_messages_to_orders(messages[:n])
+    assert assembler.orders()
+
+
+def test_order_assembler_reports_changed_companies():
+    from app.core.order_assembler import OrderAssembler
+
+    assembler = OrderAssembler(MessageParser())
+    assert assembler.feed({'id': '1', 'content': '2x lettuce', 'timestamp': 't1'}) == []
+    assert assembler.feed({'id': '2', 'content': 'Venue', 'timestamp': 't2'}) == ['Venue']
+    assert assembler.feed({'id': '3', 'content': 'Wimpy\n5kg onions', 'timestamp': 't3'}) == []
+    assert assembler.finish() == ['Wimpy']
+    assert [o['company_name'] for o in assembler.orders()] == ['Venue', 'Wimpy']
+
+
+def test_parsers_share_a_hot_reloaded_config(tmp_path):
+    import json
+    import os
+    from app.core.parser_config import ParserConfigRegistry, get_parser_config
+
+    config_file = tmp_path / 'company_aliases.json'
+    config_file.write_text(json.dumps({'company_aliases': {'venue': 'Venue'}, 'quantity_patterns': [r'\d+x']}))
+
+    first, second = MessageParser(str(config_file)), MessageParser(str(config_file))
+    assert first.config is second.config is get_parser_config(str(config_file))
+    assert first.ruleset is second.ruleset
+    assert first.classify_line('Luma').company is None
+
+    config_file.write_text(json.dumps({'company_aliases': {'venue': 'Venue', 'luma': 'Luma'},
+                                       'quantity_patterns': [r'\d+x', r'\d+\s*kg']}))
+    stat = os.stat(config_file)
+    os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    first.config._next_check = 0  # skip the stat throttle
+
+    assert first.classify_line('Luma').company == 'Luma'
+    assert first.ruleset_version == 2 and second.ruleset_version == 2
+    assert second.has_quantity_indicators('5 kg onions')
+
+    # A broken edit keeps the last good ruleset
+    config_file.write_text('{not json')
+    first.config._next_check = 0
+    assert first.ruleset_version == 2
+
+    missing = ParserConfigRegistry(str(tmp_path / 'missing.json'))
+    assert missing.current().company_aliases['casabella'] == 'Casa Bella'
+
+
+def test_product_lexicon_feeds_item_and_instruction_matching(tmp_path):
+    import json
+    from app.core.alias_matcher import KeywordMatcher
+
+    matcher = KeywordMatcher(['HI', 'THANK YOU'], fold=str.upper)
+    assert matcher('Chillies') and matcher.find('thank you!') == 'THANK YOU'
+    assert not matcher('Lettuce')
+
+    (tmp_path / 'lexicon.json').write_text(json.dumps({
+        'food_keywords': ['tomato'],
+        'instruction_keywords': ['ASAP'],
+        'products': [{'name': 'Baby  Marrow'}, 'Micro herbs', 'ab']
+    }))
+    config_file = tmp_path / 'company_aliases.json'
+    config_file.write_text(json.dumps({'company_aliases': {}, 'quantity_patterns': [],
+                                       'product_lexicon': 'lexicon.json'}))
+
+    parser = MessageParser(str(config_file))
+    assert parser.is_likely_order_item('Tomatoes')
+    assert parser.is_likely_order_item('baby marrow please')
+    assert parser.is_likely_order_item('MICRO HERBS')
+    assert not parser.is_likely_order_item('Lettuce')
+    assert not parser.is_likely_order_item('cab')  # too-short catalogue names are dropped
+    assert parser.classify_line('Deliver asap').is_greeting
+    assert parser.ruleset.describe()['food_keywords'] == 3
+
+
+def test_broken_product_lexicon_keeps_company_aliases(tmp_path):
+    import json
+    from app.core.parser_config import ParserConfigRegistry
+
+    config_file = tmp_path / 'company_aliases.json'
+    config_file.write_text(json.dumps({'company_aliases': {'sunny side': 'Sunny Side'}, 'quantity_patterns': [r'\d+\s*crates'],
+                                       'product_lexicon': 'missing_lexicon.json'}))
+    registry = ParserConfigRegistry(str(config_file), check_interval=0)
+    ruleset = registry.current()
+    assert ruleset.company_aliases == {'sunny side': 'Sunny Side'} and ruleset.quantity_patterns == [r'\d+\s*crates']
+    assert ruleset.food_matcher('Tomatoes')  # Built-in vocabulary
+
+    lexicon_file = tmp_path / 'missing_lexicon.json'
+    lexicon_file.write_text(json.dumps({'food_keywords': ['kale']}))
+    assert registry.reload().food_matcher('Kale') and not registry.current().food_matcher('Tomatoes')
+
+    # Malformed on a reload: aliases come from the new config, keywords stay the last good ones
+    lexicon_file.write_text('{not json')
+    config_file.write_text(json.dumps({'company_aliases': {'luma': 'Luma'}, 'product_lexicon': 'missing_lexicon.json'}))
+    reloaded = registry.reload()
+    assert reloaded.company_aliases == {'luma': 'Luma'} and reloaded.food_matcher('Kale')
@@ -0,0 +1,74 @@
+import json
+from pathlib import Path
+
+from app.core.message_parser import MessageParser
+from app.core.order_day_index import OrderDayIndex, message_date
+
+FIXTURES = Path(__file__).resolve().parent
+
+
+def load_day(name):
+    rows = json.loads((FIXTURES / name).read_text(encoding='utf-8'))
+    return [{'id': row['id'], 'content': row['text'], 'timestamp': row['timestamp']} for row in rows]
+
+
+def test_partitions_follow_demarcations_and_grow_incrementally():
+    parser = MessageParser()
+    messages = load_day('Tuesday_01_09_2025_messages.json') + load_day('Thursday_03_09_2025_messages.json')
+    index = OrderDayIndex(company_of=parser.to_canonical_company)
+
+    index.sync(messages[:10])
+    assert index.sync(messages) == len(messages) - 10
+    assert index.partitions[0].start == 0 and index.partitions[-1].end == len(messages)
+
+    thursday = index.find('thursday')
+    assert thursday.date == '2025-09-03' and thursday is index.find('03/09/2025') is index.find('latest')
+    day_messages = index.messages_in(thursday)
+    assert day_messages[0]['id'] == thursday.demarcation_id == thursday.first_id
+    assert index.partition_of(day_messages[-1]['id']) is thursday
+    assert parser.parse_messages_to_orders(day_messages)
+
+    company = next(iter(thursday.company_offsets))
+    assert all(parser.to_canonical_company(m['content']) == company for m in index.company_messages(thursday, company))
+
+    # A replaced list is re-indexed from scratch
+    assert index.sync(day_messages) == len(day_messages)
+    assert len(index.partitions) == 1
+
+
+def test_editing_a_message_into_a_demarcation_splits_the_day():
+    index = OrderDayIndex()
+    index.extend([
+        {'id': '1', 'content': 'Tuesday orders start here', 'timestamp': '08:00, 01/09/2025'},
+        {'id': '2', 'content': '2x lettuce', 'timestamp': '08:05, 01/09/2025'},
+        {'id': '3', 'content': 'Venue', 'timestamp': '08:06, 01/09/2025'},
+    ])
+    assert len(index.partitions) == 1
+
+    index.messages[2]['content'] = 'Thursday orders start here'
+    assert index.update('3')
+    assert [p.label for p in index.partitions] == ['Tuesday', 'Thursday']
+    assert index.find('thursday').first_id == '3'
+    assert message_date('2025-09-01T08:00:00+00:00') == '2025-09-01' and message_date('') is None
+
+
+def test_rescraped_objects_with_the_same_ids_replace_stale_ones():
+    first = [
+        {'id': '1', 'content': 'Tuesday orders start here', 'timestamp': '08:00, 01/09/2025'},
+        {'id': '2', 'content': 'Venue\n2x lettuce…', 'timestamp': '08:05, 01/09/2025'},
+    ]
+    index = OrderDayIndex()
+    index.sync(first)
+
+    # Same ids, new objects: the second row's "Read more" was expanded on re-scrape
+    rescraped = [dict(first[0]), dict(first[1], content='Venue\n2x lettuce\n3kg tomato')]
+    assert index.sync(rescraped) == 2
+    assert index.messages_in(index.find('latest'))[1]['content'].endswith('3kg tomato')
+
+    # An edit to the live object (as /api/messages/edit does) is what gets re-indexed
+    rescraped[1]['content'] = 'Thursday orders start here'
+    index.sync(rescraped)
+    assert index.update('2') and [p.label for p in index.partitions] == ['Tuesday', 'Thursday']
+
+    # Growing the same objects stays incremental
+    assert index.sync(rescraped + [{'id': '3', 'content': 'Luma', 'timestamp': '09:00, 03/09/2025'}]) == 1
@@ -0,0 +1,47 @@
+import json
+from pathlib import Path
+from selenium.webdriver.common.by import By
+from app.core.page_source import PageSourceDriver, snapshot_driver
+from app.core.whatsapp_crawler import WhatsAppCrawler
+from app.simplified_whatsapp_crawler import SimplifiedWhatsAppCrawler
+
+FIXTURES = Path(__file__).resolve().parent
+
+
+def test_saved_rows_are_wrapped_in_main():
+    driver = PageSourceDriver.from_html('<div role="row"><div data-id="abc"></div></div>')
+    rows = driver.find_elements(By.CSS_SELECTOR, '#main [role="row"]')
+    assert len(rows) == 1
+    assert rows[0].find_elements(By.CSS_SELECTOR, '[data-id]')[0].get_attribute('data-id') == 'abc'
+    assert rows[0].get_attribute('missing') is None
+
+
+def test_contains_text_xpath_is_supported_offline():
+    driver = PageSourceDriver.from_html('<div role="row"><span>0:42</span><span>hello</span></div>')
+    row = driver.find_elements(By.CSS_SELECTOR, '#main [role="row"]')[0]
+    matches = row.find_elements(By.XPATH, ".//*[contains(text(), ':')]")
+    assert [m.text for m in matches] == ['0:42']
+
+
+def test_snapshot_uses_main_outer_html():
+    class LiveDriver:
+        def execute_script(self, script, *args):
+            return '<div id="main"><div role="row">x</div></div>'
+
+    snapshot = snapshot_driver(LiveDriver())
+    assert len(snapshot.find_elements(By.CSS_SELECTOR, '#main [role="row"]')) == 1
+
+
+def test_both_crawlers_reparse_saved_fixture_without_chrome():
+    html = (FIXTURES / 'Tuesday_01_09_2025_messages.html').read_text(encoding='utf-8')
+    expected_ids = [m['id'] for m in json.loads((FIXTURES / 'Tuesday_01_09_2025_messages.json').read_text(encoding='utf-8'))]
+
+    messages = WhatsAppCrawler().parse_html(html)
+    assert [m['id'] for m in messages] == expected_ids
+    assert messages[0]['message_type'] == 'demarcation'
+    assert all(m['timestamp_source'] == 'pre_plain' for m in messages)
+
+    simplified = SimplifiedWhatsAppCrawler()
+    html_messages = simplified.parse_html(html)
+    assert [m['id'] for m in html_messages] == expected_ids
+    assert html_messages[0]['message_data']['content'].startswith('Good morning. Tuesday orders starts here')
@@ -0,0 +1,84 @@
+import threading
+
+from app.core.scan_jobs import FAILED, SUCCEEDED, ScanJobManager, report_progress
+
+
+def test_same_key_jobs_are_coalesced_and_report_progress():
+    jobs = ScanJobManager()
+    release = threading.Event()
+    seen = []
+
+    def scan():
+        report_progress('scrolling', 5, 20)
+        seen.append(True)
+        release.wait(5)
+        report_progress('uploading', 1, 2)
+        return {'message_count': 3}
+
+    first, created = jobs.submit('refresh', scan)
+    second, joined_created = jobs.submit('refresh', scan)
+    assert created and not joined_created and second is first
+
+    while not seen:
+        threading.Event().wait(0.01)
+    snapshot = first.to_dict()
+    assert snapshot['status'] == 'running' and snapshot['phase'] == 'scrolling'
+    assert snapshot['processed'] == 5 and snapshot['total'] == 20 and snapshot['eta_seconds'] is not None
+    assert snapshot['coalesced_requests'] == 1
+
+    release.set()
+    assert first.wait(5)
+    assert first.status == SUCCEEDED and first.result == {'message_count': 3}
+    assert jobs.get(first.id) is first and jobs.active() == []
+
+    # Finished: the next request starts a fresh job
+    third, created = jobs.submit('refresh', lambda: None)
+    assert created and third is not first
+    third.wait(5)
+    report_progress('outside a job')  # no-op
+
+
+def test_failed_job_keeps_the_error():
+    jobs = ScanJobManager()
+
+    def broken():
+        raise RuntimeError('No main chat area found')
+
+    job, _ = jobs.submit('manual-scan', broken)
+    job.wait(5)
+    assert job.status == FAILED and job.to_dict()['error'] == 'No main chat area found'
+
+
+def test_manual_scan_async_returns_202_and_a_pollable_job():
+    from app import simplified_routes
+
+    class FakeCrawler:
+        is_running = True
+        last_scroll_timings = {}
+        last_upload = {}
+        last_queued_count = None  # No outbox: delivered directly
+
+        def get_current_messages(self, scroll_to_load_more, days_back):
+            report_progress('extracting', 1, 2)
+            return [{'id': 'a'}, {'id': 'b'}]
+
+        def deliver(self, messages):
+            return True
+
+    simplified_routes.crawler = FakeCrawler()
+    try:
+        client = simplified_routes.app.test_client()
+        accepted = client.post('/api/whatsapp/manual-scan', json={'async': True, 'scroll_to_load_more': False})
+        assert accepted.status_code == 202
+        job_id = accepted.get_json()['job_id']
+
+        from app.core.scan_jobs import get_scan_jobs
+        get_scan_jobs().get(job_id).wait(5)
+        polled = client.get(f'/api/jobs/{job_id}').get_json()
+        assert polled['status'] == 'succeeded' and polled['result']['message_count'] == 2
+
+        synced = client.post('/api/whatsapp/manual-scan', json={'scroll_to_load_more': False}).get_json()
+        assert synced['status'] == 'success' and synced['message_count'] == 2 and synced['job_id']
+        assert client.get('/api/jobs/nope').status_code == 404
+    finally:
+        simplified_routes.crawler = None
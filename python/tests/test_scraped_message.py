@@ -0,0 +1,48 @@
+import pickle
+from pathlib import Path
+
+from app.core.scraped_message import FIELDS, ScrapedMessage, message_json
+
+FIXTURES = Path(__file__).resolve().parent
+
+
+def sample():
+    return {
+        "id": "m1", "chat": "ORDERS Restaurants", "sender": "Group Member",
+        "content": "2x lettuce", "cleanedContent": "2x lettuce", "timestamp": "08:05, 01/09/2025",
+        "scraped_at": "2025-09-01T08:06:00", "message_type": "order", "items": [], "instructions": "",
+        "media_type": "", "media_url": None, "media_info": "", "mediaInfo": "", "company_name": "",
+        "parsed_items": [], "timestamp_source": "pre_plain", "verification_hash": "abc"
+    }
+
+
+def test_round_trips_to_the_old_dict_shape():
+    message = ScrapedMessage.from_dict(sample())
+    assert message.to_dict() == sample()
+    assert list(message.to_dict()) == list(FIELDS)
+    assert message['content'] == message.get('cleanedContent') == '2x lettuce'
+    assert message.get('missing', 'x') == 'x' and 'missing' not in message
+    assert pickle.loads(pickle.dumps(message)) == sample()
+
+
+def test_edits_and_added_keys_behave_like_a_dict():
+    message = ScrapedMessage.from_dict(sample())
+    message['original_content'] = message['content']
+    message['content'] = '3x lettuce'
+    message['parsed_items'].append('3x lettuce')
+    data = message_json(message)
+    assert data['content'] == '3x lettuce' and data['cleanedContent'] == '2x lettuce'
+    assert data['original_content'] == '2x lettuce'
+    assert data['parsed_items'] == ['3x lettuce']
+
+    other = ScrapedMessage.from_dict(dict(sample(), id='m2'))
+    assert other.chat is message.chat  # interned
+
+
+def test_parsed_html_rows_are_scraped_messages():
+    from app.core.whatsapp_crawler import WhatsAppCrawler
+
+    html = (FIXTURES / 'Tuesday_01_09_2025_messages.html').read_text(encoding='utf-8')
+    messages = WhatsAppCrawler().parse_html(html)
+    assert all(isinstance(m, ScrapedMessage) for m in messages)
+    assert list(messages[0].to_dict()) == list(FIELDS)
@@ -0,0 +1,48 @@
+import json
+from app.core.dom_scripts import ROW_WINDOW_SCRIPT
+from app.core.scroll_loader import ScrollLoader
+
+
+class ScrollingDriver:
+    """Fake chat that renders one more batch of older rows per scroll until history runs out"""
+    def __init__(self, batches, pre_plain_texts=None):
+        self.batches = list(batches)
+        self.count = self.batches.pop(0)
+        self.pre_plain_texts = pre_plain_texts or []
+        self.scrolls = 0
+
+    def execute_script(self, script, *args):
+        if script is ROW_WINDOW_SCRIPT:
+            return json.dumps({'count': self.count, 'first_id': f'id_{self.count}',
+                               'pre_plain_texts': self.pre_plain_texts})
+        self.scrolls += 1
+        if self.batches:
+            self.count = self.batches.pop(0)
+
+
+class Container:
+    def send_keys(self, *keys):
+        pass
+
+
+def test_stops_at_top_with_backoff_and_timings():
+    driver = ScrollingDriver([10, 20, 30])
+    loader = ScrollLoader(driver, Container(), step_timeout=0.01, max_step_timeout=0.04,
+                          stable_limit=3, poll_interval=0.001)
+    steps = []
+    window = loader.load(max_scrolls=50, on_step=steps.append)
+
+    assert window['count'] == 30
+    assert driver.scrolls == 5
+    assert steps == [1, 2, 3, 4, 5]
+    assert [t['loaded'] for t in loader.timings] == [True, True, False, False, False]
+    assert [t['timeout'] for t in loader.timings] == [0.01, 0.01, 0.01, 0.02, 0.04]
+    summary = loader.timing_summary()
+    assert summary['steps'] == 5 and summary['loaded_steps'] == 2 and summary['rows'] == 30
+
+
+def test_should_stop_ends_scrolling_early():
+    driver = ScrollingDriver([10, 20, 30, 40], pre_plain_texts=['[08:52, 01/09/2025] Karl: '])
+    loader = ScrollLoader(driver, Container(), step_timeout=0.01, poll_interval=0.001)
+    loader.load(max_scrolls=50, should_stop=lambda window: window['count'] >= 20)
+    assert driver.scrolls == 1
@@ -0,0 +1,175 @@
+import json
+from datetime import datetime
+from app.simplified_whatsapp_crawler import SimplifiedWhatsAppCrawler
+
+
+def _pre(ts):
+    return f"[{ts.strftime('%H:%M')}, {ts.strftime('%d/%m/%Y')}] Karl: "
+
+
+class ScriptOnlyDriver:
+    """Fake driver that only answers the batch extraction script"""
+    def __init__(self, rows):
+        self.rows = rows
+        self.script_calls = 0
+
+    def execute_script(self, script, *args):
+        self.script_calls += 1
+        return json.dumps(self.rows)
+
+    def find_elements(self, by, selector):
+        raise AssertionError("per-element path should not be used")
+
+
+def test_script_extraction_uses_single_round_trip():
+    now = datetime.now()
+    rows = [
+        {'index': 0, 'id': 'id_a', 'pre_plain_texts': [_pre(now)], 'time_texts': [],
+         'text': 'Venue08:52', 'truncated': False, 'html': '<div role="row">a</div>'},
+        {'index': 1, 'id': 'id_b', 'pre_plain_texts': [], 'time_texts': [],
+         'text': '', 'truncated': False, 'html': '<div role="row"></div>'},
+    ]
+    crawler = SimplifiedWhatsAppCrawler()
+    crawler.driver = ScriptOnlyDriver(rows)
+
+    messages = crawler.get_current_messages(scroll_to_load_more=False, days_back=None)
+
+    assert crawler.driver.script_calls == 1
+    assert [m['id'] for m in messages] == ['id_a']
+    assert messages[0]['message_data']['content'] == 'Venue'
+    assert messages[0]['timestamp_source'] == 'pre_plain'
+    assert messages[0]['html'] == '<div role="row">a</div>'
+    crawler.driver = None
+
+
+def test_script_failure_falls_back_to_elements():
+    class BrokenScriptDriver:
+        def execute_script(self, script, *args):
+            raise RuntimeError("javascript error")
+
+        def find_elements(self, by, selector):
+            return []
+
+    crawler = SimplifiedWhatsAppCrawler()
+    crawler.driver = BrokenScriptDriver()
+    assert crawler.get_current_messages(scroll_to_load_more=False) == []
+    crawler.driver = None
+
+
+def test_observed_rows_are_parsed_locally():
+    now = datetime.now()
+    row_html = (
+        '<div role="row"><div data-id="id_new">'
+        f'<div class="_ahy1 copyable-text" data-pre-plain-text="{_pre(now)}">'
+        '<span class="_ao3e selectable-text copyable-text">Venue</span></div></div></div>'
+    )
+
+    class ObserverDriver:
+        def set_script_timeout(self, seconds):
+            pass
+
+        def execute_async_script(self, script, *args):
+            return json.dumps([{'id': 'id_new', 'html': row_html, 'observed_at': 0}])
+
+    crawler = SimplifiedWhatsAppCrawler()
+    crawler.driver = ObserverDriver()
+    observed = crawler.drain_observed_rows(wait_seconds=0)
+    messages = crawler.messages_from_observed_rows(observed)
+    assert [m['id'] for m in messages] == ['id_new']
+    assert messages[0]['message_data']['content'] == 'Venue'
+    crawler.driver = None
+
+
+def test_lost_observer_is_reported_as_none():
+    class ReloadedPageDriver:
+        def set_script_timeout(self, seconds):
+            pass
+
+        def execute_async_script(self, script, *args):
+            return None
+
+    crawler = SimplifiedWhatsAppCrawler()
+    crawler.driver = ReloadedPageDriver()
+    assert crawler.drain_observed_rows(wait_seconds=0) is None
+    crawler.driver = None
+
+
+def test_incremental_scan_skips_processed_rows():
+    from app.core.dom_scripts import ROW_FINGERPRINTS_SCRIPT
+
+    now = datetime.now()
+    rows = [
+        {'index': 0, 'id': 'id_a', 'pre_plain_texts': [_pre(now)], 'time_texts': [],
+         'text': '2x Lettuce', 'truncated': False, 'fingerprint_text': 'Karl2x Lettuce', 'html': '<div/>'},
+    ]
+
+    class IncrementalDriver:
+        def __init__(self):
+            self.extract_calls = []
+
+        def execute_script(self, script, *args):
+            if script is ROW_FINGERPRINTS_SCRIPT:
+                return json.dumps([{'index': r['index'], 'id': r['id'], 'fingerprint_text': r['fingerprint_text']} for r in rows])
+            self.extract_calls.append(args[0] if args else None)
+            wanted = args[0] if args else None
+            return json.dumps([r for r in rows if wanted is None or r['id'] in wanted])
+
+    crawler = SimplifiedWhatsAppCrawler()
+    crawler.driver = IncrementalDriver()
+
+    first = crawler.get_new_messages(days_back=None)
+    assert [m['id'] for m in first] == ['id_a']
+    crawler.mark_processed(first)
+
+    # Unchanged row: no extraction call at all
+    assert crawler.get_new_messages(days_back=None) == []
+    assert crawler.driver.extract_calls == [['id_a']]
+
+    # Edited row: extracted again
+    rows[0]['fingerprint_text'] = 'Karl3x Lettuce'
+    rows[0]['text'] = '3x Lettuce'
+    assert [m['message_data']['content'] for m in crawler.get_new_messages(days_back=None)] == ['3x Lettuce']
+    crawler.driver = None
+
+
+def test_truncated_rows_expand_in_one_batch():
+    from app.core.dom_scripts import BULK_EXPAND_SCRIPT, EXPANSION_PENDING_SCRIPT, EXTRACT_ROWS_SCRIPT
+
+    now = datetime.now()
+
+    def row(row_id, text, truncated):
+        return {'index': 0, 'id': row_id, 'pre_plain_texts': [_pre(now)], 'time_texts': [],
+                'text': text, 'truncated': truncated, 'fingerprint_text': text, 'html': f'<div>{text}</div>'}
+
+    class ExpandingDriver:
+        def __init__(self):
+            self.expanded = False
+            self.calls = []
+
+        def execute_script(self, script, *args):
+            if script is BULK_EXPAND_SCRIPT:
+                self.calls.append('expand')
+                self.expanded = True
+                return json.dumps({'clicked': ['id_a'], 'no_button': ['id_b'], 'previews': {'id_a': 'Long…'}})
+            if script is EXPANSION_PENDING_SCRIPT:
+                self.calls.append('pending')
+                return []
+            assert script is EXTRACT_ROWS_SCRIPT
+            self.calls.append(('extract', args[0] if args else None))
+            if self.expanded:
+                return json.dumps([row('id_a', 'Long order in full', False)])
+            return json.dumps([row('id_a', 'Long…', True), row('id_b', 'Other…', True)])
+
+        def find_elements(self, by, selector):
+            raise AssertionError("per-element expansion should not be used")
+
+    crawler = SimplifiedWhatsAppCrawler()
+    crawler.driver = ExpandingDriver()
+    messages = crawler.get_current_messages(scroll_to_load_more=False, days_back=None)
+
+    by_id = {m['id']: m['message_data'] for m in messages}
+    assert by_id['id_a']['content'] == 'Long order in full'
+    assert by_id['id_a']['was_expanded'] is True
+    assert by_id['id_b']['expansion_failed'] is True
+    assert crawler.driver.calls == [('extract', None), 'expand', 'pending', ('extract', ['id_a'])]
+    crawler.driver = None
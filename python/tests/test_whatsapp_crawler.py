@@ -34,3 +34,33 @@ def test_classify_and_timestamp_parsing_monkeypatch(monkeypatch):
     assert isinstance(iso, str)
 
 
+
+
+def test_scroll_capture_only_expands_new_rows_and_skips_failed_ones():
+    from app.core.dom_scripts import BULK_EXPAND_SCRIPT, ROW_IDS_SCRIPT
+
+    class FakeDriver:
+        def __init__(self):
+            self.expand_calls = []
+
+        def execute_script(self, script, *args):
+            if script == ROW_IDS_SCRIPT:
+                return ['seen', 'stuck', 'fresh']
+            if script == BULK_EXPAND_SCRIPT:
+                self.expand_calls.append(args[0])
+                return json.dumps({'clicked': [], 'no_button': ['stuck'], 'previews': {}})
+            raise AssertionError('unexpected script')
+
+        def find_elements(self, by, selector):
+            return []
+
+    crawler = WhatsAppCrawler()
+    crawler.driver = FakeDriver()
+    expansion_failed = set()
+    crawler._capture_new_messages([], {'seen'}, 1, expansion_failed)
+    crawler._capture_new_messages([], {'seen', 'fresh'}, 2, expansion_failed)
+    crawler._capture_new_messages([], {'seen', 'fresh'}, 3, expansion_failed)
+
+    assert crawler.driver.expand_calls == [['stuck', 'fresh']]
+    assert expansion_failed == {'stuck'}
+    crawler.driver = None